@@ -1,65 +1,137 @@
 # app/main.py
+import asyncio
+import json
 import os
 from contextlib import asynccontextmanager
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Dict, List, Literal, Optional
 
 from fastapi import FastAPI, HTTPException, Query
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
+from starlette.concurrency import iterate_in_threadpool
 
-# v4 retriever (must pass http_port + grpc_port inside it)
-from utils.retriever.weaviate_retriever import WeaviateRetriever
+# v4 async retriever (must pass http_port + grpc_port inside it)
+from utils.common.registry import registry_stats
+from utils.retriever.async_weaviate_retriever import AsyncWeaviateRetriever
+from utils.retriever.filters import SearchFilters
 
 
 # --------- Config from env ---------
 WEAVIATE_HOST = os.getenv("WEAVIATE_HOST", "weaviate")     # in Docker compose network; use 127.0.0.1 on host
 WEAVIATE_HTTP_PORT = int(os.getenv("WEAVIATE_PORT", "8080"))
 WEAVIATE_GRPC_PORT = int(os.getenv("WEAVIATE_GRPC_PORT", "50051"))
-WEAVIATE_CLASS = os.getenv("WEAVIATE_CLASS", "Movies")
+WEAVIATE_CLASS = os.getenv("WEAVIATE_CLASS", "Cases")
 HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", "0.6"))
 USE_TLS = os.getenv("WEAVIATE_TLS", "false").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR") or None
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH") or None   # sqlite file shared by uvicorn workers
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "32"))       # searches in flight per worker
+SEARCH_QUEUE_TIMEOUT = float(os.getenv("SEARCH_QUEUE_TIMEOUT", "5"))  # seconds to wait for a slot before 503
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", "2"))
+SNIPPET_WORDS = int(os.getenv("SNIPPET_WORDS", "40"))   # /search default; 0 returns full chunk text
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")  # "onnx": int8 onnxruntime query encoder; no torch import unless ENABLE_GENERATION
+ONNX_DIR = os.getenv("ONNX_DIR", "./models/minilm-onnx")
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0")) or None
+# /answer/stream loads the LLM into this process; off by default so retriever-only workers stay small
+ENABLE_GENERATION = os.getenv("ENABLE_GENERATION", "false").lower() in ("1", "true", "yes")
+LLM_BASE_MODEL = os.getenv("LLM_BASE_MODEL", "Qwen/Qwen2.5-7B-Instruct")
+IRAC_ADAPTER_PATH = os.getenv("IRAC_ADAPTER_PATH", "./finetuning/models/ace-irac-lora-qwen7b")
+GENERATION_MAX_BATCH = int(os.getenv("GENERATION_MAX_BATCH", "8"))          # concurrent requests per generate(); 1 = no batching
+GENERATION_MAX_WAIT_MS = float(os.getenv("GENERATION_MAX_WAIT_MS", "25"))  # how long a request waits for batch-mates
 
 # --------- Response models ---------
 class Hit(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    uuid: Optional[str] = None
     title: Optional[str] = None
-    description: Optional[str] = None
-    type: Optional[str] = None
-    director: Optional[str] = None
-    cast: Optional[str] = None
-    country: Optional[str] = None
-    release_year: Optional[int] = None
-    rating: Optional[str] = None
-    duration: Optional[str] = None
-    listed_in: Optional[str] = None
-    _score: Optional[float] = None
+    date_filed: Optional[datetime] = None
+    url: Optional[str] = None
+    text: Optional[str] = None        # full chunk, only when snippet_words=0
+    snippet: Optional[str] = None     # window around the query terms; full text via /texts
+    score: Optional[float] = Field(default=None, alias="_score")
 
 class SearchResponse(BaseModel):
     results: List[Hit]
 
+class TextsResponse(BaseModel):
+    texts: Dict[str, str]
+
+# --------- Generation ---------
+def build_rag_service():
+    """Sync RAG pipeline for /answer/stream; shares the encoder and Weaviate client pool with the API retriever."""
+    from utils.models.llm.hf_infer import GenerateConfig, HFLoadConfig
+    from utils.pipelines.ragservice import RAGService
+    from utils.retriever.reranker import CrossEncoderReranker
+    from utils.retriever.weaviate_retriever import WeaviateRetriever
+
+    retriever = WeaviateRetriever(
+        host=WEAVIATE_HOST, http_port=WEAVIATE_HTTP_PORT, grpc_port=WEAVIATE_GRPC_PORT,
+        index=WEAVIATE_CLASS, alpha=HYBRID_ALPHA, use_tls=USE_TLS, embedding_cache=EMBEDDING_CACHE_DIR,
+        encoder_backend=ENCODER_BACKEND, onnx_dir=ONNX_DIR, onnx_threads=ONNX_THREADS,
+    )
+    llm_cfg = HFLoadConfig(base_model_id=LLM_BASE_MODEL, irac_model_id=IRAC_ADAPTER_PATH)
+    service = RAGService(llm_cfg=llm_cfg, cfg=GenerateConfig(), retriever=retriever, reranker=CrossEncoderReranker(),
+                         max_batch_size=GENERATION_MAX_BATCH, max_wait_ms=GENERATION_MAX_WAIT_MS)
+    service.llm.load_irac()   # base weights + adapter before the first request
+    return service
+
+def _sse(event: Dict) -> str:
+    kind = event.get("event", "message")
+    data = {k: v for k, v in event.items() if k != "event"}
+    return f"event: {kind}\ndata: {json.dumps(data, default=str)}\n\n"
+
 # --------- Lifespan ---------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     retriever = None
     try:
-        retriever = WeaviateRetriever(
+        retriever = AsyncWeaviateRetriever(
             host=WEAVIATE_HOST,
             http_port=WEAVIATE_HTTP_PORT,
             grpc_port=WEAVIATE_GRPC_PORT,
             index=WEAVIATE_CLASS,
             alpha=HYBRID_ALPHA,
             use_tls=USE_TLS,
+            embedding_cache=EMBEDDING_CACHE_DIR,
+            query_cache_size=QUERY_CACHE_SIZE,
+            query_cache_ttl=QUERY_CACHE_TTL,
+            result_cache_size=RESULT_CACHE_SIZE,
+            result_cache_path=RESULT_CACHE_PATH,
+            encode_workers=ENCODE_WORKERS,
+            encoder_backend=ENCODER_BACKEND,
+            onnx_dir=ONNX_DIR,
+            onnx_threads=ONNX_THREADS,
         )
+        await retriever.connect()
         print("[startup] Retriever initialized")
     except Exception as e:
         print(f"[startup] Retriever init failed: {e}")
         retriever = None
 
+    rag = None
+    if ENABLE_GENERATION:
+        try:
+            rag = await asyncio.to_thread(build_rag_service)
+            print("[startup] RAG service initialized")
+        except Exception as e:
+            print(f"[startup] RAG service init failed: {e}")
+
     app.state.retriever = retriever
+    app.state.rag = rag
+    app.state.search_slots = asyncio.Semaphore(SEARCH_CONCURRENCY)
     try:
         yield
     finally:
         try:
             if app.state.retriever:
-                app.state.retriever.close()
+                await app.state.retriever.close()
+            if app.state.rag:
+                app.state.rag.close()
         except Exception:
             pass
 
@@ -67,19 +139,94 @@ app = FastAPI(title="CinemaRAG Retriever API", lifespan=lifespan)
 
 # --------- Routes ---------
 @app.get("/health")
-def health():
+async def health():
     """Always returns 200 so you can verify the server is up even if Weaviate isn't."""
+    r = getattr(app.state, "retriever", None)
+    rag = getattr(app.state, "rag", None)
     return {
         "ok": True,
         "weaviate_http": f"{'https' if USE_TLS else 'http'}://{WEAVIATE_HOST}:{WEAVIATE_HTTP_PORT}",
         "weaviate_grpc": f"{WEAVIATE_HOST}:{WEAVIATE_GRPC_PORT}",
         "index": WEAVIATE_CLASS,
-        "retriever_initialized": bool(getattr(app.state, "retriever", None)),
+        "retriever_initialized": bool(r),
+        "generation_initialized": bool(rag),
+        "generation_batching": rag.scheduler.stats() if rag and rag.scheduler else None,
+        "cache": await r.cache_stats() if r else None,
+        "shared": registry_stats(),
     }
 
 @app.get("/search", response_model=SearchResponse)
-def search(q: str = Query(..., min_length=1), top_k: int = Query(10, ge=1, le=100)):
+async def search(
+    q: str = Query(..., min_length=1),
+    top_k: int = Query(10, ge=1, le=100),
+    mode: Literal["hybrid", "bm25", "semantic"] = Query("hybrid"),
+    snippet_words: int = Query(SNIPPET_WORDS, ge=0, le=300),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    doc_id: Optional[List[str]] = Query(None),
+    court: Optional[List[str]] = Query(None),
+):
     r = getattr(app.state, "retriever", None)
     if r is None:
         raise HTTPException(status_code=503, detail="Retriever not initialized")
-    return {"results": r.retrieve(q, top_k)}
\ No newline at end of file
+    try:
+        filters = SearchFilters(date_from=date_from, date_to=date_to, doc_ids=doc_id, courts=court)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    slots: asyncio.Semaphore = app.state.search_slots
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=SEARCH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Search is at capacity, retry shortly")
+    try:
+        retrieve = getattr(r, f"retrieve_{mode}")
+        return {"results": await retrieve(q, top_k, snippet_words=snippet_words or None, filters=filters)}
+    finally:
+        slots.release()
+
+@app.get("/texts", response_model=TextsResponse)
+async def texts(uuid: List[str] = Query(...)):
+    """Lazy full-text fetch for hits returned as snippets: /texts?uuid=...&uuid=..."""
+    r = getattr(app.state, "retriever", None)
+    if r is None:
+        raise HTTPException(status_code=503, detail="Retriever not initialized")
+    if len(uuid) > 100:
+        raise HTTPException(status_code=422, detail="At most 100 uuids per request")
+    return {"texts": await r.fetch_texts(uuid)}
+
+@app.get("/answer/stream")
+async def answer_stream(
+    q: str = Query(..., min_length=1),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    doc_id: Optional[List[str]] = Query(None),
+    court: Optional[List[str]] = Query(None),
+):
+    """
+    Server-sent events for the full RAG pipeline: `stage`, `query` and
+    `documents` as each step finishes, then the IRAC summary as `token` events
+    and a final `done` (or `error`). Needs ENABLE_GENERATION=true.
+    """
+    rag = getattr(app.state, "rag", None)
+    if rag is None:
+        raise HTTPException(status_code=503, detail="Generation not enabled (set ENABLE_GENERATION=true)")
+    try:
+        filters = SearchFilters(date_from=date_from, date_to=date_to, doc_ids=doc_id, courts=court)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    async def events():
+        stream = rag.run_pipeline_stream(q, filters=filters)
+        try:
+            async for event in iterate_in_threadpool(stream):
+                yield _sse(event)
+        except Exception as e:
+            yield _sse({"event": "error", "detail": str(e)})
+        finally:
+            try:
+                stream.close()   # client went away: stops the generate() thread
+            except ValueError:
+                pass             # still inside next() on a worker thread; it ends with that token
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,248 @@
+"""
+Ingest throughput benchmark for VectorizeOpinions with no Weaviate or CourtListener.
+
+Generates a synthetic opinions CSV, runs the real ingest stages against an
+in-memory stand-in for the collection batch API, and writes docs/s, chunks/s
+and the clean/chunk/embed/write time split to JSON so runs can be compared
+across commits.
+
+    python -m benchmarks.bench_ingest --docs 2000 --encoder fake
+    python -m benchmarks.bench_ingest --docs 500 --encoder minilm --workers 4
+    python -m benchmarks.bench_ingest --compare benchmarks/results/<previous>.json
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.pipelines.vectorize_batched_opinions import VectorizeOpinions, IngestConfig, EMBED_MODEL_ID
+
+WORDS = (
+    "court held plaintiff defendant appeal statute jurisdiction motion evidence trial "
+    "judgment reversed affirmed remanded contract negligence damages testimony jury "
+    "verdict federal state constitutional amendment clause search seizure warrant"
+).split()
+
+
+# ---------------- synthetic corpus ----------------
+def make_opinions_csv(path: str, n_docs: int, mean_words: int = 2500, sigma: float = 0.8, seed: int = 0) -> int:
+    """Log-normal opinion lengths around `mean_words`; returns total words written."""
+    rng = np.random.default_rng(seed)
+    mu = np.log(mean_words) - sigma ** 2 / 2
+    lengths = np.maximum(20, rng.lognormal(mu, sigma, n_docs).astype(int))
+    vocab = np.array(WORDS)
+    rows = []
+    for i, n in enumerate(lengths):
+        words = vocab[rng.integers(0, len(vocab), n)]
+        # sprinkle newlines/tabs/double spaces so the cleaner has work to do
+        text = " ".join(words).replace("court ", "court.\n\n").replace("jury ", "jury\t  ")
+        rows.append({
+            "id": i,
+            "case_name": f"Synthetic v. Case {i}",
+            "date_filed": f"{1950 + i % 70}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "absolute_url": f"/opinion/{i}/synthetic-v-case-{i}/",
+            "text": text,
+        })
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return int(lengths.sum())
+
+
+# ---------------- stand-ins ----------------
+class HashEncoder:
+    """Deterministic, near-free encoder so a run isolates the non-model stages."""
+    max_seq_length = 256
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False, **_):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else sentences
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "little")
+            out[i] = np.random.default_rng(seed).standard_normal(self.dim)
+        if normalize_embeddings:
+            out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out[0] if single else out
+
+
+class _Batch:
+    def __init__(self, coll: "InMemoryCollection"):
+        self.coll = coll
+        self._since_sleep = 0
+
+    def add_object(self, properties, vector=None, uuid=None):
+        self.coll.objects[str(uuid)] = (properties, vector)
+        self._since_sleep += 1
+        if self.coll.write_latency_ms and self._since_sleep >= 100:
+            time.sleep(self.coll.write_latency_ms / 1000)   # one simulated round trip per 100 objects
+            self._since_sleep = 0
+
+    def flush(self):
+        pass
+
+
+class _BatchAPI:
+    def __init__(self, coll: "InMemoryCollection"):
+        self.coll = coll
+        self.failed_objects: List[Any] = []
+
+    @contextlib.contextmanager
+    def dynamic(self):
+        yield _Batch(self.coll)
+
+
+class InMemoryCollection:
+    def __init__(self, name: str, write_latency_ms: float = 0.0):
+        self.name = name
+        self.objects: Dict[str, Any] = {}
+        self.write_latency_ms = write_latency_ms
+        self.batch = _BatchAPI(self)
+        self.data = self
+        self.aggregate = self
+        self.deletes = 0
+
+    def delete_many(self, where=None):
+        self.deletes += 1
+
+    def exists(self, uuid) -> bool:
+        return str(uuid) in self.objects
+
+    def insert(self, properties, uuid=None, vector=None):
+        self.objects[str(uuid)] = (properties, vector)
+
+    replace = insert
+
+    def over_all(self, total_count: bool = True):
+        return type("Agg", (), {"total_count": len(self.objects)})()
+
+
+class InMemoryClient:
+    def __init__(self, write_latency_ms: float = 0.0):
+        self.write_latency_ms = write_latency_ms
+        self.store: Dict[str, InMemoryCollection] = {}
+        self.collections = self
+
+    def list_all(self):
+        return dict(self.store)
+
+    def create(self, name: str, **_):
+        self.store[name] = InMemoryCollection(name, self.write_latency_ms)
+
+    def get(self, name: str) -> InMemoryCollection:
+        return self.store[name]
+
+    def close(self):
+        pass
+
+
+# ---------------- runner ----------------
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def run(args) -> Dict[str, Any]:
+    if args.encoder == "fake":
+        model = HashEncoder()
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(EMBED_MODEL_ID)
+    cfg = IngestConfig(
+        encode_batch_size=args.encode_batch_size,
+        read_chunksize=args.read_chunksize,
+        workers=args.workers,
+        chunker=args.chunker,
+        measure_truncation=args.measure_truncation and args.encoder != "fake",
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "opinions.csv")
+        total_words = make_opinions_csv(csv_path, args.docs, args.mean_words, args.sigma, args.seed)
+        client = InMemoryClient(write_latency_ms=args.write_latency_ms)
+        t0 = time.perf_counter()
+        stats = VectorizeOpinions(client=client, model=model).ingest(csv_path, cfg=cfg)
+        wall = time.perf_counter() - t0
+
+    chunks = stats["write"].items
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "params": {**vars(args), "total_words": total_words},
+        "config": asdict(cfg),
+        "wall_seconds": round(wall, 4),
+        "docs_per_s": round(args.docs / wall, 2),
+        "chunks_per_s": round(chunks / wall, 2),
+        "chunks": chunks,
+        "stages": {name: s.as_dict() for name, s in stats.items()},
+        "stage_share": {
+            name: round(s.seconds / max(sum(x.seconds for x in stats.values()), 1e-9), 4)
+            for name, s in stats.items()
+        },
+    }
+
+
+def compare(current: Dict[str, Any], previous_path: str) -> None:
+    with open(previous_path) as f:
+        prev = json.load(f)
+    print(f"\nvs {previous_path} ({prev.get('commit')}):")
+    for key in ("docs_per_s", "chunks_per_s"):
+        a, b = prev[key], current[key]
+        print(f"  {key:<14} {a:>10.1f} -> {b:>10.1f} ({(b - a) / a * 100:+.1f}%)")
+    for name, s in current["stages"].items():
+        p = prev["stages"].get(name)
+        if p and p["rate"]:
+            print(f"  {name + ' rate':<14} {p['rate']:>10.1f} -> {s['rate']:>10.1f} ({(s['rate'] - p['rate']) / p['rate'] * 100:+.1f}%)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="VectorizeOpinions ingest benchmark")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--mean-words", type=int, default=2500)
+    parser.add_argument("--sigma", type=float, default=0.8, help="log-normal sigma of opinion length")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--encoder", choices=["fake", "minilm"], default="fake")
+    parser.add_argument("--chunker", choices=["words", "tokens"], default="words")
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--measure-truncation", action="store_true",
+                        help="also count tokens past the encoder window (re-tokenizes every chunk)")
+    parser.add_argument("--encode-batch-size", type=int, default=64)
+    parser.add_argument("--read-chunksize", type=int, default=1000)
+    parser.add_argument("--write-latency-ms", type=float, default=0.0,
+                        help="simulated Weaviate round trip per 100 objects")
+    parser.add_argument("--out-dir", default="benchmarks/results")
+    parser.add_argument("--compare", help="previous result JSON to diff against")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    out_dir, previous = args.out_dir, args.compare
+    del args.out_dir, args.compare
+    result = run(args)
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"ingest-{result['commit'] or 'nogit'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps({k: result[k] for k in ("docs_per_s", "chunks_per_s", "stage_share")}, indent=2))
+    print(f"[INFO] Saved {path}")
+    if previous:
+        compare(result, previous)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,15 @@ import os, time, urllib.request
 from tqdm import tqdm
 # import pandas as pd
 import weaviate
-from weaviate.classes.config import Configure, Property, DataType
+from weaviate.classes.config import Configure, Property, DataType, Tokenization
 from weaviate.util import generate_uuid5
 from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
 import requests
 from numpy import float32
 import re
+from utils.pipelines.courtlistener_fetcher import FetchConfig, iter_opinions_threaded
+from utils.common.index_epoch import bump_epoch
 # load_dotenv()
 # TOKEN = os.getenv("COURTLISTENER_API_KEY")
 # point to your env file
@@ -32,50 +34,24 @@ client = weaviate.connect_to_custom(
 
 print("✅ Connected to Weaviate client")
 
-def _clean_txt(text: str) -> str:
-    if not text:
-        return ""
-    text = re.sub(r"[\n\r\t\f\v]+", " ", text)
-    text = re.sub(r" {2,}", " ", text)
-    return text.strip()
+# Run from the repo root: python -m ingest.ingest_case_opinions
+# Several comma-separated start URLs (e.g. one per court) are fetched concurrently.
+START_URLS = os.getenv(
+    "COURTLISTENER_START_URLS",
+    "https://www.courtlistener.com/api/rest/v4/opinions/??jurisdiction=ny&order_by=-date_filed",
+).split(",")
+CURSOR_PATH = os.getenv("COURTLISTENER_CURSOR", "./data/courtlistener_cursor.json")
+ENCODE_BATCH = int(os.getenv("ENCODE_BATCH", "32"))
+ACK_EVERY = int(os.getenv("ACK_EVERY", "256"))   # opinions between batch flushes that advance the cursor
 
-def stream_opinions(limit=100_000, start_url="https://www.courtlistener.com/api/rest/v4/opinions/??jurisdiction=ny&order_by=-date_filed"):
-    url, seen = start_url, 0
-    # with tqdm(total=limit, desc="Fetching Court Opinions") as pbar:
-    while url and seen < limit:
-        try:
-            r = requests.get(url, headers=H, timeout=60); r.raise_for_status()
-            j = r.json()
-            # url = j.get("next")
-        except requests.exceptions.RequestException as e:
-            print(f"Request failed for UTL {url}")
-            # url = None
-            continue
-        for op in j["results"]:
-            text = op.get("plain_text") #or op.get("html") or op.get("html_with_citations")
-            title = op.get('absolute_url').split('/')[-2]
-            if not text:
-                continue
-            text = _clean_txt(text)
-            court = op.get("court")
-            if isinstance(court, dict):
-                court = court.get("name") or court.get("id") or ""
-            yield {
-                "id": str(op["id"]),
-                "title": title,
-                "court": op.get("court"),
-                "date_filed": op.get("date_filed"),
-                "url": "https://www.courtlistener.com" + (op.get("absolute_url") or ""),
-                "text": text,
-            }
-            seen += 1
-            if seen >= limit: 
-                break
-            
-        url = j.get("next")
-        if not url:
-            break
-        time.sleep(0.25)
+def stream_opinions(limit=100_000, start_urls=START_URLS):
+    """
+    Opinions from the async fetcher; pages are fetched while the caller embeds.
+    `ack()` written opinions on the returned stream to advance the resume cursor.
+    """
+    os.makedirs(os.path.dirname(CURSOR_PATH) or ".", exist_ok=True)
+    cfg = FetchConfig(headers=H, cursor_path=CURSOR_PATH)
+    return iter_opinions_threaded(start_urls, limit=limit, cfg=cfg)
         
 
 try:
@@ -85,8 +61,10 @@ try:
             name=CLASS,
             properties=[
                 Property(name="title", data_type=DataType.TEXT),
-                Property(name="court", data_type=DataType.TEXT),
-                Property(name="date_filed", data_type=DataType.DATE),
+                Property(name="court", data_type=DataType.TEXT, tokenization=Tokenization.FIELD,
+                         index_filterable=True, index_searchable=False),
+                Property(name="date_filed", data_type=DataType.DATE, index_filterable=True,
+                         index_range_filters=True),
                 Property(name="url", data_type=DataType.TEXT),
                 Property(name="text", data_type=DataType.TEXT),
             ],
@@ -106,13 +84,13 @@ try:
     
     class_name = "LegalOpinion"
     N_CASES = 1000
-    with cases.batch.dynamic() as batch:
-        # batch.batch_size = 32
-        for doc in tqdm(stream_opinions(limit=N_CASES), total=N_CASES, desc="Ingesting to Weaviate"):
-            uid = generate_uuid5(f"{doc.get('title','')}::{doc.get('date_filed',0)}::{doc.get('id',0)}")
-            
-            vec = model.encode(doc["text"]).astype(float32)
-            
+    def opinion_uuid(doc):
+        return generate_uuid5(f"{doc.get('title','')}::{doc.get('date_filed',0)}::{doc.get('id',0)}")
+
+    def write(batch, docs):
+        vecs = model.encode([d["text"] for d in docs], batch_size=ENCODE_BATCH).astype(float32)
+        for doc, vec in zip(docs, vecs):
+            uid = opinion_uuid(doc)
             prop = {
                 "title": doc["title"],
                 "court": doc["court"] or "",
@@ -125,6 +103,37 @@ try:
                 vector=vec,
                 uuid=uid,
             )
+
+    failed_seen = [0]
+    def written(docs):
+        """`docs` minus the ones Weaviate rejected since the last check; those must not be acked."""
+        failed = cases.batch.failed_objects
+        bad = {str(f.object_.uuid) for f in failed[failed_seen[0]:]}
+        failed_seen[0] = len(failed)
+        if bad:
+            print(f"[WARN] {len(bad)} opinions failed to write; the cursor stays before them")
+        return [d for d in docs if str(opinion_uuid(d)) not in bad]
+
+    with cases.batch.dynamic() as batch:
+        # batch.batch_size = 32
+        pending, unacked = [], []
+        opinions = stream_opinions(limit=N_CASES)
+        for doc in tqdm(opinions, total=N_CASES, desc="Ingesting to Weaviate"):
+            pending.append(doc)
+            if len(pending) >= ENCODE_BATCH:
+                write(batch, pending)
+                unacked += pending
+                pending = []
+            if len(unacked) >= ACK_EVERY:
+                # only once Weaviate has them may the resume cursor move past them
+                batch.flush()
+                opinions.ack(written(unacked))
+                unacked = []
+        if pending:
+            write(batch, pending)
+            unacked += pending
+    opinions.ack(written(unacked))   # leaving the batch context flushed the rest
+    bump_epoch(client, CLASS)   # invalidate retriever result caches
     collections = client.collections.list_all()
     # print("Collections:", collections)
     if CLASS in collections:
@@ -9,12 +9,14 @@ from dotenv import load_dotenv
 import requests
 from numpy import float32
 import re
+from utils.pipelines.opinion_prep import clean_text_column, norm_date_column
+from utils.common.index_epoch import bump_epoch
 # load_dotenv()
 # TOKEN = os.getenv("COURTLISTENER_API_KEY")
 # point to your env file
 
 df_path = "./data/raw/all_opinions.csv"
-df = pd.read_csv(df_path)
+READ_CHUNKSIZE = int(os.getenv("READ_CHUNKSIZE", "1000"))
 
 WEAVIATE_HOST = os.getenv("WEAVIATE_HOST", "127.0.0.1")   # "weaviate" if running inside the app container
 WEAVIATE_HTTP_PORT = int(os.getenv("WEAVIATE_PORT", "8080"))
@@ -31,23 +33,8 @@ client = weaviate.connect_to_custom(
 print("✅ Connected to Weaviate client")
 
 
-def norm_date(x):
-    if pd.isna(x) or str(x).strip() == "":
-        return "1970-01-01T00:00:00Z"
-    try:
-        dt = pd.to_datetime(x, errors="coerce", utc=True)
-        if pd.isna(dt):
-            return "1970-01-01T00:00:00Z"
-        return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-    except Exception:
-        return "1970-01-01T00:00:00Z"
-    
-def _clean_txt(text: str) -> str:
-    if not text:
-        return ""
-    text = re.sub(r"[\n\r\t\f\v]+", " ", text)
-    text = re.sub(r" {2,}", " ", text)
-    return text.strip()
+# Run from the repo root: python -m ingest.ingest_case_opinions_df
+# Text cleaning and date parsing are the shared column-wise versions from opinion_prep.
         
             
 try:
@@ -81,16 +68,23 @@ try:
     with cases.batch.dynamic() as batch:
         # batch.batch_size = 32
         # for i, doc in tqdm(df.iloc[:N_DATA].iterrows(), total=N_DATA, desc="Ingesting to Weaviate"):
-        for i, doc in tqdm(df.iterrows(), total=len(df), desc="Ingesting to Weaviate"):
+        # stream the CSV so memory stays bounded by READ_CHUNKSIZE rows
+        frames = pd.read_csv(df_path, chunksize=READ_CHUNKSIZE)
+        def rows(frames):
+            for frame in frames:
+                texts = clean_text_column(frame["text"])
+                dates = norm_date_column(frame["date_filed"])
+                yield from zip(frame.index, frame.to_dict("records"), texts, dates)
+        for i, doc, text, date_filed in tqdm(rows(frames), desc="Ingesting to Weaviate"):
         
             uid = generate_uuid5(f"{doc.get('title','')}::{doc.get('date_filed',0)}::{doc.get('id',0)}::{doc.get('absolute_url','')}::{i}")
             vec = model.encode(doc["text"]).astype(float32)
             prop = {
                 "title": doc["case_name"],
                 # "court": doc["court"] or "",
-                "date_filed": norm_date(doc["date_filed"]) or "1970-01-01T00:00:00Z",
+                "date_filed": date_filed,
                 "url": doc["absolute_url"],
-                "text": _clean_txt(doc["text"]),
+                "text": text,
                 }
             
             batch.add_object(
@@ -98,6 +92,7 @@ try:
                 vector=vec,
                 uuid=uid,
             )
+    bump_epoch(client, CLASS)   # invalidate retriever result caches
     collections = client.collections.list_all()
     # print("Collections:", collections)
     if CLASS in collections:
@@ -1,40 +1,166 @@
 import argparse
+from typing import List, Optional
 import torch
-from utils.retriever import WeaviateRetriever
+from utils.retriever import WeaviateRetriever, LocalRetriever
+from utils.retriever.filters import SearchFilters
+from utils.retriever.reranker import CrossEncoderReranker
 from utils.telemetry import init_tracing
 from utils.pipelines.ragservice import RAGService
-from utils.pipelines.vectorize_batched_opinions import VectorizeOpinions 
+from utils.pipelines.vectorize_batched_opinions import VectorizeOpinions, IngestConfig
+from utils.pipelines.index_profiles import PROFILES, get_profile
 from utils.models.llm.hf_infer import HFModelManager, HFLoadConfig, GenerateConfig
 
 torch.cuda.empty_cache()
 
-def build_service():
+def build_service(local_index: Optional[str] = None, rerank: bool = True):
     #Initialize Arize-Pheonix http://127.0.0.1:6006
     init_tracing(service_name="ace-app-1")
-    retriever = WeaviateRetriever()
+    retriever = LocalRetriever.load(local_index) if local_index else WeaviateRetriever()
+    reranker = CrossEncoderReranker() if rerank else None
     cfg = GenerateConfig()
     model_kwargs = {
         'base_model_id': "Qwen/Qwen2.5-7B-Instruct",
         'irac_model_id': "./finetuning/models/ace-irac-lora-qwen7b"
     }
     llm_cfg = HFLoadConfig(**model_kwargs)
-    return RAGService(cfg=cfg, llm_cfg=llm_cfg, retriever=retriever)
+    return RAGService(cfg=cfg, llm_cfg=llm_cfg, retriever=retriever, reranker=reranker)
 
-def ingest_data(path: str):
+def ingest_data(path: List[str], manifest: Optional[str] = None, workers: int = 0, chunker: str = "words",
+                embedding_cache: Optional[str] = None, index_profile: str = "default"):
     print(f"[INFO] Ingesting data from {path}")
     # retriever = WeaviateRetriever()
     vectorizer = VectorizeOpinions()
-    vectorizer.ingest(path)
+    vectorizer.ingest(path, cfg=IngestConfig(
+        manifest_path=manifest, workers=workers, chunker=chunker, embedding_cache=embedding_cache,
+        index_profile=index_profile,
+    ))
 
-def run_query(query: str):
-    svc = build_service()
-    out = svc.run_pipeline(query)
+def export_store(path: List[str], store_dir: str, workers: int = 0, chunker: str = "words",
+                 embedding_cache: Optional[str] = None):
+    print(f"[INFO] Exporting {path} to corpus store {store_dir}")
+    vectorizer = VectorizeOpinions()
+    vectorizer.export_store(path, store_dir, cfg=IngestConfig(
+        workers=workers, chunker=chunker, embedding_cache=embedding_cache,
+    ))
+
+def load_store(store_dir: str, index_profile: str = "default"):
+    print(f"[INFO] Bulk loading corpus store {store_dir}")
+    VectorizeOpinions().load_store(store_dir, cfg=IngestConfig(index_profile=index_profile))
+
+def rebuild_index(index_profile: str, ef: Optional[int] = None):
+    profile = get_profile(index_profile, ef=ef)
+    print(f"[INFO] Rebuilding the Cases collection with index profile '{profile.name}'")
+    VectorizeOpinions().rebuild_index(profile)
+
+def export_onnx_encoder(out_dir: str):
+    from utils.common.onnx_encoder import export_onnx
+    from utils.retriever.encoder import EMBED_MODEL_ID
+    meta = export_onnx(EMBED_MODEL_ID, out_dir)
+    if not meta["accuracy"]["passed"]:
+        print("[WARN] Quantized encoder is below the accuracy threshold; keep ENCODER_BACKEND=torch")
+
+def build_local_index(store_dir: str, out_dir: str):
+    print(f"[INFO] Building local FAISS + BM25 index from {store_dir}")
+    LocalRetriever.from_corpus_store(store_dir).save(out_dir)
+    print(f"[INFO] Saved local index to {out_dir}")
+
+def run_query(query: str, local_index: Optional[str] = None, rerank: bool = True,
+              filters: Optional[SearchFilters] = None):
+    svc = build_service(local_index, rerank=rerank)
+    out = svc.run_pipeline(query, filters=filters)
 
 def build_parser():
     parser = argparse.ArgumentParser(description="Ace RAG Service CLI")
     parser.add_argument("--ingest",
         type=str,
-        help="Path to CSV file with raw opinions to ingest."
+        nargs="+",
+        help="CSV file(s) or glob(s) with raw opinions to ingest, e.g. './data/raw/*.csv'."
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        help="Manifest path for incremental, resumable ingest (e.g. ./data/ingest_manifest.sqlite)."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Processes for ingest text prep (clean/chunk); 0 runs it inline."
+    )
+    parser.add_argument(
+        "--chunker",
+        choices=["words", "tokens"],
+        default="words",
+        help="Chunk by whitespace words or by embedding-model tokens (fits the encoder window)."
+    )
+    parser.add_argument(
+        "--embedding-cache",
+        type=str,
+        help="Directory of the on-disk embedding cache (e.g. ./data/embedding_cache)."
+    )
+    parser.add_argument(
+        "--export-store",
+        type=str,
+        help="With --ingest: write cleaned chunks + vectors to this corpus store dir instead of Weaviate."
+    )
+    parser.add_argument(
+        "--load-store",
+        type=str,
+        help="Bulk load a corpus store dir (from --export-store) into Weaviate."
+    )
+    parser.add_argument(
+        "--index-profile",
+        choices=list(PROFILES),
+        default="default",
+        help="Vector index profile (HNSW/flat, PQ/SQ/BQ compression) for collections created by --ingest/--load-store."
+    )
+    parser.add_argument(
+        "--rebuild-index",
+        choices=list(PROFILES),
+        help="Rebuild the existing Cases collection under this vector index profile (no re-encoding)."
+    )
+    parser.add_argument(
+        "--ef",
+        type=int,
+        help="With --rebuild-index: override the profile's HNSW query-time ef."
+    )
+    parser.add_argument(
+        "--export-onnx",
+        type=str,
+        metavar="OUT_DIR",
+        help="Export the query encoder to int8 ONNX (for ENCODER_BACKEND=onnx) and check it against PyTorch."
+    )
+    parser.add_argument(
+        "--build-local-index",
+        nargs=2,
+        metavar=("STORE_DIR", "OUT_DIR"),
+        help="Build an in-process FAISS + BM25 index from a corpus store."
+    )
+    parser.add_argument(
+        "--local-index",
+        type=str,
+        help="With --query: retrieve from this local index instead of Weaviate."
+    )
+    parser.add_argument(
+        "--no-rerank",
+        action="store_true",
+        help="With --query: skip the cross-encoder reranking stage and keep hybrid order."
+    )
+    parser.add_argument(
+        "--date-from",
+        type=str,
+        help="With --query: only opinions filed on or after this date (YYYY-MM-DD)."
+    )
+    parser.add_argument(
+        "--date-to",
+        type=str,
+        help="With --query: only opinions filed on or before this date (YYYY-MM-DD)."
+    )
+    parser.add_argument(
+        "--court",
+        type=str,
+        nargs="+",
+        help="With --query: only opinions from these courts (exact names as ingested)."
     )
     parser.add_argument(
         "--query",
@@ -45,10 +171,24 @@ def build_parser():
 
 def main():
     parser, args = build_parser()
-    if args.ingest:
-        ingest_data(args.ingest)
+    if args.ingest and args.export_store:
+        export_store(args.ingest, args.export_store, workers=args.workers, chunker=args.chunker,
+                     embedding_cache=args.embedding_cache)
+    elif args.load_store:
+        load_store(args.load_store, index_profile=args.index_profile)
+    elif args.rebuild_index:
+        rebuild_index(args.rebuild_index, ef=args.ef)
+    elif args.export_onnx:
+        export_onnx_encoder(args.export_onnx)
+    elif args.build_local_index:
+        build_local_index(*args.build_local_index)
+    elif args.ingest:
+        ingest_data(args.ingest, manifest=args.manifest, workers=args.workers, chunker=args.chunker,
+                    embedding_cache=args.embedding_cache, index_profile=args.index_profile)
     elif args.query:
-        run_query(args.query)
+        filters = SearchFilters(date_from=args.date_from, date_to=args.date_to, courts=args.court)
+        run_query(args.query, local_index=args.local_index, rerank=not args.no_rerank,
+                  filters=None if filters.is_empty() else filters)
     else:
         parser.print_help()
 
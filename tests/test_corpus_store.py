@@ -0,0 +1,74 @@
+"""Chunk tables from older corpus stores / local indexes keep loading as CHUNK_SCHEMA grows."""
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from utils.pipelines.corpus_store import (
+    CHUNK_SCHEMA, META_FILE, CorpusStore, CorpusWriter, conform_chunks, read_chunks,
+)
+from utils.pipelines.ingest_stages import ChunkRecord, StageStats
+from utils.retriever.filters import SearchFilters
+
+
+def pre_court_table():
+    # CHUNK_SCHEMA before `court` was added, columns in a different order
+    return pa.table({
+        "text": ["alpha", "beta"],
+        "uuid": ["u1", "u2"],
+        "doc_id": ["d1", "d2"],
+        "chunk_index": pa.array([0, 0], pa.int64()),
+        "chunk_count": pa.array([1, 1], pa.int64()),
+        "title": ["A", "B"],
+        "date_filed": ["1995-01-01T00:00:00Z", "2005-01-01T00:00:00Z"],
+        "url": ["a", "b"],
+    })
+
+
+def test_read_chunks_fills_missing_columns_with_nulls(tmp_path):
+    path = str(tmp_path / "chunks.parquet")
+    pq.write_table(pre_court_table(), path)
+    table = read_chunks(path)
+    assert table.schema == CHUNK_SCHEMA
+    assert table.column("court").to_pylist() == [None, None]
+    assert table.column("text").to_pylist() == ["alpha", "beta"]
+
+
+def test_filters_work_on_a_conformed_old_table():
+    table = conform_chunks(pre_court_table())
+    assert SearchFilters(date_to="2000-12-31").mask(table).tolist() == [True, False]
+    # no chunk has a court yet, so a court filter matches nothing rather than erroring
+    assert SearchFilters(courts=["scotus"]).mask(table).tolist() == [False, False]
+
+
+def test_conform_is_a_no_op_on_current_tables():
+    table = conform_chunks(pre_court_table())
+    assert conform_chunks(table).equals(table)
+
+
+def write_store(path, texts):
+    writer = CorpusWriter(path, dim=4, stats=StageStats("write"), meta={"model_id": "m"})
+    records = [ChunkRecord(uuid=f"u{i}", properties={"doc_id": f"d{i}", "text": t}) for i, t in enumerate(texts)]
+    writer.put(records, np.arange(4 * len(texts), dtype=np.float32).reshape(len(texts), 4))
+    return writer
+
+
+def test_closed_writer_makes_a_loadable_store(tmp_path):
+    path = str(tmp_path / "store")
+    write_store(path, ["a", "b"]).close()
+    store = CorpusStore(path)
+    assert len(store) == 2 and store.meta["model_id"] == "m"
+    assert store.read_chunks().column("text").to_pylist() == ["a", "b"]
+
+
+def test_aborted_export_is_not_a_store(tmp_path):
+    path = str(tmp_path / "store")
+    write_store(path, ["a", "b"]).close()
+    # a failed re-export over a complete store must not leave the old meta.json vouching for it
+    write_store(path, ["c"]).abort()
+    assert not os.path.exists(os.path.join(path, META_FILE))
+    assert os.listdir(path) == []
+    with pytest.raises(ValueError, match="incomplete"):
+        CorpusStore(path)
@@ -0,0 +1,22 @@
+from utils.retriever.documents import stitch_chunks
+
+
+def test_adjacent_chunks_lose_their_overlap():
+    chunks = [(1, "four five six seven"), (0, "one two three four five")]
+    assert stitch_chunks(chunks) == "one two three four five six seven"
+
+
+def test_gaps_are_marked():
+    chunks = [(0, "one two"), (1, "two three"), (3, "seven eight")]
+    assert stitch_chunks(chunks, gap=" | ") == "one two three | seven eight"
+
+
+def test_overlap_is_bounded():
+    chunks = [(0, "a b c d"), (1, "b c d e")]
+    assert stitch_chunks(chunks, max_overlap=3) == "a b c d e"
+    assert stitch_chunks(chunks, max_overlap=2) == "a b c d b c d e"
+
+
+def test_no_overlap_and_empty():
+    assert stitch_chunks([(0, "x y"), (1, "z")]) == "x y z"
+    assert stitch_chunks([]) == ""
@@ -0,0 +1,98 @@
+import threading
+import zlib
+
+import numpy as np
+import pytest
+
+from utils.common.embedding_cache import EmbeddingCache
+
+DIM = 8
+
+
+def vec(text):
+    rng = np.random.default_rng(zlib.crc32(text.encode()))
+    return rng.standard_normal(DIM).astype(np.float32)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = EmbeddingCache(str(tmp_path / "cache"), "model", DIM, capacity=4)
+    yield c
+    c.close()
+
+
+def test_round_trip_and_normalize_flag(cache):
+    texts = ["a", "b", "c"]
+    cache.put_many(texts, np.stack([vec(t) for t in texts]))
+    out, hit = cache.get_many(["b", "x", "a"])
+    assert hit.tolist() == [True, False, True]
+    np.testing.assert_array_equal(out[0], vec("b"))
+    np.testing.assert_array_equal(out[1], np.zeros(DIM, np.float32))
+    np.testing.assert_array_equal(out[2], vec("a"))
+    # normalized and raw embeddings are separate entries
+    assert not cache.get_many(["a"], normalize=True)[1].any()
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_persists_across_reopen(tmp_path):
+    path = str(tmp_path / "cache")
+    c = EmbeddingCache(path, "model", DIM, capacity=4)
+    c.put_many(["a"], vec("a")[None])
+    c.close()
+    c = EmbeddingCache(path, "model", DIM, capacity=4)
+    out, hit = c.get_many(["a"])
+    c.close()
+    assert hit.all()
+    np.testing.assert_array_equal(out[0], vec("a"))
+    with pytest.raises(ValueError):
+        EmbeddingCache(path, "model", DIM + 1, capacity=4)
+
+
+def test_evicts_least_recently_used(cache):
+    for t in ["a", "b", "c", "d"]:
+        cache.put_many([t], vec(t)[None])
+    cache.get_many(["a"])                      # a is now the most recent
+    cache.put_many(["e", "f"], np.stack([vec("e"), vec("f")]))
+    assert len(cache) == 4
+    _, hit = cache.get_many(["a", "b", "c", "d", "e", "f"])
+    assert hit.tolist() == [True, False, False, True, True, True]
+    out, _ = cache.get_many(["e", "f", "a", "d"])
+    np.testing.assert_array_equal(out, np.stack([vec(t) for t in ["e", "f", "a", "d"]]))
+
+
+def test_duplicates_and_overflow_in_one_put(cache):
+    texts = ["a", "a", "b", "c", "d", "e", "f"]
+    cache.put_many(texts, np.stack([vec(t) for t in texts]))
+    assert len(cache) == 4
+    out, hit = cache.get_many(["a", "b", "c", "d"])
+    assert hit.all()
+    np.testing.assert_array_equal(out, np.stack([vec(t) for t in ["a", "b", "c", "d"]]))
+
+
+def test_concurrent_readers_and_writers_never_see_a_foreign_vector(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache"), "model", DIM, capacity=16)
+    words = [f"w{i}" for i in range(64)]   # 4x capacity: slots are evicted and refilled constantly
+    errors = []
+
+    def worker(seed):
+        rng = np.random.default_rng(seed)
+        try:
+            for _ in range(150):
+                batch = list(rng.choice(words, size=5, replace=False))
+                if rng.random() < 0.5:
+                    cache.put_many(batch, np.stack([vec(t) for t in batch]))
+                else:
+                    out, hit = cache.get_many(batch)
+                    for t, row, h in zip(batch, out, hit):
+                        if h and not np.array_equal(row, vec(t)):
+                            errors.append(t)
+        except Exception as e:   # surfaced below; a thread exception alone wouldn't fail the test
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=worker, args=(s,)) for s in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cache.close()
+    assert errors == []
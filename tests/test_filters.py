@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pytest
+
+from utils.retriever.filters import SearchFilters
+
+
+def chunk_table():
+    return pa.table({
+        "doc_id": ["d1", "d2", "d3", "d4"],
+        "court": ["scotus", "ca9", None, "scotus"],
+        "date_filed": ["1989-12-31T23:59:59Z", "1990-01-01T00:00:00Z", "1999-12-31T12:00:00Z", None],
+    })
+
+
+def test_normalizes_dates_and_sets():
+    f = SearchFilters(date_from="1990-01-01", date_to="1999-12-31", doc_ids=["b", "a", "b"], courts="scotus")
+    assert f.date_from == datetime(1990, 1, 1, tzinfo=timezone.utc)
+    assert f.date_to == datetime(1999, 12, 31, 23, 59, 59, 999999, tzinfo=timezone.utc)
+    assert f.doc_ids == ("a", "b")
+    assert f.courts == ("scotus",)
+    # normalized field values make equal filters hash alike (result-cache keys)
+    assert f == SearchFilters(date_from="1990-01-01T00:00:00Z", date_to="1999-12-31", doc_ids=("a", "b"),
+                              courts=["scotus"])
+
+
+def test_empty_and_inverted_ranges():
+    assert SearchFilters().is_empty()
+    assert SearchFilters(date_from="").is_empty()
+    assert not SearchFilters(courts=[]).is_empty()
+    with pytest.raises(ValueError):
+        SearchFilters(date_from="2000-01-02", date_to="2000-01-01")
+
+
+def test_mask_on_chunk_table():
+    table = chunk_table()
+    assert SearchFilters().mask(table).tolist() == [True] * 4
+    assert SearchFilters(date_from="1990-01-01", date_to="1999-12-31").mask(table).tolist() == \
+        [False, True, True, False]
+    assert SearchFilters(courts=["scotus"]).mask(table).tolist() == [True, False, False, True]
+    assert SearchFilters(doc_ids=["d2", "d4"], courts=["ca9"]).mask(table).tolist() == [False, True, False, False]
+
+
+def test_mask_without_court_column_matches_nothing():
+    table = chunk_table().drop(["court"])
+    assert SearchFilters(courts=["scotus"]).mask(table).tolist() == [False] * 4
+
+
+def test_to_weaviate():
+    pytest.importorskip("weaviate")
+    assert SearchFilters().to_weaviate() is None
+    assert SearchFilters(courts=["scotus"]).to_weaviate() is not None
+    assert SearchFilters(date_from="1990-01-01", courts=["scotus"]).to_weaviate() is not None
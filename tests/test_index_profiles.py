@@ -0,0 +1,52 @@
+import pytest
+
+from utils.pipelines.index_profiles import EMBED_DIMS, PROFILES, IndexProfile, describe_profile, get_profile
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"index_type": "ivf"},
+    {"quantizer": "opq"},
+    {"index_type": "flat", "quantizer": "pq"},
+    {"index_type": "flat", "quantizer": "sq"},
+    {"quantizer": "pq", "pq_segments": 100},
+])
+def test_invalid_profiles(kwargs):
+    with pytest.raises(ValueError):
+        IndexProfile("bad", **kwargs)
+
+
+def test_memory_estimate():
+    n = 1000
+    graph = 2 * 32 * 8
+    assert get_profile("default").estimate_memory_bytes(n) == n * (EMBED_DIMS * 4 + graph)
+    assert get_profile("hnsw-pq").estimate_memory_bytes(n) == n * (EMBED_DIMS // 4 + graph)
+    assert get_profile("hnsw-sq").estimate_memory_bytes(n) == n * (EMBED_DIMS + graph)
+    assert get_profile("hnsw-bq").estimate_memory_bytes(n) == n * (EMBED_DIMS // 8 + graph)
+    assert get_profile("hnsw-recall").estimate_memory_bytes(n) == n * (EMBED_DIMS * 4 + 2 * 48 * 8)
+    # flat keeps nothing resident unless the bq cache is on
+    assert get_profile("flat").estimate_memory_bytes(n) == 0
+    assert get_profile("flat-bq").estimate_memory_bytes(n) == n * (EMBED_DIMS // 8)
+
+
+def test_get_profile_overrides():
+    assert get_profile("default") is PROFILES["default"]
+    assert get_profile("default", ef=None) is PROFILES["default"]
+    tuned = get_profile("hnsw-sq", ef=128, rescore_limit=50)
+    assert (tuned.ef, tuned.rescore_limit, tuned.quantizer) == (128, 50, "sq")
+    assert PROFILES["hnsw-sq"].ef is None
+    with pytest.raises(ValueError):
+        get_profile("hnsw-sq", quantizer="nope")
+    with pytest.raises(ValueError, match="Unknown index profile"):
+        get_profile("missing")
+
+
+def test_describe_profile():
+    text = describe_profile(get_profile("hnsw-bq"), n_vectors=1_000_000)
+    assert text.startswith("'hnsw-bq': hnsw, bq (rescore 400)")
+    assert "GiB vector index" in text
+
+
+def test_vector_index_config():
+    pytest.importorskip("weaviate")
+    for profile in PROFILES.values():
+        assert profile.vector_index_config() is not None
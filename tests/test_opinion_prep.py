@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.pipelines.opinion_prep import EPOCH, clean_text, clean_text_column, norm_date, norm_date_column
+
+
+TEXTS = [
+    "plain",
+    "  leading and trailing  ",
+    "tabs\tand\nnewlines\r\n\fand\vfeeds",
+    "many     spaces   here",
+    "\n\n",
+    "",
+    "unicode – § 1983 café",
+]
+
+
+def test_clean_text_column_matches_scalar():
+    assert clean_text_column(pd.Series(TEXTS)) == [clean_text(t) for t in TEXTS]
+
+
+def test_clean_text_column_missing_values():
+    series = pd.Series(["a\tb", None, np.nan, 42], dtype=object)
+    assert clean_text_column(series) == ["a b", "", "", "42"]
+
+
+@pytest.mark.parametrize("dates", [
+    ["1999-03-05", "1999-03-05T10:20:30Z", "2001-07-04T00:00:00+02:00", "March 5, 1999", "05/03/1999",
+     "not a date", "", "   ", None],
+    ["2010-01-01", "2011-02-03"],
+    [None, None],
+])
+def test_norm_date_column_matches_scalar(dates):
+    series = pd.Series(dates, dtype=object)
+    assert norm_date_column(series) == [norm_date(d) for d in dates]
+
+
+def test_norm_date_column_non_string_dtypes():
+    series = pd.Series(pd.to_datetime(["1999-03-05", None]))
+    assert norm_date_column(series) == ["1999-03-05T00:00:00Z", EPOCH]
@@ -0,0 +1,95 @@
+"""Process registry: one load per model under races, pooled clients, health checks off the global lock."""
+import threading
+import time
+
+import pytest
+
+from utils.common import registry
+
+
+class FakeClient:
+    connects = 0
+
+    def __init__(self, ready_delay=0.0):
+        FakeClient.connects += 1
+        self.ready = True
+        self.closed = False
+        self.ready_delay = ready_delay
+
+    def is_ready(self):
+        time.sleep(self.ready_delay)
+        return self.ready
+
+    def close(self):
+        self.closed = True
+
+    def connect(self):
+        self.ready, self.closed = True, False
+
+
+@pytest.fixture(autouse=True)
+def clean_registry(monkeypatch):
+    registry.close_all()
+    registry._client_locks.clear()
+    FakeClient.connects = 0
+    monkeypatch.setattr(registry, "_connect", lambda key: FakeClient())
+    yield
+    registry.close_all()
+
+
+def test_model_loads_once_under_concurrent_first_use():
+    loads = []
+
+    def loader():
+        time.sleep(0.05)
+        loads.append(1)
+        return object()
+
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(registry.get_model("k", loader, "m"))) for _ in range(8)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    assert len(loads) == 1
+    assert len({id(m) for m in got}) == 1
+    assert registry.registry_stats()["models"] == ["m"]
+
+
+def test_clients_are_pooled_per_endpoint():
+    a = registry.get_client("h")
+    b = registry.get_client("h")
+    c = registry.get_client("h", use_tls=True)
+    assert a is b and a is not c
+    assert FakeClient.connects == 2
+    assert registry.registry_stats()["clients"] == {"http://h:8080": 2, "https://h:8080": 1}
+    registry.release_client(a)
+    assert registry.registry_stats()["clients"]["http://h:8080"] == 1
+
+
+def test_unhealthy_client_is_reconnected_in_place(monkeypatch):
+    a = registry.get_client("h")
+    a.ready = False
+    monkeypatch.setattr(registry, "HEALTH_CHECK_SECONDS", 0.0)
+    assert registry.get_client("h") is a
+    assert a.ready and FakeClient.connects == 1
+
+
+def test_close_all_closes_pooled_clients():
+    a = registry.get_client("h")
+    registry.close_all()
+    assert a.closed
+    assert registry.registry_stats() == {"models": [], "clients": {}}
+
+
+def test_slow_health_check_does_not_block_other_registry_users(monkeypatch):
+    slow = registry.get_client("slow")
+    slow.ready_delay = 0.5
+    monkeypatch.setattr(registry, "HEALTH_CHECK_SECONDS", 0.0)
+    probe = threading.Thread(target=registry.get_client, args=("slow",))
+    probe.start()
+    time.sleep(0.05)   # the probe is now inside is_ready()
+    t0 = time.monotonic()
+    registry.get_model("other", object, "other")
+    registry.get_client("fast")
+    registry.registry_stats()
+    assert time.monotonic() - t0 < 0.2
+    probe.join()
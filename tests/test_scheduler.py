@@ -0,0 +1,139 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.models.llm.generation import GenerateConfig
+from utils.models.llm.scheduler import GenerationScheduler
+
+
+class FakeManager:
+    """Stands in for HFModelManager: one word per token, echoes each prompt back."""
+    def __init__(self, fail_with=None, gate=None):
+        self.calls = []
+        self.fail_with = fail_with
+        self.gate = gate
+        self.lock = threading.Lock()
+
+    def render_prompt(self, messages_or_prompt):
+        if isinstance(messages_or_prompt, str):
+            return messages_or_prompt
+        return " ".join(m["content"] for m in messages_or_prompt)
+
+    def count_tokens(self, prompt, max_tokens):
+        return min(len(prompt.split()), max_tokens)
+
+    def make_batch_inference(self, prompts, gen_cfg, adapter=None):
+        if self.gate is not None:
+            self.gate.wait(5)
+        with self.lock:
+            self.calls.append((list(prompts), gen_cfg, adapter))
+        if self.fail_with is not None:
+            raise self.fail_with
+        return [f"{adapter}:{p} STOP tail" for p in prompts]
+
+
+def test_concurrent_requests_share_batches_and_get_their_own_output():
+    manager = FakeManager()
+    scheduler = GenerationScheduler(manager, max_batch_size=4, max_wait_ms=200)
+    prompts = [f"prompt {i}" for i in range(8)]
+    with ThreadPoolExecutor(8) as pool:
+        outputs = list(pool.map(lambda p: scheduler.generate(p, timeout=5), prompts))
+    scheduler.close()
+    assert outputs == [f"None:{p} STOP tail" for p in prompts]
+    assert all(len(prompts) <= 4 for prompts, _, _ in manager.calls)
+    stats = scheduler.stats()
+    assert stats["generated"] == 8 and stats["pending"] == 0
+    assert stats["batches"] < 8
+
+
+def test_batches_split_by_adapter_settings_and_length():
+    manager = FakeManager(gate=threading.Event())
+    scheduler = GenerationScheduler(manager, max_batch_size=16, max_wait_ms=50, length_bucket=4)
+    cold = GenerateConfig(temperature=0.1)
+    futures = [
+        scheduler.submit("a b", adapter="irac"),
+        scheduler.submit("c d", adapter=None),
+        scheduler.submit("e f", cold, adapter="irac"),
+        scheduler.submit("g h i j k l", adapter="irac"),   # next length bucket
+        scheduler.submit("m n", adapter="irac"),
+    ]
+    manager.gate.set()
+    results = [f.result(timeout=5) for f in futures]
+    scheduler.close()
+    assert results[1] == "None:c d STOP tail"
+    batches = sorted((sorted(p), cfg.temperature, a) for p, cfg, a in manager.calls)
+    assert batches == sorted([
+        (["a b", "m n"], GenerateConfig().temperature, "irac"),
+        (["c d"], GenerateConfig().temperature, None),
+        (["e f"], 0.1, "irac"),
+        (["g h i j k l"], GenerateConfig().temperature, "irac"),
+    ])
+
+
+def test_stop_strings_are_applied_per_caller_without_splitting_the_batch():
+    manager = FakeManager()
+    scheduler = GenerationScheduler(manager, max_batch_size=2, max_wait_ms=500)
+    a = scheduler.submit("x", GenerateConfig(stop=["STOP"]))
+    b = scheduler.submit("y", GenerateConfig(stop=["tail"]))
+    assert a.result(timeout=5) == "None:x "
+    assert b.result(timeout=5) == "None:y STOP "
+    scheduler.close()
+    assert len(manager.calls) == 1
+    assert manager.calls[0][1].stop is None
+
+
+def test_chat_messages_are_rendered():
+    scheduler = GenerationScheduler(FakeManager(), max_batch_size=1)
+    messages = [{"role": "system", "content": "be brief"}, {"role": "user", "content": "hi"}]
+    assert scheduler.generate(messages, timeout=5) == "None:be brief hi STOP tail"
+    scheduler.close()
+
+
+def test_generation_errors_fail_the_batch_but_not_the_worker():
+    manager = FakeManager(fail_with=ValueError("cuda oom"))
+    scheduler = GenerationScheduler(manager, max_batch_size=1, max_wait_ms=1)
+    with pytest.raises(ValueError, match="cuda oom"):
+        scheduler.generate("a", timeout=5)
+    manager.fail_with = None
+    assert scheduler.generate("b", timeout=5) == "None:b STOP tail"
+    scheduler.close()
+    assert scheduler.stats()["errors"] == 1
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")   # the worker re-raises
+def test_base_exception_fails_everything_pending_and_closes():
+    manager = FakeManager(fail_with=KeyboardInterrupt(), gate=threading.Event())
+    scheduler = GenerationScheduler(manager, max_batch_size=1, max_wait_ms=1)
+    futures = [scheduler.submit(p) for p in ("a", "b", "c")]
+    manager.gate.set()
+    for f in futures:
+        with pytest.raises(RuntimeError, match="Generation scheduler stopped"):
+            f.result(timeout=5)
+    scheduler._worker.join(5)
+    assert not scheduler._worker.is_alive()
+    with pytest.raises(RuntimeError, match="closed"):
+        scheduler.submit("d")
+
+
+def test_close_drains_queue_then_rejects():
+    manager = FakeManager(gate=threading.Event())
+    scheduler = GenerationScheduler(manager, max_batch_size=2, max_wait_ms=10_000)
+    futures = [scheduler.submit(p) for p in ("a", "b", "c")]
+    manager.gate.set()
+    scheduler.close()
+    assert [f.result(timeout=0) for f in futures] == [f"None:{p} STOP tail" for p in ("a", "b", "c")]
+    with pytest.raises(RuntimeError):
+        scheduler.submit("d")
+
+
+def test_agenerate():
+    import asyncio
+
+    scheduler = GenerationScheduler(FakeManager(), max_batch_size=4, max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(*(scheduler.agenerate(p, GenerateConfig(stop=[" STOP"])) for p in "abc"))
+
+    assert asyncio.run(main()) == ["None:a", "None:b", "None:c"]
+    scheduler.close()
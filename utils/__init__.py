@@ -1,9 +1,12 @@
 # utils/__init__.py
-from . import common
-from . import ui
-from . import retriever
-from . import features
-from . import models
-from . import pipelines
+# Subpackages load on first attribute access: the API's retriever/encoder path
+# must not drag in utils.pipelines (torch, transformers, peft via the LLM).
+import importlib
 
 __all__ = ["common", "ui", "retriever", "features", "models", "pipelines"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
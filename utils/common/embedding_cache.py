@@ -0,0 +1,194 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache. Vectors live in a preallocated memory-mapped float32
+    array (`vectors.f32`, capacity x dim); a sqlite index maps
+    sha1(model, normalize flag, text) -> row slot. When full, the least recently
+    used entries give up their slots.
+
+    Slot allocation and lookups (including the vector copy) happen inside
+    IMMEDIATE sqlite transactions, so several processes (ingest workers,
+    uvicorn workers) can share one cache directory.
+    """
+    def __init__(self, path: str, model_id: str, dim: int, capacity: int = 1_000_000):
+        self.path = path
+        self.model_id = model_id
+        self.dim = dim
+        self.capacity = capacity
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            os.path.join(path, "index.sqlite"), isolation_level=None, check_same_thread=False, timeout=60,
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, slot INTEGER UNIQUE, last_used INTEGER)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used)")
+        self._check_meta()
+
+        vec_path = os.path.join(path, "vectors.f32")
+        mode = "r+" if os.path.exists(vec_path) else "w+"
+        self.vectors = np.memmap(vec_path, dtype=np.float32, mode=mode, shape=(capacity, dim))
+        self.hits = 0
+        self.misses = 0
+
+    def _check_meta(self) -> None:
+        rows = dict(self.conn.execute("SELECT k, v FROM meta").fetchall())
+        want = {"dim": str(self.dim), "capacity": str(self.capacity)}
+        if not rows:
+            self.conn.executemany("INSERT INTO meta (k, v) VALUES (?, ?)", list(want.items()))
+            return
+        if rows != want:
+            raise ValueError(f"Embedding cache at {self.path} was built with {rows}, not {want}")
+
+    def key(self, text: str, normalize: bool = False) -> bytes:
+        return hashlib.sha1(f"{self.model_id}\x1f{int(normalize)}\x1f{text}".encode("utf-8")).digest()
+
+    def _tick(self) -> int:
+        row = self.conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM entries").fetchone()
+        return int(row[0]) + 1
+
+    def get_many(self, texts: Sequence[str], normalize: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (vectors, hit_mask); rows for misses are zeros."""
+        keys = [self.key(t, normalize) for t in texts]
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        hit = np.zeros(len(texts), dtype=bool)
+        if not keys:
+            return out, hit
+        with self._lock:
+            # IMMEDIATE: no other process may evict and refill a slot between the
+            # lookup and the copy below, and the LRU bumps commit as one write
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                found = {}
+                for i in range(0, len(keys), 900):   # sqlite host-parameter limit
+                    part = keys[i:i + 900]
+                    q = f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(part))})"
+                    found.update(self.conn.execute(q, part).fetchall())
+                for i, k in enumerate(keys):
+                    slot = found.get(k)
+                    if slot is not None:
+                        out[i] = self.vectors[slot]
+                        hit[i] = True
+                if found:
+                    tick = self._tick()
+                    self.conn.executemany(
+                        "UPDATE entries SET last_used = ? WHERE key = ?", [(tick, k) for k in found]
+                    )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        self.hits += int(hit.sum())
+        self.misses += len(keys) - int(hit.sum())
+        return out, hit
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray, normalize: bool = False) -> None:
+        keys = list(dict.fromkeys(self.key(t, normalize) for t in texts))
+        rows = {self.key(t, normalize): i for i, t in enumerate(texts)}
+        keys = keys[: self.capacity]
+        if not keys:
+            return
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                present = set()
+                for i in range(0, len(keys), 900):
+                    part = keys[i:i + 900]
+                    q = f"SELECT key FROM entries WHERE key IN ({','.join('?' * len(part))})"
+                    present.update(k for (k,) in self.conn.execute(q, part).fetchall())
+                new = [k for k in keys if k not in present]
+                if new:
+                    slots = self._allocate(len(new))
+                    for k, slot in zip(new, slots):
+                        self.vectors[slot] = vectors[rows[k]]
+                    self.vectors.flush()
+                    tick = self._tick()
+                    self.conn.executemany(
+                        "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                        [(k, slot, tick) for k, slot in zip(new, slots)],
+                    )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _allocate(self, n: int) -> List[int]:
+        used = self.conn.execute("SELECT COUNT(*), COALESCE(MAX(slot), -1) FROM entries").fetchone()
+        count, top = int(used[0]), int(used[1])
+        slots: List[int] = []
+        if count == top + 1:   # densely packed: take fresh slots from the end
+            slots = list(range(top + 1, min(top + 1 + n, self.capacity)))
+        else:
+            taken = {s for (s,) in self.conn.execute("SELECT slot FROM entries").fetchall()}
+            slots = [s for s in range(self.capacity) if s not in taken][:n]
+        short = n - len(slots)
+        if short > 0:
+            victims = self.conn.execute(
+                "SELECT key, slot FROM entries ORDER BY last_used ASC LIMIT ?", (short,)
+            ).fetchall()
+            self.conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+            slots.extend(s for _, s in victims)
+        return slots
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0])
+
+    def close(self) -> None:
+        with self._lock:
+            self.vectors.flush()
+            self.conn.close()
+
+
+class CachedEncoder:
+    """
+    SentenceTransformer-compatible `encode` that serves cached vectors and only
+    runs the model on misses.
+    """
+    def __init__(self, model, cache: EmbeddingCache):
+        self.model = model
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        **kwargs,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vecs, hit = self.cache.get_many(texts, normalize=normalize_embeddings)
+        miss = np.flatnonzero(~hit)
+        if len(miss):
+            fresh = np.asarray(self.model.encode(
+                [texts[i] for i in miss],
+                batch_size=batch_size,
+                normalize_embeddings=normalize_embeddings,
+                convert_to_numpy=True,
+            ), dtype=np.float32)
+            vecs[miss] = fresh
+            self.cache.put_many([texts[i] for i in miss], fresh, normalize=normalize_embeddings)
+        return vecs[0] if single else vecs
+
+
+def open_cached_encoder(model, model_id: str, path: Optional[str], capacity: int = 1_000_000):
+    """Wrap `model` with an on-disk cache at `path`; returns `model` unchanged when path is falsy."""
+    if not path:
+        return model
+    dim = model.get_sentence_embedding_dimension()
+    return CachedEncoder(model, EmbeddingCache(path, model_id, dim, capacity=capacity))
@@ -0,0 +1,109 @@
+"""
+Per-collection write epochs kept in a tiny Weaviate collection, so every process
+that talks to the same Weaviate node (ingest jobs, uvicorn workers) agrees on
+when a collection last changed. Result caches key on the epoch; a bump makes
+all older entries unreachable.
+"""
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from weaviate.classes.config import Configure, Property, DataType
+from weaviate.util import generate_uuid5
+
+EPOCH_COLLECTION = "IndexEpochs"
+
+
+def _epochs(client):
+    if EPOCH_COLLECTION not in client.collections.list_all():
+        client.collections.create(
+            name=EPOCH_COLLECTION,
+            properties=[
+                Property(name="index", data_type=DataType.TEXT),
+                Property(name="epoch", data_type=DataType.INT),
+            ],
+            vector_config=Configure.Vectors.self_provided(),
+        )
+    return client.collections.get(EPOCH_COLLECTION)
+
+
+def bump_epoch(client, index: str) -> int:
+    """Mark `index` as changed. Epochs are wall-clock milliseconds, so concurrent bumps never collide backwards."""
+    coll = _epochs(client)
+    uuid = generate_uuid5(index)
+    epoch = time.time_ns() // 1_000_000
+    props = {"index": index, "epoch": epoch}
+    if coll.data.exists(uuid):
+        coll.data.replace(uuid=uuid, properties=props)
+    else:
+        coll.data.insert(properties=props, uuid=uuid)
+    return epoch
+
+
+def read_epoch(client, index: str) -> int:
+    """0 when `index` has never been bumped."""
+    if EPOCH_COLLECTION not in client.collections.list_all():
+        return 0
+    obj = client.collections.get(EPOCH_COLLECTION).query.fetch_object_by_id(generate_uuid5(index))
+    if obj is None:
+        return 0
+    return int(obj.properties.get("epoch") or 0)
+
+
+async def read_epoch_async(client, index: str) -> int:
+    """`read_epoch` for a `WeaviateAsyncClient`."""
+    if EPOCH_COLLECTION not in await client.collections.list_all():
+        return 0
+    obj = await client.collections.get(EPOCH_COLLECTION).query.fetch_object_by_id(generate_uuid5(index))
+    if obj is None:
+        return 0
+    return int(obj.properties.get("epoch") or 0)
+
+
+class EpochWatcher:
+    """Caches `read_epoch` for `refresh_seconds` so lookups don't cost a round trip per query."""
+    def __init__(self, client, index: str, refresh_seconds: float = 5.0):
+        self.client = client
+        self.index = index
+        self.refresh_seconds = refresh_seconds
+        self._epoch: Optional[int] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> int:
+        with self._lock:
+            now = time.monotonic()
+            if self._epoch is None or now - self._checked >= self.refresh_seconds:
+                try:
+                    self._epoch = read_epoch(self.client, self.index)
+                except Exception as e:
+                    print(f"[WARN] Could not read epoch for '{self.index}': {e}")
+                    self._epoch = self._epoch or 0
+                self._checked = now
+            return self._epoch
+
+
+class AsyncEpochWatcher:
+    """`EpochWatcher` for the async client; concurrent callers share one refresh."""
+    def __init__(self, client, index: str, refresh_seconds: float = 5.0):
+        self.client = client
+        self.index = index
+        self.refresh_seconds = refresh_seconds
+        self._epoch: Optional[int] = None
+        self._checked = 0.0
+        self._lock = asyncio.Lock()
+
+    async def current(self) -> int:
+        if self._epoch is not None and time.monotonic() - self._checked < self.refresh_seconds:
+            return self._epoch
+        async with self._lock:
+            now = time.monotonic()
+            if self._epoch is None or now - self._checked >= self.refresh_seconds:
+                try:
+                    self._epoch = await read_epoch_async(self.client, self.index)
+                except Exception as e:
+                    print(f"[WARN] Could not read epoch for '{self.index}': {e}")
+                    self._epoch = self._epoch or 0
+                self._checked = now
+            return self._epoch
@@ -0,0 +1,179 @@
+"""
+CPU query encoder without PyTorch: all-MiniLM-L6-v2 exported to ONNX, int8
+dynamically quantized, and served by onnxruntime with mean pooling done in
+numpy. Export needs torch + transformers once; serving only needs onnxruntime
+and tokenizers.
+
+    export_onnx(EMBED_MODEL_ID, "./models/minilm-onnx")     # also runs check_accuracy
+    enc = OnnxEncoder("./models/minilm-onnx", threads=2)
+    enc.encode(["fourth amendment search"], normalize_embeddings=True)
+
+Documents stay embedded by the PyTorch model at ingest; the accuracy check
+compares query vectors from both backends so a bad export is caught before it
+silently shifts rankings.
+"""
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+META_FILE = "onnx_meta.json"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+# short legal queries, the shape of what the API actually encodes
+SAMPLE_QUERIES = (
+    "fourth amendment warrantless search of a vehicle",
+    "breach of contract damages for lost profits",
+    "jurisdiction over murder committed on the high seas",
+    "ineffective assistance of counsel at sentencing",
+    "qualified immunity excessive force police officer",
+    "statute of limitations for medical malpractice claims",
+    "Miranda warnings custodial interrogation of a juvenile",
+    "wire fraud scheme involving interstate transfers",
+    "adverse possession of land by a neighbor",
+    "first amendment retaliation against a public employee",
+    "summary judgment standard genuine dispute of material fact",
+    "habeas corpus petition procedural default",
+)
+
+
+class OnnxEncoder:
+    """SentenceTransformer-compatible `encode` over an exported, optionally int8, ONNX model."""
+    def __init__(self, path: str, threads: Optional[int] = None, quantized: bool = True):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        accuracy = self.meta.get("accuracy") or {}
+        if accuracy and not accuracy.get("passed", True):
+            print(f"[WARN] ONNX export in {path} failed its accuracy check "
+                  f"(min cosine {accuracy.get('min_cosine')}); rankings may drift")
+        self.model_id = self.meta["model_id"]
+        self.max_seq_length = int(self.meta["max_length"])
+        self.dim = int(self.meta["dim"])
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+        model_file = INT8_FILE if quantized and os.path.exists(os.path.join(path, INT8_FILE)) else FP32_FILE
+        self.session = ort.InferenceSession(os.path.join(path, model_file), opts, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(path, TOKENIZER_FILE))
+        self._tokenizer.enable_truncation(max_length=self.max_seq_length)
+        pad_id = self._tokenizer.token_to_id("[PAD]") or 0
+        self._tokenizer.enable_padding(pad_id=pad_id, pad_token="[PAD]")
+        print(f"[INFO] ONNX encoder {self.model_id} ({model_file}, {threads or 'default'} threads)")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        **_: Any,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            enc = self._tokenizer.encode_batch(texts[start:start + batch_size])
+            ids = np.array([e.ids for e in enc], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in enc], dtype=np.int64)
+            types = np.array([e.type_ids for e in enc], dtype=np.int64)
+            feeds = {"input_ids": ids, "attention_mask": mask, "token_type_ids": types}
+            hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self._inputs})[0]
+            # sentence-transformers mean pooling over real (unpadded) tokens
+            m = mask[..., None].astype(np.float32)
+            out[start:start + len(enc)] = (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+        if normalize_embeddings:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out[0] if single else out
+
+
+def check_accuracy(encoder, reference, sentences: Sequence[str] = SAMPLE_QUERIES,
+                   min_cosine: float = 0.98) -> Dict[str, Any]:
+    """
+    Cosine similarity between `encoder` and `reference` (the PyTorch model) vectors
+    for the same sentences, plus per-query latency of each on one-sentence calls.
+    """
+    sentences = list(sentences)
+    a = np.asarray(encoder.encode(sentences, normalize_embeddings=True), dtype=np.float32)
+    b = np.asarray(reference.encode(sentences, normalize_embeddings=True), dtype=np.float32)
+    cos = (a * b).sum(axis=1)
+
+    def per_query_ms(model) -> float:
+        t0 = time.perf_counter()
+        for s in sentences:
+            model.encode([s], normalize_embeddings=True)
+        return round((time.perf_counter() - t0) * 1000 / len(sentences), 3)
+
+    report = {
+        "n": len(sentences),
+        "mean_cosine": round(float(cos.mean()), 5),
+        "min_cosine": round(float(cos.min()), 5),
+        "threshold": min_cosine,
+        "passed": bool(cos.min() >= min_cosine),
+        "onnx_ms_per_query": per_query_ms(encoder),
+        "torch_ms_per_query": per_query_ms(reference),
+    }
+    status = "passed" if report["passed"] else "FAILED"
+    print(f"[INFO] ONNX accuracy check {status}: mean cosine {report['mean_cosine']}, min {report['min_cosine']} "
+          f"(threshold {min_cosine}); {report['onnx_ms_per_query']} ms vs {report['torch_ms_per_query']} ms per query")
+    return report
+
+
+def export_onnx(model_id: str, out_dir: str, quantize: bool = True, max_length: int = 256,
+                opset: int = 17, min_cosine: float = 0.98, threads: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Export `model_id`'s transformer to ONNX (dynamic batch/sequence axes), add an
+    int8 dynamically quantized copy, and record an accuracy check against the
+    PyTorch SentenceTransformer in `onnx_meta.json`. Returns the meta dict.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tok = AutoTokenizer.from_pretrained(model_id)
+    tok.save_pretrained(out_dir)   # writes tokenizer.json for the `tokenizers` runtime
+    model = AutoModel.from_pretrained(model_id).eval()
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    dummy = tok(["a short legal query"], return_tensors="pt")
+    fp32 = os.path.join(out_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(dummy[n] for n in names), fp32,
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes={n: {0: "batch", 1: "seq"} for n in names + ["last_hidden_state"]},
+            opset_version=opset,
+        )
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32, os.path.join(out_dir, INT8_FILE), weight_type=QuantType.QInt8)
+
+    reference = SentenceTransformer(model_id, device="cpu")
+    meta = {
+        "model_id": model_id,
+        "max_length": min(max_length, reference.max_seq_length),
+        "dim": reference.get_sentence_embedding_dimension(),
+        "quantized": quantize,
+        "opset": opset,
+    }
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    meta["accuracy"] = check_accuracy(OnnxEncoder(out_dir, threads=threads, quantized=quantize), reference,
+                                      min_cosine=min_cosine)
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"[INFO] Exported {model_id} to {out_dir}")
+    return meta
@@ -0,0 +1,224 @@
+"""
+Process-wide registry for the heavy, shareable pieces: models are loaded once
+per process no matter how many retrievers/ingesters ask for them, and sync
+Weaviate clients are pooled per (host, ports, TLS, API key).
+
+    model = get_encoder(EMBED_MODEL_ID)           # shared SentenceTransformer
+    client = get_client("127.0.0.1", 8080, 50051)
+    ...
+    release_client(client)                        # stays pooled; closed at exit
+
+Pooled clients are health checked (`is_ready`) when handed out, at most every
+`HEALTH_CHECK_SECONDS`, and reconnected in place if the node went away.
+Everything is closed at interpreter exit.
+"""
+import atexit
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+HEALTH_CHECK_SECONDS = 30.0
+
+_lock = threading.Lock()
+_models: Dict[Hashable, "SharedModel"] = {}
+_model_locks: Dict[Hashable, threading.Lock] = {}
+
+
+class SharedModel:
+    """
+    Thread-safe facade over one loaded model. Fast tokenizers refuse concurrent
+    use from several threads, so `encode`/`predict` are serialized; torch already
+    spreads a single batch over all cores, so little is lost. Everything else
+    (max_seq_length, tokenizer, ...) is passed through.
+    """
+    def __init__(self, model, model_id: str):
+        self.model = model
+        self.model_id = model_id
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def encode(self, *args, **kwargs):
+        with self._lock:
+            return self.model.encode(*args, **kwargs)
+
+    def predict(self, *args, **kwargs):
+        with self._lock:
+            return self.model.predict(*args, **kwargs)
+
+
+def get_model(key: Hashable, loader: Callable[[], Any], model_id: Optional[str] = None) -> SharedModel:
+    """The model registered under `key`, loading it with `loader()` on first use (once, even under races)."""
+    model = _models.get(key)
+    if model is not None:
+        return model
+    with _lock:
+        key_lock = _model_locks.setdefault(key, threading.Lock())
+    with key_lock:   # other keys keep loading in parallel
+        model = _models.get(key)
+        if model is None:
+            t0 = time.perf_counter()
+            model = SharedModel(loader(), model_id or str(key))
+            _models[key] = model
+            print(f"[INFO] Loaded {model.model_id} in {time.perf_counter() - t0:.1f}s")
+    return model
+
+
+def get_encoder(model_id: str, device: Optional[str] = None, backend: str = "torch",
+                onnx_dir: Optional[str] = None, threads: Optional[int] = None) -> SharedModel:
+    """
+    Shared encoder for `model_id`: the PyTorch SentenceTransformer, or with
+    backend="onnx" the int8 onnxruntime encoder in `onnx_dir` (exported on first
+    use if the directory is empty, which needs torch once).
+    """
+    if backend == "onnx":
+        if not onnx_dir:
+            raise ValueError("backend='onnx' needs onnx_dir")
+
+        def load_onnx():
+            from utils.common.onnx_encoder import META_FILE, OnnxEncoder, export_onnx
+            if not os.path.exists(os.path.join(onnx_dir, META_FILE)):
+                export_onnx(model_id, onnx_dir, threads=threads)
+            encoder = OnnxEncoder(onnx_dir, threads=threads)
+            if encoder.model_id != model_id:
+                raise ValueError(f"{onnx_dir} holds {encoder.model_id}, not {model_id}")
+            return encoder
+        return get_model(("onnx", model_id, onnx_dir, threads), load_onnx, f"{model_id} (onnx)")
+    if backend != "torch":
+        raise ValueError(f"Unknown encoder backend '{backend}'")
+
+    def load():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_id, device=device)
+    return get_model(("sentence-transformer", model_id, device), load, model_id)
+
+
+def get_cross_encoder(model_id: str, max_length: int = 512, device: Optional[str] = None) -> SharedModel:
+    """Shared sentence-transformers CrossEncoder for `model_id`."""
+    def load():
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(model_id, max_length=max_length, device=device)
+    return get_model(("cross-encoder", model_id, max_length, device), load, model_id)
+
+
+# ---- Weaviate clients ----
+ClientKey = Tuple[str, int, int, bool, Optional[str]]
+
+
+@dataclass
+class _PooledClient:
+    client: Any
+    refs: int = 0
+    checked_at: float = 0.0
+
+
+_clients: Dict[ClientKey, _PooledClient] = {}
+_client_locks: Dict[ClientKey, threading.Lock] = {}
+
+
+def _connect_kwargs(host: str, http_port: int, grpc_port: int, use_tls: bool, api_key: Optional[str]) -> Dict[str, Any]:
+    kwargs = dict(
+        http_host=host, http_port=http_port, http_secure=use_tls,
+        grpc_host=host, grpc_port=grpc_port, grpc_secure=use_tls,
+    )
+    if api_key:
+        from weaviate.auth import AuthApiKey
+        kwargs["auth_credentials"] = AuthApiKey(api_key=api_key)
+    return kwargs
+
+
+def _connect(key: ClientKey):
+    import weaviate
+    return weaviate.connect_to_custom(**_connect_kwargs(*key))
+
+
+def _ensure_healthy(entry: _PooledClient, key: ClientKey) -> None:
+    now = time.monotonic()
+    if now - entry.checked_at < HEALTH_CHECK_SECONDS:
+        return
+    try:
+        ready = entry.client.is_ready()
+    except Exception:
+        ready = False
+    if not ready:
+        print(f"[WARN] Pooled Weaviate client for {_label(key)} is not ready; reconnecting")
+        try:
+            entry.client.close()
+        except Exception:
+            pass
+        # reconnect the same object so every holder of it recovers too
+        entry.client.connect()
+    entry.checked_at = now
+
+
+def get_client(host: str = "127.0.0.1", http_port: int = 8080, grpc_port: int = 50051,
+               use_tls: bool = False, api_key: Optional[str] = None):
+    """A connected sync Weaviate client shared by every caller with the same endpoint."""
+    key: ClientKey = (host, http_port, grpc_port, use_tls, api_key)
+    with _lock:
+        key_lock = _client_locks.setdefault(key, threading.Lock())
+    # connect / is_ready / reconnect go over the network: hold only this endpoint's
+    # lock for them, so a slow node never blocks model lookups or other endpoints
+    with key_lock:
+        with _lock:
+            entry = _clients.get(key)
+        if entry is None:
+            entry = _PooledClient(_connect(key), checked_at=time.monotonic())
+            with _lock:
+                _clients[key] = entry
+        else:
+            _ensure_healthy(entry, key)
+        with _lock:
+            entry.refs += 1
+        return entry.client
+
+
+def release_client(client) -> None:
+    """Give back a client from `get_client`; it stays open for the next caller until exit."""
+    with _lock:
+        for entry in _clients.values():
+            if entry.client is client:
+                entry.refs = max(0, entry.refs - 1)
+                return
+
+
+def _label(key: ClientKey) -> str:
+    return f"{'https' if key[3] else 'http'}://{key[0]}:{key[1]}"
+
+
+def check_clients() -> Dict[str, bool]:
+    """endpoint -> is_ready for every pooled client (for health endpoints)."""
+    with _lock:
+        entries = list(_clients.items())
+    out = {}
+    for key, entry in entries:
+        try:
+            out[_label(key)] = bool(entry.client.is_ready())
+        except Exception:
+            out[_label(key)] = False
+    return out
+
+
+def registry_stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "models": sorted(m.model_id for m in _models.values()),
+            "clients": {_label(k): e.refs for k, e in _clients.items()},   # endpoint -> holders
+        }
+
+
+@atexit.register
+def close_all() -> None:
+    """Close every pooled client and drop the loaded models."""
+    with _lock:
+        entries = list(_clients.values())
+        _clients.clear()
+        _models.clear()
+    for entry in entries:
+        try:
+            entry.client.close()
+        except Exception:
+            pass
@@ -0,0 +1,41 @@
+"""
+Generation settings and helpers shared by HFModelManager and the batching
+scheduler. No torch/transformers imports here, so the scheduler (and its
+tests) can be imported without the LLM stack.
+"""
+from dataclasses import dataclass
+from typing import List, Literal, Optional, TypedDict
+
+Role = Literal["system", "user", "assistant"]
+
+class ChatMessage(TypedDict):
+    role: Role
+    content: str
+    
+Messages = List[ChatMessage]
+
+@dataclass
+class GenerateConfig:
+    max_new_tokens: int = 256
+    temperature: float = 0.6
+    top_p: float = 0.95
+    do_sample: bool = True
+    num_beams: int = 1
+    repetition_penalty: float = 1.0
+    stop: Optional[List[str]] = None       # optional stop strings
+    max_input_tokens: int = 2048           # truncate input to this
+    seed: Optional[int] = None
+
+# sampling make_irac_inference has always used; the pipeline path never truncated the opinion
+IRAC_GENERATE_CFG = GenerateConfig(
+    max_new_tokens=400, temperature=0.4, top_p=0.9, repetition_penalty=1.05, max_input_tokens=32768,
+)
+
+
+def truncate_on_stops(text: str, stops: List[str]) -> str:
+    cut = len(text)
+    for s in stops:
+        idx = text.find(s)
+        if idx != -1:
+            cut = min(cut, idx)
+    return text[:cut]
@@ -1,11 +1,16 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List, Dict, Literal, Optional, Union, TypedDict, Any
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, List, Dict, Literal, Optional, Union, TypedDict, Any
+import threading
 
 from transformers import (
     AutoTokenizer,
     AutoModelForCausalLM,
     BitsAndBytesConfig,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextIteratorStreamer,
     pipeline
 )
 import torch, os
@@ -14,19 +19,22 @@ from peft import PeftModel
 # os.environ["PYTORCH_CUDA_ALLOC_CONF"] = "expandable_segments:True"
 os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
 
-Role = Literal["system", "user", "assistant"]
-
-class ChatMessage(TypedDict):
-    role: Role
-    content: str
-    
-Messages = List[ChatMessage]
+from utils.models.llm.generation import (
+    ChatMessage,
+    GenerateConfig,
+    IRAC_GENERATE_CFG,
+    Messages,
+    Role,
+    truncate_on_stops as _truncate_on_stops,
+)
 
 # Init Configs
 @dataclass
 class HFLoadConfig:
     base_model_id: str
     irac_model_id: str = "None"
+    # extra LoRA adapters (name -> path/hub id) sharing the same base weights
+    adapters: Dict[str, str] = field(default_factory=dict)
     dtype: Literal["auto", "fp16", "bf16"] = "fp16"
     device_map: str="auto"
     load_in_4bit: bool = True
@@ -37,18 +45,49 @@ class HFLoadConfig:
     trust_remote_code: bool = True
     use_sdpa: bool = True
 
-@dataclass
-class GenerateConfig:
-    max_new_tokens: int = 256
-    temperature: float = 0.6
-    top_p: float = 0.95
-    do_sample: bool = True
-    num_beams: int = 1
-    stop: Optional[List[str]] = None       # optional stop strings
-    max_input_tokens: int = 2048           # truncate input to this
-    seed: Optional[int] = None
-
 # Helper
+class _StopOnEvent(StoppingCriteria):
+    """Ends generate() early once `event` is set (streaming client went away)."""
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.event.is_set()
+
+class _LockedTokenizer:
+    """
+    HF fast tokenizers raise "Already borrowed" when one thread encodes (and
+    flips truncation/padding) while another encodes or decodes. Scheduler
+    callers, the batch worker and streamer threads all share one tokenizer, so
+    every call goes through a single lock; attributes pass straight through.
+    """
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.tokenizer, name)
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            return self.tokenizer(*args, **kwargs)
+
+    def encode(self, *args, **kwargs):
+        with self._lock:
+            return self.tokenizer.encode(*args, **kwargs)
+
+    def decode(self, *args, **kwargs):
+        with self._lock:
+            return self.tokenizer.decode(*args, **kwargs)
+
+    def batch_decode(self, *args, **kwargs):
+        with self._lock:
+            return self.tokenizer.batch_decode(*args, **kwargs)
+
+    def apply_chat_template(self, *args, **kwargs):
+        with self._lock:
+            return self.tokenizer.apply_chat_template(*args, **kwargs)
+
 def _to_torch_dtype(name: Literal["auto", "fp16", "bf16"]):
     if name == "auto":
         return "auto"
@@ -58,16 +97,31 @@ def _to_torch_dtype(name: Literal["auto", "fp16", "bf16"]):
         return torch.bfloat16
     return "auto"
 
+IRAC_ADAPTER = "irac"
+
 # Main Class
 class HFModelManager:
+    """
+    One base model per process; LoRA adapters are loaded onto it once by name and
+    switched with `set_adapter`. Base-model calls run with the adapters disabled,
+    so both stages of the RAG pipeline share the same weights without reloads.
+    """
     def __init__(self, load_cfg: HFLoadConfig):
         self.cfg = load_cfg
         self.tok = None
         self.model = None
+        self.peft = None                      # PeftModel wrapping self.model once an adapter is loaded
+        self.generator = None                 # text-generation pipeline over self.peft, built once
+        self._lock = threading.RLock()        # the active adapter is global state on the model
     
     def load(self) -> None:
         if self.tok is not None and self.model is not None:
             return
+        with self._lock:
+            if self.tok is None or self.model is None:
+                self._load()
+
+    def _load(self) -> None:
         quant_cfg = None
         if self.cfg.load_in_4bit:
             quant_cfg = BitsAndBytesConfig(
@@ -76,7 +130,12 @@ class HFModelManager:
                 bnb_4bit_use_double_quant=self.cfg.bnb_4bit_use_double_quant,
                 bnb_4bit_type=self.cfg.bnb_4bit_type,
             )
-        self.tok = AutoTokenizer.from_pretrained(self.cfg.base_model_id, use_fast=True)
+        tok = AutoTokenizer.from_pretrained(self.cfg.base_model_id, use_fast=True)
+        # batched generation pads on the left so every prompt ends where generation starts
+        tok.padding_side = "left"
+        if tok.pad_token is None:
+            tok.pad_token = tok.eos_token
+        self.tok = _LockedTokenizer(tok)
         
         self.model = AutoModelForCausalLM.from_pretrained(
             self.cfg.base_model_id,
@@ -96,83 +155,149 @@ class HFModelManager:
                 pass
             
         self.model.config.use_cache = True
-    
+
+    def adapter_paths(self) -> Dict[str, str]:
+        """Configured adapters by name: `irac_model_id` as "irac" plus `cfg.adapters`."""
+        paths = {}
+        if self.cfg.irac_model_id and self.cfg.irac_model_id != "None":
+            paths[IRAC_ADAPTER] = self.cfg.irac_model_id
+        paths.update(self.cfg.adapters)
+        return paths
+
+    def load_adapter(self, name: str, path: Optional[str] = None) -> None:
+        """Attach adapter `name` to the base model; a no-op once it is loaded."""
+        with self._lock:
+            self.load()
+            if self.peft is not None and name in self.peft.peft_config:
+                return
+            path = path or self.adapter_paths().get(name)
+            if not path:
+                raise ValueError(f"No path configured for adapter '{name}'")
+            if self.peft is None:
+                self.peft = PeftModel.from_pretrained(self.model, path, adapter_name=name)
+                self.peft.eval()
+            else:
+                self.peft.load_adapter(path, adapter_name=name)
+            print(f"[INFO] Loaded adapter '{name}' from {path}")
+
     def load_irac(self):
-        self.load() # load_base model
-        model = PeftModel.from_pretrained(self.model, self.cfg.irac_model_id)
-
-        # Create text generation pipeline
-        self.generator = pipeline(
-            "text-generation",
-            model=model,
-            tokenizer=self.tok,
-            device_map="auto"
-        )
-        
+        with self._lock:
+            self.load_adapter(IRAC_ADAPTER)
+            if self.generator is None:
+                # Create text generation pipeline (once; the active adapter is switched underneath it)
+                self.generator = pipeline(
+                    "text-generation",
+                    model=self.peft,
+                    tokenizer=self.tok.tokenizer,   # raw tokenizer; calls are guarded in make_irac_inference
+                )
+
+    @contextmanager
+    def use_adapter(self, name: Optional[str]):
+        """
+        Run the block on the shared model with adapter `name` active, or with
+        every adapter disabled (plain base model) when `name` is None.
+        """
+        with self._lock:
+            if name is None:
+                if self.peft is None:
+                    yield self.model
+                else:
+                    with self.peft.disable_adapter():
+                        yield self.peft
+                return
+            self.load_adapter(name)
+            if self.peft.active_adapter != name:
+                self.peft.set_adapter(name)
+            yield self.peft
+
     def make_irac_inference(
             self,
             message_or_prompt: Union[Messages, str],
-            gen_cfg: Optional[GenerateConfig] = None
+            gen_cfg: Optional[GenerateConfig] = None,
+            adapter: str = IRAC_ADAPTER,
         ) -> str:
         self.load_irac()
         gen_cfg = gen_cfg or GenerateConfig()
-        outputs = self.generator(
-            message_or_prompt,
-            max_new_tokens=400,
-            temperature=0.4,
-            top_p=0.9,
-            do_sample=True,
-            repetition_penalty=1.05,
-            eos_token_id=self.tok.eos_token_id
-        )
+        # the pipeline tokenizes and decodes with the raw tokenizer: hold its lock for the call
+        with self.use_adapter(adapter), self.tok._lock:
+            outputs = self.generator(
+                message_or_prompt,
+                max_new_tokens=400,
+                temperature=0.4,
+                top_p=0.9,
+                do_sample=True,
+                repetition_penalty=1.05,
+                eos_token_id=self.tok.eos_token_id
+            )
         return outputs[0]["generated_text"]
         
         
+    def render_prompt(self, messages_or_prompt: Union[Messages, str]) -> str:
+        self.load()
+        if isinstance(messages_or_prompt, str):
+            return messages_or_prompt
+        # chat template -> plain text prompt
+        return self.tok.apply_chat_template(
+            messages_or_prompt, tokenize=False, add_generation_prompt=True
+        )
+
+    def count_tokens(self, prompt: str, max_input_tokens: Optional[int] = None) -> int:
+        """Prompt length in tokens after truncation (the scheduler groups batches by it)."""
+        self.load()
+        ids = self.tok(prompt, truncation=max_input_tokens is not None, max_length=max_input_tokens)["input_ids"]
+        return len(ids)
+
+    def _prepare_inputs(self, messages_or_prompt: Union[Messages, str, List[str]], gen_cfg: GenerateConfig):
+        self.load()
+        assert self.tok is not None and self.model is not None
+
+        # a list of plain strings is a batch; a list of {role, content} is one chat
+        batch = isinstance(messages_or_prompt, list) and all(isinstance(p, str) for p in messages_or_prompt)
+        prompt = messages_or_prompt if batch else self.render_prompt(messages_or_prompt)
+
+        # Tokenize with truncation (and left padding for batches)
+        inputs = self.tok(
+            prompt,
+            return_tensors="pt",
+            padding=batch,
+            truncation=True,
+            max_length=gen_cfg.max_input_tokens,
+        ).to(self.model.device)
+
+        # Optional seeding for reproducibility
+        if gen_cfg.seed is not None:
+            torch.manual_seed(gen_cfg.seed)
+        return inputs
+
+    def _generate_kwargs(self, gen_cfg: GenerateConfig) -> Dict[str, Any]:
+        return dict(
+            max_new_tokens=gen_cfg.max_new_tokens,
+            temperature=gen_cfg.temperature,
+            top_p=gen_cfg.top_p,
+            do_sample=gen_cfg.do_sample,
+            num_beams=gen_cfg.num_beams,
+            repetition_penalty=gen_cfg.repetition_penalty,
+            eos_token_id=self.tok.eos_token_id,
+            pad_token_id=self.tok.pad_token_id,
+            use_cache=True,
+        )
+
     def make_inference(
             self,
             messages_or_prompt: Union[Messages, str],
             gen_cfg: Optional[GenerateConfig] = None,
+            adapter: Optional[str] = None,
         ) -> str:
             """
             If `messages_or_prompt` is a string, it's used as-is.
             If it's a list of {role, content}, we apply the model's chat_template.
+            Runs on the base model unless a loaded/configured `adapter` is named.
             """
-            self.load()
-            assert self.tok is not None and self.model is not None
-
             gen_cfg = gen_cfg or GenerateConfig()
+            inputs = self._prepare_inputs(messages_or_prompt, gen_cfg)
 
-            if isinstance(messages_or_prompt, str):
-                prompt = messages_or_prompt
-            else:
-                # chat template -> plain text prompt
-                prompt = self.tok.apply_chat_template(
-                    messages_or_prompt, tokenize=False, add_generation_prompt=True
-                )
-
-            # Tokenize with truncation
-            inputs = self.tok(
-                prompt,
-                return_tensors="pt",
-                truncation=True,
-                max_length=gen_cfg.max_input_tokens,
-            ).to(self.model.device)
-
-            # Optional seeding for reproducibility
-            if gen_cfg.seed is not None:
-                torch.manual_seed(gen_cfg.seed)
-
-            with torch.inference_mode():
-                out = self.model.generate(
-                    **inputs,
-                    max_new_tokens=gen_cfg.max_new_tokens,
-                    temperature=gen_cfg.temperature,
-                    top_p=gen_cfg.top_p,
-                    do_sample=gen_cfg.do_sample,
-                    num_beams=gen_cfg.num_beams,
-                    eos_token_id=self.tok.eos_token_id,
-                    use_cache=True,
-                )
+            with self.use_adapter(adapter) as model, torch.inference_mode():
+                out = model.generate(**inputs, **self._generate_kwargs(gen_cfg))
 
             # Decode only the newly generated part
             gen_tokens = out[0][inputs["input_ids"].shape[-1]:]
@@ -184,22 +309,109 @@ class HFModelManager:
 
             return text
 
+    def make_batch_inference(
+            self,
+            prompts: List[Union[Messages, str]],
+            gen_cfg: Optional[GenerateConfig] = None,
+            adapter: Optional[str] = None,
+        ) -> List[str]:
+        """
+        `make_inference` for several prompts in one left-padded generate() call;
+        outputs come back in prompt order. All prompts share `gen_cfg` and
+        `adapter`; see GenerationScheduler for batching concurrent callers.
+        """
+        if not prompts:
+            return []
+        gen_cfg = gen_cfg or GenerateConfig()
+        inputs = self._prepare_inputs([self.render_prompt(p) for p in prompts], gen_cfg)
+
+        with self.use_adapter(adapter) as model, torch.inference_mode():
+            out = model.generate(**inputs, **self._generate_kwargs(gen_cfg))
+
+        # left padding: every row's new tokens start after the padded prompt width
+        start = inputs["input_ids"].shape[-1]
+        texts = self.tok.batch_decode(out[:, start:], skip_special_tokens=True)
+        if gen_cfg.stop:
+            texts = [_truncate_on_stops(t, gen_cfg.stop) for t in texts]
+        return texts
+
+    def stream_inference(
+            self,
+            messages_or_prompt: Union[Messages, str],
+            gen_cfg: Optional[GenerateConfig] = None,
+            adapter: Optional[str] = None,
+        ) -> Iterator[str]:
+        """
+        Same inputs as `make_inference`, but yields decoded text pieces as the
+        tokens come out of generate(), which runs on a background thread. Closing
+        the iterator early (e.g. the HTTP client disconnected) stops generation.
+        """
+        gen_cfg = gen_cfg or GenerateConfig()
+        inputs = self._prepare_inputs(messages_or_prompt, gen_cfg)
+        streamer = TextIteratorStreamer(self.tok, skip_prompt=True, skip_special_tokens=True)
+        stop_event = threading.Event()
+        errors: List[BaseException] = []
+
+        def run():
+            try:
+                # the adapter lock is taken here: the consumer may resume on other threads
+                with self.use_adapter(adapter) as model, torch.inference_mode():
+                    model.generate(
+                        **inputs, **self._generate_kwargs(gen_cfg), streamer=streamer,
+                        stopping_criteria=StoppingCriteriaList([_StopOnEvent(stop_event)]),
+                    )
+            except BaseException as e:
+                errors.append(e)
+                streamer.end()   # unblock the consumer
+
+        thread = threading.Thread(target=run, name="hf-stream", daemon=True)
+        thread.start()
+        stops = gen_cfg.stop or []
+        hold = max((len(s) for s in stops), default=1) - 1   # a stop string may straddle two pieces
+        text, sent = "", 0
+        try:
+            for piece in streamer:
+                text += piece
+                if stops:
+                    cut = _truncate_on_stops(text, stops)
+                    if len(cut) < len(text):
+                        if len(cut) > sent:
+                            yield cut[sent:]
+                        return
+                    if len(text) - hold > sent:
+                        yield text[sent:len(text) - hold]
+                        sent = len(text) - hold
+                elif piece:
+                    yield piece
+                    sent = len(text)
+            if len(text) > sent:
+                yield text[sent:]
+            if errors:
+                raise errors[0]
+        finally:
+            stop_event.set()
+            thread.join()
+
+    def stream_irac_inference(
+            self,
+            message_or_prompt: Union[Messages, str],
+            gen_cfg: Optional[GenerateConfig] = None,
+            adapter: str = IRAC_ADAPTER,
+        ) -> Iterator[str]:
+        """Streaming `make_irac_inference`: only the generated summary, without the prompt echo."""
+        self.load_adapter(adapter)
+        return self.stream_inference(message_or_prompt, gen_cfg or IRAC_GENERATE_CFG, adapter=adapter)
+
     def unload(self) -> None:
         """Free large objects (optional)."""
+        self.generator = None
+        self.peft = None
         self.model = None
         self.tok = None
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
 
 
-def _truncate_on_stops(text: str, stops: List[str]) -> str:
-    cut = len(text)
-    for s in stops:
-        idx = text.find(s)
-        if idx != -1:
-            cut = min(cut, idx)
-    return text[:cut]
-            
 #     def make_inference(self, messages: List[Dict[str,str]]) -> str:
 #         quant = BitsAndBytesConfig(load_in_4bit=True, bnb_4bit_type="nf4",
 #                             bnb_4bit_use_double_quant=True, bnb_4bit_compute_dtype=torch.float16)
@@ -0,0 +1,153 @@
+"""
+Dynamic micro-batching in front of one HFModelManager. Concurrent callers
+submit prompts; a single worker thread gathers them into padded batches and
+runs one generate() per batch, then hands each caller its own output:
+
+    scheduler = GenerationScheduler(manager, max_batch_size=8, max_wait_ms=25)
+    text = scheduler.generate(prompt, GenerateConfig())          # blocking
+    text = await scheduler.agenerate(prompt, GenerateConfig())   # from async code
+
+A batch is cut when it reaches `max_batch_size` or when its oldest request has
+waited `max_wait_ms`. Requests only share a batch if they use the same adapter
+and generation settings and their prompts fall in the same `length_bucket`, so
+short prompts aren't padded out to the longest one in the queue. The oldest
+pending request always decides the next batch, so nothing starves.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import astuple, dataclass, field, replace
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+
+from utils.models.llm.generation import GenerateConfig, Messages, truncate_on_stops
+
+if TYPE_CHECKING:   # the manager pulls in torch; the scheduler itself doesn't need it
+    from utils.models.llm.hf_infer import HFModelManager
+
+
+@dataclass
+class _Request:
+    prompt: str
+    gen_cfg: GenerateConfig
+    adapter: Optional[str]
+    key: Tuple
+    enqueued_at: float = field(default_factory=time.monotonic)
+    future: Future = field(default_factory=Future)
+
+
+class GenerationScheduler:
+    def __init__(self, manager: "HFModelManager", max_batch_size: int = 8, max_wait_ms: float = 25.0,
+                 length_bucket: int = 256):
+        self.manager = manager
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.length_bucket = max(1, length_bucket)
+        self._pending: List[_Request] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats = {"requests": 0, "batches": 0, "max_batch": 0, "generated": 0, "errors": 0}
+        self._worker = threading.Thread(target=self._run, name="generation-scheduler", daemon=True)
+        self._worker.start()
+
+    def _key(self, prompt: str, gen_cfg: GenerateConfig, adapter: Optional[str]) -> Tuple:
+        # stop strings are applied per output, so they don't split batches
+        tokens = self.manager.count_tokens(prompt, gen_cfg.max_input_tokens)
+        return (adapter, astuple(replace(gen_cfg, stop=None)), tokens // self.length_bucket)
+
+    def submit(self, messages_or_prompt: Union[Messages, str], gen_cfg: Optional[GenerateConfig] = None,
+               adapter: Optional[str] = None) -> Future:
+        """Queue one prompt; the Future resolves to its generated text (or the batch's exception)."""
+        gen_cfg = gen_cfg or GenerateConfig()
+        prompt = self.manager.render_prompt(messages_or_prompt)
+        req = _Request(prompt, gen_cfg, adapter, self._key(prompt, gen_cfg, adapter))
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("GenerationScheduler is closed")
+            self._pending.append(req)
+            self._stats["requests"] += 1
+            self._cond.notify()
+        return req.future
+
+    def generate(self, messages_or_prompt: Union[Messages, str], gen_cfg: Optional[GenerateConfig] = None,
+                 adapter: Optional[str] = None, timeout: Optional[float] = None) -> str:
+        return self.submit(messages_or_prompt, gen_cfg, adapter).result(timeout=timeout)
+
+    async def agenerate(self, messages_or_prompt: Union[Messages, str], gen_cfg: Optional[GenerateConfig] = None,
+                        adapter: Optional[str] = None) -> str:
+        # tokenizing for the length bucket is cheap but blocking: keep it off the event loop
+        future = await asyncio.to_thread(self.submit, messages_or_prompt, gen_cfg, adapter)
+        return await asyncio.wrap_future(future)
+
+    def _next_batch(self) -> Optional[List[_Request]]:
+        with self._cond:
+            while True:
+                if not self._pending:
+                    if self._closed:
+                        return None
+                    self._cond.wait()
+                    continue
+                head = self._pending[0]
+                same = [r for r in self._pending if r.key == head.key]
+                remaining = head.enqueued_at + self.max_wait - time.monotonic()
+                if len(same) >= self.max_batch_size or remaining <= 0 or self._closed:
+                    batch = same[:self.max_batch_size]
+                    taken = {id(r) for r in batch}
+                    self._pending = [r for r in self._pending if id(r) not in taken]
+                    return batch
+                self._cond.wait(timeout=remaining)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            head = batch[0]
+            try:
+                texts = self.manager.make_batch_inference([r.prompt for r in batch], replace(head.gen_cfg, stop=None),
+                                                          head.adapter)
+            except Exception as e:
+                self._stats["errors"] += 1
+                for r in batch:
+                    r.future.set_exception(e)
+                continue
+            except BaseException as e:
+                # the worker is going down: nobody would ever resolve what's queued
+                self._fail_all(batch, e)
+                raise
+            self._stats["batches"] += 1
+            self._stats["generated"] += len(batch)
+            self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+            # stop strings can differ inside a batch, so they're applied per caller
+            for r, text in zip(batch, texts):
+                r.future.set_result(truncate_on_stops(text, r.gen_cfg.stop) if r.gen_cfg.stop else text)
+
+    def _fail_all(self, batch: List[_Request], error: BaseException) -> None:
+        with self._cond:
+            self._closed = True
+            pending, self._pending = self._pending, []
+            self._stats["errors"] += 1
+        failure = RuntimeError(f"Generation scheduler stopped: {error!r}")
+        failure.__cause__ = error
+        for r in batch:
+            r.future.set_exception(failure)
+        for r in pending:
+            if r.future.set_running_or_notify_cancel():
+                r.future.set_exception(failure)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats, pending=len(self._pending))
+        stats["mean_batch"] = round(stats["generated"] / stats["batches"], 2) if stats["batches"] else None
+        return stats
+
+    def close(self, wait: bool = True) -> None:
+        """Stop taking requests; already queued ones are still generated."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            self._worker.join()
@@ -1,4 +1,14 @@
-from .ragservice import RAGService
+# RAGService pulls in the LLM stack (torch, transformers, peft); import it only when asked for
+import importlib
 
-from .vectorize_batched_opinions import VectorizeOpinions
+_EXPORTS = {
+    "RAGService": ".ragservice",
+    "VectorizeOpinions": ".vectorize_batched_opinions",
+}
 __all__ = ["RAGService", "VectorizeOpinions"]
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
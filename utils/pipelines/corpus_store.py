@@ -0,0 +1,162 @@
+"""
+Columnar intermediate corpus: cleaned, chunked opinions in `chunks.parquet`
+with their embeddings row-aligned in a memory-mapped `vectors.npy`. Built once
+from raw CSV, then bulk-loaded into any number of Weaviate collections/nodes
+without re-parsing or re-encoding.
+"""
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.pipelines.ingest_stages import ChunkRecord, StageStats
+
+CHUNKS_FILE = "chunks.parquet"
+VECTORS_FILE = "vectors.npy"
+META_FILE = "meta.json"
+
+CHUNK_SCHEMA = pa.schema([
+    ("uuid", pa.string()),
+    ("doc_id", pa.string()),
+    ("chunk_index", pa.int32()),
+    ("chunk_count", pa.int32()),
+    ("title", pa.string()),
+    ("date_filed", pa.string()),
+    ("url", pa.string()),
+    ("court", pa.string()),
+    ("text", pa.string()),
+])
+
+
+def conform_chunks(table: pa.Table) -> pa.Table:
+    """
+    `table` in CHUNK_SCHEMA column order and types. Stores written before a
+    column existed (e.g. `court`) get it as all nulls instead of failing to load.
+    """
+    columns = [
+        table.column(f.name).cast(f.type) if f.name in table.column_names else pa.nulls(table.num_rows, f.type)
+        for f in CHUNK_SCHEMA
+    ]
+    return pa.Table.from_arrays(columns, schema=CHUNK_SCHEMA)
+
+
+def read_chunks(path: str) -> pa.Table:
+    """A `chunks.parquet` as a CHUNK_SCHEMA table, tolerating older stores with fewer columns."""
+    return conform_chunks(pq.read_table(path))
+
+
+class CorpusWriter:
+    """
+    Sink with the BatchWriter interface (start/put/delete/close/abort) that
+    appends chunks to Parquet and vectors to a raw float32 file, finalized to
+    `.npy` on close. `meta.json` is written last and marks the store complete;
+    `abort` leaves a directory `CorpusStore` refuses to open.
+    """
+    def __init__(self, path: str, dim: int, stats: StageStats, meta: Optional[Dict[str, Any]] = None,
+                 row_group_size: int = 8192):
+        self.path = path
+        self.dim = dim
+        self.stats = stats
+        self.meta = meta or {}
+        self.row_group_size = row_group_size
+        os.makedirs(path, exist_ok=True)
+        # a previous export into this directory is no longer complete once we start overwriting it
+        for name in (META_FILE, VECTORS_FILE):
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+        self._raw_path = os.path.join(path, VECTORS_FILE + ".raw")
+        self._raw = open(self._raw_path, "wb")
+        self._pq = pq.ParquetWriter(os.path.join(path, CHUNKS_FILE), CHUNK_SCHEMA, compression="zstd")
+        self._buf: List[ChunkRecord] = []
+        self.rows = 0
+
+    def start(self) -> None:
+        pass
+
+    def put(self, records: List[ChunkRecord], vectors, docs=None, progress=None) -> None:
+        if not records:
+            return
+        t0 = time.perf_counter()
+        self._raw.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self._buf.extend(records)
+        self.rows += len(records)
+        if len(self._buf) >= self.row_group_size:
+            self._write_rows()
+        self.stats.add(len(records), time.perf_counter() - t0)
+
+    def delete(self, uuids: List[str]) -> None:
+        pass   # a store is always written from scratch
+
+    def _write_rows(self) -> None:
+        cols: Dict[str, list] = {name: [] for name in CHUNK_SCHEMA.names}
+        for rec in self._buf:
+            cols["uuid"].append(rec.uuid)
+            for name in CHUNK_SCHEMA.names[1:]:
+                cols[name].append(rec.properties.get(name))
+        self._pq.write_table(pa.Table.from_pydict(cols, schema=CHUNK_SCHEMA))
+        self._buf = []
+
+    def close(self) -> None:
+        if self._buf:
+            self._write_rows()
+        self._pq.close()
+        self._raw.close()
+        # stream the raw floats into a proper .npy so loaders can np.load(mmap_mode="r")
+        out = np.lib.format.open_memmap(
+            os.path.join(self.path, VECTORS_FILE), mode="w+", dtype=np.float32, shape=(self.rows, self.dim),
+        )
+        raw = np.memmap(self._raw_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim)) if self.rows else None
+        step = 65536
+        for i in range(0, self.rows, step):
+            out[i:i + step] = raw[i:i + step]
+        out.flush()
+        del out, raw
+        os.remove(self._raw_path)
+        with open(os.path.join(self.path, META_FILE), "w") as f:
+            json.dump({**self.meta, "rows": self.rows, "dim": self.dim}, f, indent=2)
+
+    def abort(self) -> None:
+        """Failed export: drop the partial chunks and vectors, write no meta.json."""
+        self._buf = []
+        self._pq.close()
+        self._raw.close()
+        for name in (VECTORS_FILE + ".raw", CHUNKS_FILE):
+            if os.path.exists(os.path.join(self.path, name)):
+                os.remove(os.path.join(self.path, name))
+
+
+class CorpusStore:
+    """Read side: Parquet row batches paired with their slice of the vector memmap."""
+    def __init__(self, path: str):
+        self.path = path
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            raise ValueError(f"Corpus store {path} is incomplete (no {META_FILE}); re-run the export")
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+        self.parquet = pq.ParquetFile(os.path.join(path, CHUNKS_FILE))
+        if self.parquet.metadata.num_rows != self.vectors.shape[0]:
+            raise ValueError(
+                f"Corpus store {path} is inconsistent: {self.parquet.metadata.num_rows} chunks, "
+                f"{self.vectors.shape[0]} vectors"
+            )
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    def read_chunks(self) -> pa.Table:
+        return read_chunks(os.path.join(self.path, CHUNKS_FILE))
+
+    def iter_batches(self, batch_size: int = 2048, columns: Optional[List[str]] = None
+                     ) -> Iterator[Tuple[List[ChunkRecord], np.ndarray]]:
+        offset = 0
+        for batch in self.parquet.iter_batches(batch_size=batch_size, columns=columns):
+            rows = batch.to_pylist()
+            vecs = np.asarray(self.vectors[offset:offset + len(rows)])
+            offset += len(rows)
+            records = [ChunkRecord(uuid=r.pop("uuid"), properties=r) for r in rows]
+            yield records, vecs
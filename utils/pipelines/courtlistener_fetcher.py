@@ -0,0 +1,289 @@
+"""
+Async CourtListener opinion fetcher: one pooled aiohttp session, bounded
+concurrency, token-bucket rate limiting, exponential backoff and a resumable
+per-query cursor file.
+
+CourtListener paginates with opaque `next` cursors, so pages of one query are
+sequential; concurrency comes from running several queries (e.g. one per court
+or jurisdiction) at once and from fetching the next page while the consumer is
+still embedding the previous one.
+
+A query's cursor only advances past a page once the consumer has acknowledged
+(`ack`) every opinion from it, so opinions still buffered in the queues when
+the process dies are fetched again on resume rather than skipped.
+"""
+import asyncio
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import aiohttp
+
+from utils.pipelines.opinion_prep import clean_text
+
+COURTLISTENER_BASE = "https://www.courtlistener.com"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+PAGE_KEY = "_page"   # (start_url, page seq) on every yielded opinion; hand it back through ack()
+
+
+@dataclass
+class FetchConfig:
+    concurrency: int = 4              # queries/requests in flight
+    rate_per_sec: float = 4.0         # sustained request rate across all queries
+    burst: int = 4
+    max_retries: int = 6
+    backoff_base: float = 0.5         # seconds; doubles per attempt, with jitter
+    backoff_max: float = 60.0
+    timeout: float = 60.0
+    queue_size: int = 256             # opinions buffered ahead of the consumer
+    cursor_path: Optional[str] = None # JSON file of start_url -> next url
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+@dataclass
+class _Page:
+    seq: int
+    next_url: Optional[str]
+    remaining: int
+    complete: bool      # False when the fetch budget ran out mid-page: never advance past it
+
+
+class CursorStore:
+    """
+    start_url -> next page url (None once the query is exhausted). Pages are
+    registered as their opinions are queued and committed, strictly in page
+    order, once all of their opinions are acknowledged.
+    """
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.cursors: Dict[str, Optional[str]] = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.cursors = json.load(f)
+        self._pages: Dict[str, Deque[_Page]] = {}
+        self._seq = 0
+        self._lock = threading.Lock()   # acks come from the consumer thread
+
+    def get(self, start_url: str) -> Optional[str]:
+        return self.cursors.get(start_url, start_url)
+
+    def set(self, start_url: str, next_url: Optional[str]) -> None:
+        self.cursors[start_url] = next_url
+        if self.path:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.cursors, f)
+            os.replace(tmp, self.path)
+
+    def open_page(self, start_url: str, next_url: Optional[str], n_docs: int, complete: bool = True) -> int:
+        """Register a page whose `n_docs` opinions are about to be queued; returns its seq."""
+        with self._lock:
+            self._seq += 1
+            self._pages.setdefault(start_url, deque()).append(_Page(self._seq, next_url, n_docs, complete))
+            self._commit(start_url)
+            return self._seq
+
+    def ack(self, start_url: str, seq: int, n: int = 1) -> None:
+        with self._lock:
+            for page in self._pages.get(start_url, ()):
+                if page.seq == seq:
+                    page.remaining -= n
+                    break
+            self._commit(start_url)
+
+    def _commit(self, start_url: str) -> None:
+        pages = self._pages.get(start_url)
+        while pages and pages[0].remaining <= 0 and pages[0].complete:
+            self.set(start_url, pages.popleft().next_url)
+
+
+def parse_opinion(op: Dict[str, Any], base_url: str = COURTLISTENER_BASE) -> Optional[Dict[str, Any]]:
+    text = op.get("plain_text") #or op.get("html") or op.get("html_with_citations")
+    if not text:
+        return None
+    absolute_url = op.get("absolute_url") or ""
+    parts = [p for p in absolute_url.split("/") if p]
+    court = op.get("court")
+    if isinstance(court, dict):
+        court = court.get("name") or court.get("id") or ""
+    return {
+        "id": str(op["id"]),
+        "title": parts[-1] if parts else str(op["id"]),
+        "court": court,
+        "date_filed": op.get("date_filed"),
+        "url": base_url + absolute_url,
+        "text": clean_text(text),
+    }
+
+
+class CourtListenerFetcher:
+    def __init__(self, cfg: Optional[FetchConfig] = None, base_url: str = COURTLISTENER_BASE):
+        self.cfg = cfg or FetchConfig()
+        self.base_url = base_url
+        self.cursors = CursorStore(self.cfg.cursor_path)
+        self.requests = 0
+        self.retries = 0
+
+    async def _get_json(self, session: aiohttp.ClientSession, bucket: TokenBucket,
+                        sem: asyncio.Semaphore, url: str) -> Dict[str, Any]:
+        for attempt in range(self.cfg.max_retries + 1):
+            await bucket.acquire()
+            retry_after = None
+            try:
+                async with sem:
+                    self.requests += 1
+                    async with session.get(url) as r:
+                        if r.status not in RETRY_STATUS:
+                            r.raise_for_status()
+                            return await r.json()
+                        retry_after = r.headers.get("Retry-After")
+                        err = f"HTTP {r.status}"
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                err = repr(e)
+            if attempt == self.cfg.max_retries:
+                break
+            self.retries += 1
+            delay = min(self.cfg.backoff_max, self.cfg.backoff_base * (2 ** attempt))
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            print(f"[WARN] {err} for {url}; retry {attempt + 1}/{self.cfg.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay * (0.5 + random.random() / 2))
+        raise RuntimeError(f"Giving up on {url} after {self.cfg.max_retries} retries ({err})")
+
+    async def _walk(self, start_url: str, session, bucket, sem, out: asyncio.Queue, budget: List[int]) -> None:
+        url = self.cursors.get(start_url)
+        while url and budget[0] > 0:
+            page = await self._get_json(session, bucket, sem, url)
+            docs = [d for d in (parse_opinion(op, self.base_url) for op in page.get("results", [])) if d is not None]
+            complete = len(docs) <= budget[0]
+            docs = docs[:max(0, budget[0])]
+            budget[0] -= len(docs)
+            # the cursor moves to page["next"] only after the consumer acks all of these
+            seq = self.cursors.open_page(start_url, page.get("next"), len(docs), complete)
+            for doc in docs:
+                doc[PAGE_KEY] = (start_url, seq)
+                await out.put(doc)
+            if not complete:
+                return
+            url = page.get("next")
+
+    def ack(self, docs: Iterable[Dict[str, Any]]) -> None:
+        """Mark opinions as written; their pages' cursors are saved once fully acknowledged."""
+        for doc in docs:
+            page = doc.get(PAGE_KEY)
+            if page:
+                self.cursors.ack(*page)
+
+    async def stream(self, start_urls: Sequence[str], limit: int = 100_000) -> AsyncIterator[Dict[str, Any]]:
+        """Yield parsed opinions from all queries, at most `limit` in total."""
+        out: asyncio.Queue = asyncio.Queue(maxsize=self.cfg.queue_size)
+        bucket = TokenBucket(self.cfg.rate_per_sec, self.cfg.burst)
+        sem = asyncio.Semaphore(self.cfg.concurrency)
+        budget = [limit]
+        timeout = aiohttp.ClientTimeout(total=self.cfg.timeout)
+        connector = aiohttp.TCPConnector(limit=self.cfg.concurrency)
+        async with aiohttp.ClientSession(headers=self.cfg.headers, timeout=timeout, connector=connector) as session:
+            tasks = [
+                asyncio.create_task(self._walk(u, session, bucket, sem, out, budget))
+                for u in start_urls
+            ]
+            done = asyncio.gather(*tasks)
+            try:
+                while True:
+                    getter = asyncio.ensure_future(out.get())
+                    finished, _ = await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+                    if getter in finished:
+                        yield getter.result()
+                        continue
+                    getter.cancel()
+                    done.result()   # re-raise a failed query
+                    while not out.empty():
+                        yield out.get_nowait()
+                    return
+            finally:
+                for t in tasks:
+                    t.cancel()
+
+
+class OpinionStream:
+    """
+    Iterator over opinions from a background event loop, handed to a
+    synchronous consumer through a bounded queue so fetching overlaps
+    embedding. Call `ack(docs)` once docs are written; unacknowledged opinions
+    are fetched again when the cursor file is resumed.
+    """
+    def __init__(self, start_urls: Sequence[str], limit: int = 100_000, cfg: Optional[FetchConfig] = None,
+                 base_url: str = COURTLISTENER_BASE):
+        self.start_urls = start_urls
+        self.limit = limit
+        self.cfg = cfg or FetchConfig()
+        self.fetcher = CourtListenerFetcher(self.cfg, base_url=base_url)
+
+    def ack(self, docs: Iterable[Dict[str, Any]]) -> None:
+        self.fetcher.ack(docs)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        q: "queue.Queue" = queue.Queue(maxsize=self.cfg.queue_size)
+        stop = object()
+        failure: List[BaseException] = []
+        fetcher = self.fetcher
+
+        async def pump():
+            async for doc in fetcher.stream(self.start_urls, limit=self.limit):
+                await asyncio.get_running_loop().run_in_executor(None, q.put, doc)
+            print(f"[INFO] Fetched with {fetcher.requests} requests ({fetcher.retries} retries)")
+
+        def run():
+            try:
+                asyncio.run(pump())
+            except BaseException as e:
+                failure.append(e)
+            finally:
+                q.put(stop)
+
+        t = threading.Thread(target=run, name="courtlistener-fetcher", daemon=True)
+        t.start()
+        while True:
+            item = q.get()
+            if item is stop:
+                break
+            yield item
+        t.join()
+        if failure:
+            raise RuntimeError("CourtListener fetch failed") from failure[0]
+
+
+def iter_opinions_threaded(
+    start_urls: Sequence[str],
+    limit: int = 100_000,
+    cfg: Optional[FetchConfig] = None,
+    base_url: str = COURTLISTENER_BASE,
+) -> OpinionStream:
+    """Iterable of opinions fetched in the background; `ack()` what was written to move the cursor."""
+    return OpinionStream(start_urls, limit=limit, cfg=cfg, base_url=base_url)
@@ -0,0 +1,113 @@
+"""
+Named vector-index profiles for the Cases collection. HNSW keeps every vector
+in memory uncompressed by default, so on the full corpus the index, not the
+objects, decides how big a Weaviate node has to be. A profile picks the index
+type, HNSW build/search parameters and an optional quantizer:
+
+    pq  product quantization, ~16x smaller vectors (96 segments over 384 dims)
+    sq  8-bit scalar quantization, 4x smaller, full vectors rescore the top hits
+    bq  1 bit per dimension, 32x smaller, needs a generous rescore limit
+    flat  brute force without a graph; for small tenants (bq cache optional)
+
+The index type and quantizer of an existing collection can't be changed in
+place; `VectorizeOpinions.rebuild_index` copies a collection into a new profile.
+"""
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional
+
+EMBED_DIMS = 384   # all-MiniLM-L6-v2
+
+
+@dataclass(frozen=True)
+class IndexProfile:
+    name: str
+    index_type: str = "hnsw"                 # "hnsw" | "flat"
+    ef: Optional[int] = None                 # query-time candidate list; None/-1 = dynamic ef
+    ef_construction: Optional[int] = None    # build-time candidate list (server default 128)
+    max_connections: Optional[int] = None    # graph degree (server default 32)
+    quantizer: Optional[str] = None          # None | "pq" | "sq" | "bq"
+    rescore_limit: Optional[int] = None      # sq/bq: candidates re-ranked with the full vectors
+    pq_segments: int = EMBED_DIMS // 4
+    training_limit: int = 100_000            # pq/sq: vectors used to fit the codebook
+    cache: bool = False                      # flat + bq: keep compressed vectors in memory
+
+    def __post_init__(self):
+        if self.index_type not in ("hnsw", "flat"):
+            raise ValueError(f"Unknown index type '{self.index_type}'")
+        if self.quantizer not in (None, "pq", "sq", "bq"):
+            raise ValueError(f"Unknown quantizer '{self.quantizer}'")
+        if self.index_type == "flat" and self.quantizer not in (None, "bq"):
+            raise ValueError("The flat index only supports bq compression")
+        if self.quantizer == "pq" and EMBED_DIMS % self.pq_segments:
+            raise ValueError(f"pq_segments must divide {EMBED_DIMS}")
+
+    def _quantizer_config(self):
+        from weaviate.classes.config import Configure
+        q = Configure.VectorIndex.Quantizer
+        if self.quantizer == "pq":
+            return q.pq(segments=self.pq_segments, training_limit=self.training_limit)
+        if self.quantizer == "sq":
+            return q.sq(rescore_limit=self.rescore_limit, training_limit=self.training_limit)
+        if self.quantizer == "bq":
+            return q.bq(rescore_limit=self.rescore_limit, cache=self.cache if self.index_type == "flat" else None)
+        return None
+
+    def vector_index_config(self):
+        """The `vector_index_config` for `Configure.Vectors.self_provided`."""
+        from weaviate.classes.config import Configure   # profiles are inspectable without the client
+        if self.index_type == "flat":
+            return Configure.VectorIndex.flat(quantizer=self._quantizer_config())
+        return Configure.VectorIndex.hnsw(
+            ef=self.ef,
+            ef_construction=self.ef_construction,
+            max_connections=self.max_connections,
+            quantizer=self._quantizer_config(),
+        )
+
+    def estimate_memory_bytes(self, n_vectors: int, dims: int = EMBED_DIMS) -> int:
+        """
+        Rule-of-thumb resident size of the vector index: the in-memory vectors
+        (compressed when quantized) plus ~2 * maxConnections 8-byte neighbour ids
+        per node for HNSW. Rescoring reads full vectors from disk, not memory.
+        """
+        per_vector = {None: dims * 4, "pq": self.pq_segments, "sq": dims, "bq": dims // 8}[self.quantizer]
+        if self.index_type == "flat":
+            return n_vectors * per_vector if (self.quantizer == "bq" and self.cache) else 0
+        graph = 2 * (self.max_connections or 32) * 8
+        return n_vectors * (per_vector + graph)
+
+
+PROFILES: Dict[str, IndexProfile] = {p.name: p for p in (
+    IndexProfile("default"),                                        # what ingest has always created
+    IndexProfile("hnsw-sq", quantizer="sq", rescore_limit=200),
+    IndexProfile("hnsw-pq", quantizer="pq"),
+    IndexProfile("hnsw-bq", quantizer="bq", rescore_limit=400),     # 384 bits is coarse: rescore more
+    IndexProfile("hnsw-recall", ef=256, ef_construction=256, max_connections=48),
+    IndexProfile("flat", index_type="flat"),                         # small tenants: brute force, no graph
+    IndexProfile("flat-bq", index_type="flat", quantizer="bq", rescore_limit=200, cache=True),
+)}
+
+
+def get_profile(name: str, **overrides: Any) -> IndexProfile:
+    """A named profile, optionally with fields overridden (e.g. ef=128)."""
+    try:
+        profile = PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown index profile '{name}'; choose from {', '.join(PROFILES)}") from None
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    return replace(profile, **overrides) if overrides else profile
+
+
+def describe_profile(profile: IndexProfile, n_vectors: Optional[int] = None) -> str:
+    parts = [profile.index_type]
+    if profile.quantizer:
+        parts.append(f"{profile.quantizer} (rescore {profile.rescore_limit})" if profile.rescore_limit
+                     else profile.quantizer)
+    for field in ("ef", "ef_construction", "max_connections"):
+        value = getattr(profile, field)
+        if value is not None:
+            parts.append(f"{field}={value}")
+    text = f"'{profile.name}': " + ", ".join(parts)
+    if n_vectors:
+        text += f" (~{profile.estimate_memory_bytes(n_vectors) / 2**30:.2f} GiB vector index for {n_vectors} vectors)"
+    return text
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+
+class ManifestEntry(NamedTuple):
+    doc_id: str
+    content_hash: str
+    chunk_params: str
+    chunk_count: int
+
+
+def content_hash(*parts: str) -> str:
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(str(p).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def source_key(path: str) -> str:
+    """Progress is tied to the exact file contents; a rewritten dump starts over."""
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}::{st.st_size}::{int(st.st_mtime)}"
+
+
+class IngestManifest:
+    """
+    Local sqlite record of what is already in Weaviate: doc_id -> content hash,
+    chunking parameters and chunk count, plus per-source row checkpoints so an
+    interrupted ingest resumes where it stopped.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "doc_id TEXT PRIMARY KEY, content_hash TEXT, chunk_params TEXT, chunk_count INTEGER)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS progress (source TEXT PRIMARY KEY, rows_done INTEGER)"
+        )
+        self.conn.commit()
+
+    def get(self, doc_id: str) -> Optional[ManifestEntry]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT doc_id, content_hash, chunk_params, chunk_count FROM docs WHERE doc_id = ?",
+                (doc_id,),
+            ).fetchone()
+        return ManifestEntry(*row) if row else None
+
+    def rows_done(self, source: str) -> int:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT rows_done FROM progress WHERE source = ?", (source,)
+            ).fetchone()
+        return int(row[0]) if row else 0
+
+    def commit(self, entries: Iterable[ManifestEntry], progress: Optional[Tuple[str, int]] = None) -> None:
+        """Record written docs and the row checkpoint in one transaction."""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO docs (doc_id, content_hash, chunk_params, chunk_count) "
+                "VALUES (?, ?, ?, ?)",
+                list(entries),
+            )
+            if progress is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO progress (source, rows_done) VALUES (?, ?)", progress
+                )
+
+    def clear_progress(self, source: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM progress WHERE source = ?", (source,))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            docs, chunks = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chunk_count), 0) FROM docs"
+            ).fetchone()
+        return {"docs": int(docs), "chunks": int(chunks)}
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
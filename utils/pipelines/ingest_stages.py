@@ -0,0 +1,221 @@
+import time
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.pipelines.ingest_manifest import IngestManifest, ManifestEntry
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    seconds: float = 0.0
+    unit: str = "chunks"
+
+    def add(self, n: int, dt: float) -> None:
+        self.items += n
+        self.seconds += dt
+
+    @property
+    def rate(self) -> float:
+        return self.items / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"items": self.items, "unit": self.unit, "seconds": round(self.seconds, 4), "rate": round(self.rate, 2)}
+
+    def summary(self) -> str:
+        return f"[{self.name}] {self.items} {self.unit} in {self.seconds:.2f}s ({self.rate:.1f} {self.unit}/s)"
+
+
+@dataclass
+class ChunkRecord:
+    uuid: str
+    properties: Dict[str, Any]
+
+    @property
+    def text(self) -> str:
+        return self.properties["text"]
+
+
+@dataclass
+class PreparedDoc:
+    entry: ManifestEntry
+    records: List[ChunkRecord]
+    orphans: List[str] = field(default_factory=list)   # chunk uuids to delete
+
+
+_STOP = object()
+
+
+class BatchWriter(threading.Thread):
+    """
+    Writer stage: drains (records, vectors) batches from a bounded queue into
+    `collection.batch` so Weaviate writes overlap with encoding in the caller.
+
+    With a manifest, docs handed over with a batch are recorded once the batch
+    has been flushed without errors, every `checkpoint_every` docs.
+    """
+    def __init__(
+        self,
+        collection,
+        stats: StageStats,
+        queue_size: int = 8,
+        manifest: Optional[IngestManifest] = None,
+        checkpoint_every: int = 500,
+    ):
+        super().__init__(name="weaviate-batch-writer", daemon=True)
+        self.collection = collection
+        self.stats = stats
+        self.q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.error: Optional[BaseException] = None
+        self.manifest = manifest
+        self.checkpoint_every = checkpoint_every
+        self._staged: List[ManifestEntry] = []
+        self._progress: Optional[Tuple[str, int]] = None
+        self._failed_seen = 0
+
+    def run(self):
+        stopped = False
+        try:
+            with self.collection.batch.dynamic() as batch:
+                while True:
+                    item = self.q.get()
+                    if item is _STOP:
+                        stopped = True
+                        t0 = time.perf_counter()
+                        break
+                    op, payload = item
+                    if op == "delete":
+                        from weaviate.classes.query import Filter
+                        self.collection.data.delete_many(where=Filter.by_id().contains_any(payload))
+                        continue
+                    records, vectors, docs, progress = payload
+                    t0 = time.perf_counter()
+                    for rec, vec in zip(records, vectors):
+                        batch.add_object(properties=rec.properties, vector=vec, uuid=rec.uuid)
+                    self.stats.add(len(records), time.perf_counter() - t0)
+                    self._staged.extend(docs)
+                    if progress is not None:
+                        self._progress = progress
+                    if self.manifest is not None and len(self._staged) >= self.checkpoint_every:
+                        batch.flush()
+                        self._checkpoint()
+            # time spent flushing the tail of the batch on context exit
+            self.stats.add(0, time.perf_counter() - t0)
+            self._checkpoint()
+        except BaseException as e:
+            self.error = e
+            # keep draining so producers never block on a dead writer
+            while not stopped and self.q.get() is not _STOP:
+                pass
+
+    def _checkpoint(self) -> None:
+        if self.manifest is None:
+            return
+        failed = self.collection.batch.failed_objects
+        bad = {str(f.object_.properties.get("doc_id")) for f in failed[self._failed_seen:]}
+        self._failed_seen = len(failed)
+        if bad:
+            print(f"[WARN] {len(bad)} docs had failed writes; they will be retried next run")
+        entries = [e for e in self._staged if e.doc_id not in bad]
+        # don't move the row checkpoint past docs that failed to write
+        self.manifest.commit(entries, None if bad else self._progress)
+        self._staged = []
+
+    def put(
+        self,
+        records: List[ChunkRecord],
+        vectors: np.ndarray,
+        docs: Optional[List[ManifestEntry]] = None,
+        progress: Optional[Tuple[str, int]] = None,
+    ) -> None:
+        if self.error is not None:
+            raise RuntimeError("Batch writer failed") from self.error
+        self.q.put(("write", (records, vectors, docs or [], progress)))
+
+    def delete(self, uuids: List[str]) -> None:
+        if self.error is not None:
+            raise RuntimeError("Batch writer failed") from self.error
+        self.q.put(("delete", uuids))
+
+    def close(self) -> None:
+        self.q.put(_STOP)
+        self.join()
+        if self.error is not None:
+            raise RuntimeError("Batch writer failed") from self.error
+
+    def abort(self) -> None:
+        # objects already in Weaviate stay; the manifest only covers flushed batches
+        self.close()
+
+
+class EmbedWorker(threading.Thread):
+    """
+    Embedding stage: the only thread that touches the encoder. Takes lists of
+    PreparedDoc from a bounded queue, encodes their chunks `batch_size` at a time
+    and hands vectors to the BatchWriter.
+    """
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        writer: BatchWriter,
+        stats: StageStats,
+        batch_size: int = 64,
+        queue_size: int = 8,
+    ):
+        super().__init__(name="embed-worker", daemon=True)
+        self.encode = encode
+        self.writer = writer
+        self.stats = stats
+        self.batch_size = batch_size
+        self.q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.error: Optional[BaseException] = None
+        self._pending: List[ChunkRecord] = []
+        self._done: List[ManifestEntry] = []
+
+    def _flush(self, progress: Optional[Tuple[str, int]] = None) -> None:
+        t0 = time.perf_counter()
+        vecs = self.encode([r.text for r in self._pending]) if self._pending else []
+        self.stats.add(len(self._pending), time.perf_counter() - t0)
+        self.writer.put(self._pending, vecs, docs=self._done, progress=progress)
+        self._pending, self._done = [], []
+
+    def run(self):
+        stopped = False
+        try:
+            while True:
+                item = self.q.get()
+                if item is _STOP:
+                    stopped = True
+                    self._flush()
+                    break
+                docs, progress = item
+                for doc in docs:
+                    if doc.orphans:
+                        self.writer.delete(doc.orphans)
+                    self._pending.extend(doc.records)
+                    self._done.append(doc.entry)
+                    if len(self._pending) >= self.batch_size:
+                        self._flush()
+                # progress may only travel with a flush that empties the buffer
+                if progress is not None:
+                    self._flush(progress)
+        except BaseException as e:
+            self.error = e
+            while not stopped and self.q.get() is not _STOP:
+                pass
+
+    def put(self, docs: List[PreparedDoc], progress: Optional[Tuple[str, int]] = None) -> None:
+        if self.error is not None:
+            raise RuntimeError("Embed worker failed") from self.error
+        self.q.put((docs, progress))
+
+    def close(self) -> None:
+        self.q.put(_STOP)
+        self.join()
+        if self.error is not None:
+            raise RuntimeError("Embed worker failed") from self.error
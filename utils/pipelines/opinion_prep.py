@@ -0,0 +1,256 @@
+"""
+Per-opinion text prep (clean -> date -> chunk -> ids) as plain module functions so
+it can run inside worker processes. VectorizeOpinions delegates to these.
+"""
+import re
+import time
+from dataclasses import dataclass
+from uuid import uuid5, NAMESPACE_URL
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from utils.pipelines.ingest_stages import ChunkRecord, PreparedDoc
+from utils.pipelines.ingest_manifest import IngestManifest, ManifestEntry, content_hash
+from utils.pipelines.token_chunker import TokenChunker, make_chunker
+
+EPOCH = "1970-01-01T00:00:00Z"
+
+
+def norm_date(x) -> str:
+    if pd.isna(x) or str(x).strip() == "":
+        return EPOCH
+    try:
+        dt = pd.to_datetime(x, errors="coerce", utc=True)
+        if pd.isna(dt):
+            return EPOCH
+        return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    except Exception:
+        return EPOCH
+
+
+def clean_text(text: str) -> str:
+    if not text:
+        return ""
+    text = re.sub(r"[\n\r\t\f\v]+", " ", text)
+    text = re.sub(r" {2,}", " ", text)
+    return text.strip()
+
+
+def clean_text_column(texts: pd.Series) -> List[str]:
+    """
+    Batch `clean_text` on Arrow string kernels; same output as the per-row regexes
+    (Arrow's whitespace trim matches str.strip). Missing text becomes "".
+    """
+    try:
+        arr = pa.array(texts, type=pa.string(), from_pandas=True)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        arr = pa.array(texts.where(texts.notna(), "").astype(str), type=pa.string())
+    arr = pc.fill_null(arr, "")
+    arr = pc.replace_substring_regex(arr, pattern=r"[\n\r\t\f\v]+", replacement=" ")
+    arr = pc.replace_substring_regex(arr, pattern=r" {2,}", replacement=" ")
+    return pc.utf8_trim_whitespace(arr).to_pylist()
+
+
+def norm_date_column(dates: pd.Series) -> List[str]:
+    """
+    Batch `norm_date`: one ISO8601 parse for the column, then per-element format
+    inference only for the values that did not parse, matching the scalar path.
+    """
+    if not (pd.api.types.is_object_dtype(dates) or pd.api.types.is_string_dtype(dates)):
+        return [norm_date(x) for x in dates]
+    present = dates.notna() & (dates.astype(str).str.strip() != "")
+    parsed = pd.to_datetime(dates.where(present), errors="coerce", utc=True, format="ISO8601")
+    retry = parsed.isna() & present
+    if retry.any():
+        parsed[retry] = pd.to_datetime(dates[retry], errors="coerce", utc=True, format="mixed")
+    out = parsed.dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return out.where(parsed.notna(), EPOCH).tolist()
+
+
+def stable_doc_id(doc: Dict[str, Any]) -> str:
+    base = f"{doc.get('title','')}::{doc.get('date_filed',0)}::{doc.get('id',0)}::{doc.get('absolute_url','')}"
+    return str(uuid5(NAMESPACE_URL, base))
+
+
+def stable_chunk_uuid(doc_id: str, chunk_index: int) -> str:
+    return str(uuid5(NAMESPACE_URL, f"{doc_id}::chunk::{chunk_index}"))
+
+
+def chunk_text(text: str, max_words=300, overlap=40) -> List[str]:
+    words = text.split()
+    chunks = []
+    start = 0
+    while start < len(words):
+        end = min(start + max_words, len(words))
+        chunk = " ".join(words[start:end])
+        chunks.append(chunk)
+        if end == len(words):
+            break
+        start = end - overlap  # sliding window with overlap
+    return chunks
+
+
+@dataclass(frozen=True)
+class ChunkSpec:
+    """How opinions are split; `params` is stored in the manifest so a change re-chunks."""
+    kind: str = "words"                 # "words" | "tokens"
+    max_words: int = 300
+    overlap: int = 40
+    model_id: str = "sentence-transformers/all-MiniLM-L6-v2"
+    window: int = 256                   # encoder window in tokens, incl. special tokens
+    overlap_tokens: int = 32
+    align_sentences: bool = False
+    measure_truncation: bool = False    # opt-in: re-tokenizes every chunk with the HF tokenizer
+
+    @property
+    def chunker(self) -> Optional[TokenChunker]:
+        return make_chunker(self.kind, self.model_id, self.window, self.overlap_tokens, self.align_sentences)
+
+    @property
+    def params(self) -> str:
+        chunker = self.chunker
+        return chunker.params if chunker is not None else chunk_params(self.max_words, self.overlap)
+
+
+@dataclass
+class PrepResult:
+    docs: List[PreparedDoc]
+    skipped: int = 0
+    seconds: float = 0.0
+    clean_seconds: float = 0.0    # clean/date/ids/manifest lookups
+    chunk_seconds: float = 0.0    # chunking and truncation measurement
+    rows: int = 0
+    truncated_tokens: int = 0
+
+
+def chunk_params(max_words: int, overlap: int) -> str:
+    return f"words:{max_words}:{overlap}"
+
+
+def _doc_header(doc, params: str, manifest: Optional[IngestManifest],
+                full_text: Optional[str] = None, date_filed: Optional[str] = None):
+    """
+    Doc-level prep before chunking. Returns None (nothing to write), a finished
+    PreparedDoc (text vanished, delete old chunks) or a dict to be chunked.
+    `full_text`/`date_filed` may be precomputed for a whole batch.
+    """
+    if full_text is None:
+        full_text = clean_text(doc["text"])
+    doc_id = stable_doc_id(doc)
+    prev = manifest.get(doc_id) if manifest is not None else None
+    if not full_text:
+        if prev is None or prev.chunk_count == 0:
+            return None
+        # text disappeared: drop every chunk we wrote for it
+        orphans = [stable_chunk_uuid(doc_id, ci) for ci in range(prev.chunk_count)]
+        return PreparedDoc(ManifestEntry(doc_id, "", params, 0), [], orphans)
+
+    title = doc.get("case_name", "")
+    if date_filed is None:
+        date_filed = norm_date(doc.get("date_filed")) or EPOCH
+    url = doc.get("absolute_url") or doc.get("url") or ""
+    court = doc.get("court")
+    court = court if isinstance(court, str) else ""   # missing CSV cells come through as NaN
+    digest = content_hash(full_text, title, date_filed, url)
+    if prev is not None and prev.content_hash == digest and prev.chunk_params == params:
+        return None
+    return {
+        "doc_id": doc_id, "title": title, "date_filed": date_filed, "url": url, "court": court,
+        "text": full_text, "digest": digest, "prev": prev,
+    }
+
+
+def _build_doc(head: Dict[str, Any], chunks: List[str], params: str) -> PreparedDoc:
+    doc_id, prev = head["doc_id"], head["prev"]
+    n = len(chunks)
+    records = [
+        ChunkRecord(
+            uuid=stable_chunk_uuid(doc_id, ci),
+            properties={
+                "doc_id": doc_id,
+                "chunk_index": ci,
+                "chunk_count": n,
+                "title": head["title"],
+                "date_filed": head["date_filed"],
+                "url": head["url"],
+                "court": head["court"],
+                "text": chunk,
+            },
+        )
+        for ci, chunk in enumerate(chunks)
+    ]
+    orphans = []
+    if prev is not None and prev.chunk_count > n:
+        orphans = [stable_chunk_uuid(doc_id, ci) for ci in range(n, prev.chunk_count)]
+    return PreparedDoc(ManifestEntry(doc_id, head["digest"], params, n), records, orphans)
+
+
+def prepare_doc(
+    doc,
+    max_words: int = 300,
+    overlap: int = 40,
+    manifest: Optional[IngestManifest] = None,
+) -> Optional[PreparedDoc]:
+    """
+    Clean and word-chunk one opinion. Returns None when there is nothing to write:
+    empty text, or (with a manifest) content and chunking unchanged since last ingest.
+    """
+    params = chunk_params(max_words, overlap)
+    head = _doc_header(doc, params, manifest)
+    if head is None or isinstance(head, PreparedDoc):
+        return head
+    return _build_doc(head, chunk_text(head["text"], max_words=max_words, overlap=overlap), params)
+
+
+# ---- process-pool entry points ----
+_worker_manifest: Optional[IngestManifest] = None
+
+
+def init_prep_worker(manifest_path: Optional[str]) -> None:
+    global _worker_manifest
+    _worker_manifest = IngestManifest(manifest_path) if manifest_path else None
+
+
+def prepare_frame(
+    frame: pd.DataFrame,
+    spec: ChunkSpec = ChunkSpec(),
+    manifest: Optional[IngestManifest] = None,
+) -> PrepResult:
+    """
+    Prep a batch of opinion rows. Text cleaning and date parsing run column-wise
+    over the whole frame; with a token chunker the batch is tokenized in one call.
+    """
+    t0 = time.perf_counter()
+    manifest = manifest if manifest is not None else _worker_manifest
+    params = spec.params
+    result = PrepResult(docs=[], rows=len(frame))
+    texts = clean_text_column(frame["text"])
+    dates = norm_date_column(frame["date_filed"]) if "date_filed" in frame else [EPOCH] * len(frame)
+    heads = []
+    for doc, full_text, date_filed in zip(frame.to_dict("records"), texts, dates):
+        head = _doc_header(doc, params, manifest, full_text=full_text, date_filed=date_filed)
+        if head is None:
+            result.skipped += 1
+        elif isinstance(head, PreparedDoc):
+            result.docs.append(head)
+        else:
+            heads.append(head)
+    t1 = time.perf_counter()
+
+    chunker = spec.chunker
+    if chunker is not None:
+        chunk_lists = chunker.chunk_many([h["text"] for h in heads])
+    else:
+        chunk_lists = [chunk_text(h["text"], max_words=spec.max_words, overlap=spec.overlap) for h in heads]
+    for head, chunks in zip(heads, chunk_lists):
+        result.docs.append(_build_doc(head, chunks, params))
+
+    if spec.measure_truncation:
+        counter = chunker or TokenChunker(spec.model_id, window=spec.window)
+        result.truncated_tokens = counter.count_truncated([c for cl in chunk_lists for c in cl])
+    t2 = time.perf_counter()
+    result.clean_seconds, result.chunk_seconds, result.seconds = t1 - t0, t2 - t1, t2 - t0
+    return result
@@ -0,0 +1,65 @@
+import glob
+import os
+from typing import Iterator, List, Optional, Sequence, Union
+
+import pandas as pd
+
+# Columns the ingest path reads; anything else in the dump is never materialized.
+OPINION_COLUMNS = ("id", "case_name", "title", "date_filed", "absolute_url", "url", "court", "text")
+
+
+def resolve_paths(paths: Union[str, Sequence[str]]) -> List[str]:
+    """Expand a path, glob, or list of either into a sorted, de-duplicated file list."""
+    if isinstance(paths, str):
+        paths = [paths]
+    out: List[str] = []
+    for p in paths:
+        matches = sorted(glob.glob(os.path.expanduser(p))) if glob.has_magic(p) else [p]
+        for m in matches:
+            if m not in out:
+                out.append(m)
+    missing = [p for p in out if not os.path.isfile(p)]
+    if missing or not out:
+        raise FileNotFoundError(f"No opinion files found for {list(paths)} (missing: {missing})")
+    return out
+
+
+def iter_source_frames(
+    path: str,
+    chunksize: int = 1000,
+    columns: Optional[Sequence[str]] = OPINION_COLUMNS,
+    skip_rows: int = 0,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream one CSV as DataFrames of at most `chunksize` rows. The first `skip_rows`
+    records are dropped after parsing (quoted opinion text spans lines, so raw
+    line skipping would miscount).
+    """
+    wanted = set(columns) if columns else None
+    reader = pd.read_csv(
+        path,
+        chunksize=chunksize,
+        usecols=(lambda c: c in wanted) if wanted else None,
+    )
+    with reader:
+        for frame in reader:
+            if skip_rows >= len(frame):
+                skip_rows -= len(frame)
+                continue
+            if skip_rows:
+                frame = frame.iloc[skip_rows:]
+                skip_rows = 0
+            yield frame
+
+
+def iter_opinion_frames(
+    paths: Union[str, Sequence[str]],
+    chunksize: int = 1000,
+    columns: Optional[Sequence[str]] = OPINION_COLUMNS,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream opinions as DataFrames of at most `chunksize` rows so peak memory is
+    bounded by the record batch, not the size of the dump.
+    """
+    for path in resolve_paths(paths):
+        yield from iter_source_frames(path, chunksize=chunksize, columns=columns)
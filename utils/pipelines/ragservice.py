@@ -1,23 +1,37 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional
 # from utils.telemetry.decorators import instrument_llm, instrument_retriever
-from utils.telemetry import instrument_retriever, instrument_llm
-from utils.models.llm.hf_infer import HFModelManager, HFLoadConfig, GenerateConfig
-from utils.retriever.weaviate_retriever import WeaviateRetriever
+from utils.telemetry import instrument_retriever, instrument_llm, instrument_reranker
+from utils.models.llm.hf_infer import HFModelManager, HFLoadConfig, GenerateConfig, IRAC_ADAPTER, IRAC_GENERATE_CFG
+from utils.models.llm.scheduler import GenerationScheduler
+from utils.retriever.base import BaseRetriever
+from utils.retriever.filters import SearchFilters
+from utils.retriever.reranker import CrossEncoderReranker
 from utils.pipelines.prompt_engineering import initial_prompt, summarize_opinion_prompt, summarize_irac_prompt
 import os
 os.environ["CUDA_LAUNCH_BLOCKING"] = "1"
 os.environ["PYTORCH_CUDA_ALLOC_CONF"] = "max_split_size_mb:256,expandable_segments:True"
 
 
+def _display_score(doc: Dict[str, Any]) -> Optional[float]:
+    """The score that decided the order: the cross-encoder's when reranked, else retrieval's."""
+    return doc.get("_rerank_score", doc.get("_score"))
+
+
 class RAGService:
-    def __init__(self, llm_cfg:HFLoadConfig, cfg:GenerateConfig, retriever: WeaviateRetriever):
+    def __init__(self, llm_cfg:HFLoadConfig, cfg:GenerateConfig, retriever: BaseRetriever,
+                 reranker: Optional[CrossEncoderReranker] = None, max_batch_size: int = 1,
+                 max_wait_ms: float = 25.0):
         self.llm = HFModelManager(llm_cfg)
         self.cfg = cfg
         self.retriever = retriever
+        self.reranker = reranker
+        # concurrent callers (API requests) share padded generate() batches; 1 = call the model directly
+        self.scheduler = (GenerationScheduler(self.llm, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+                          if max_batch_size > 1 else None)
         
     @instrument_retriever(
         name="hybrid_search",
-        input_getter=lambda query, **_: query,
+        input_getter=lambda self, query, *_, **__: query,
         output_getter=lambda out: out,  
     )
     def hybrid_search(self, query: str, k: int = 8) -> List[Dict[str, Any]]:
@@ -25,7 +39,7 @@ class RAGService:
     
     @instrument_retriever(
         name="keyword_search",
-        input_getter=lambda query, **_: query,
+        input_getter=lambda self, query, *_, **__: query,
         output_getter=lambda out: out,  
     )
     def keyword_search(self, query: str, k: int = 8) -> List[Dict[str, Any]]:
@@ -33,50 +47,118 @@ class RAGService:
     
     @instrument_retriever(
         name="semantic_search",
-        input_getter=lambda query, **_: query,
+        input_getter=lambda self, query, *_, **__: query,
         output_getter=lambda out: out,  
     )
     def keyword_search(self, query: str, k: int = 8) -> List[Dict[str, Any]]:
         return self.retriever.retrieve_semantic(query, top_k=k)
     
+    @instrument_retriever(
+        name="document_search",
+        input_getter=lambda self, query, *_, **__: query,
+        # (title, retrieval score, cross-encoder score): the last one decided the order when set
+        output_getter=lambda out: [(d.get("title"), d.get("_score"), d.get("_rerank_score")) for d in out],
+    )
+    def document_search(self, query: str, k: int = 3, window: int = 1, candidates: int = 10,
+                        filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+        rerank = self.rerank if self.reranker else None
+        return self.retriever.retrieve_documents(query, top_docs=k, window=window, candidates=candidates,
+                                                 filters=filters, rerank=rerank)
+
+    @instrument_reranker(
+        name="cross_encoder_rerank",
+        input_getter=lambda self, query, *_, **__: query,
+        output_getter=lambda out: [(h.get("title"), h.get("_rerank_score")) for h in out],
+    )
+    def rerank(self, query: str, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self.reranker.rerank(query, hits)
+    
     @instrument_llm(
         name="generate_text",
-        input_getter=lambda query, **_: query,
+        input_getter=lambda self, query, *_, **__: query,
         output_getter=lambda out: out,       # record the return value
     )
     def llm_inference(self, prompt: str) -> str:
+        if self.scheduler:
+            return self.scheduler.generate(prompt, GenerateConfig())
         out = self.llm.make_inference(prompt, GenerateConfig())
         return out
     @instrument_llm(
         name="generate_irac_summary",
-        input_getter=lambda query, **_: query,
+        input_getter=lambda self, query, *_, **__: query,
         output_getter=lambda out: out,       # record the return value
     )
     def llm_irac_inference(self, prompt: str) -> str:
+        if self.scheduler:
+            # same sampling as the pipeline path; returns only the summary, which refine_output passes through
+            return self.scheduler.generate(prompt, IRAC_GENERATE_CFG, adapter=IRAC_ADAPTER)
         out = self.llm.make_irac_inference(prompt, GenerateConfig())
         return out
 
+    def close(self) -> None:
+        if self.scheduler:
+            self.scheduler.close()
+        self.retriever.close()
+
     def refine_output(self, out):
         return out.split("[END USER PROMPT]")[-1]
 
-    def run_pipeline(self, query: str) -> Dict[str, Any]:
+    def run_pipeline_stream(self, query: str, filters: Optional[SearchFilters] = None) -> Iterator[Dict[str, Any]]:
+        """
+        `run_pipeline` as a stream of events, so callers can show progress and
+        the IRAC summary token by token instead of waiting for the last token:
+
+            {"event": "stage", "stage": "query" | "retrieval" | "summary"}
+            {"event": "query", "text": <extracted search terms>}
+            {"event": "documents", "documents": [{title, doc_id, url, date_filed, score,
+                                                  retrieval_score, rerank_score, chunks}, ...]}
+            {"event": "token", "text": <piece of the IRAC summary>}
+            {"event": "done", "answer": <full summary>, "source": <title>}   # answer None if nothing retrieved
+        """
+        yield {"event": "stage", "stage": "query"}
+        cleaned_simplified_prompt = self.refine_output(self.llm_inference(initial_prompt(query)))
+        yield {"event": "query", "text": cleaned_simplified_prompt}
+
+        yield {"event": "stage", "stage": "retrieval"}
+        docs = self.document_search(cleaned_simplified_prompt, k=3, window=1, candidates=20, filters=filters)
+        yield {"event": "documents", "documents": [
+            {"title": d.get("title"), "doc_id": d.get("doc_id"), "url": d.get("url"),
+             "date_filed": str(d["date_filed"]) if d.get("date_filed") else None,
+             "score": _display_score(d), "retrieval_score": d.get("_score"),
+             "rerank_score": d.get("_rerank_score"), "chunks": d.get("chunk_indices")}
+            for d in docs
+        ]}
+        if not docs:
+            print("[WARN] No documents retrieved")
+            yield {"event": "done", "answer": None, "source": None}
+            return
+
+        best_doc = docs[0]
+        best_doc_info = f"Title:{best_doc.get('title')} Text: {best_doc.get('text')}"
+        yield {"event": "stage", "stage": "summary"}
+        pieces = []
+        for piece in self.llm.stream_irac_inference(summarize_irac_prompt(best_doc_info, query)):
+            pieces.append(piece)
+            yield {"event": "token", "text": piece}
+        yield {"event": "done", "answer": "".join(pieces), "source": best_doc.get("title")}
+
+    def run_pipeline(self, query: str, filters: Optional[SearchFilters] = None) -> Dict[str, Any]:
         prompt = initial_prompt(query)
         simplified_prompt = self.llm_inference(prompt)
         cleaned_simplified_prompt = self.refine_output(simplified_prompt)
         
-        hits = self.hybrid_search(cleaned_simplified_prompt, k=10)
-        top_docs = {doc.get('title'): [] for doc in hits[:3] } #get highest score docs
-        for doc in hits:
-            title = doc.get('title')
-            text = doc.get('text')
-            score = doc.get('_score')
-            print(f"Top K Docs:\nTitle = {title}\nScore = {score}\nText = {text[:100]}")
-            if title in set(top_docs.keys()):
-                top_docs[title].append(text)
+        # chunk hits (cross-encoder reranked when a reranker is set) grouped by doc_id,
+        # each top doc widened by its neighbouring chunks in order
+        docs = self.document_search(cleaned_simplified_prompt, k=3, window=1, candidates=20, filters=filters)
+        for doc in docs:
+            print(f"Top K Docs:\nTitle = {doc.get('title')}\nScore = {_display_score(doc)}\n"
+                  f"Chunks = {doc.get('chunk_indices')}\nText = {doc.get('text', '')[:100]}")
+        if not docs:
+            print("[WARN] No documents retrieved")
+            return None
 
-        best_doc = list(top_docs.items())[0]
-        best_doc_text = ' '.join(best_doc[1])
-        best_doc_info = f"Title:{best_doc[0]} Text: {best_doc_text}"
+        best_doc = docs[0]
+        best_doc_info = f"Title:{best_doc.get('title')} Text: {best_doc.get('text')}"
         prompt = summarize_irac_prompt(best_doc_info,  query)
         out = self.llm_irac_inference(prompt)
         print("Final Prompt Output:\n")
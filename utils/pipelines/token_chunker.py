@@ -0,0 +1,108 @@
+from typing import Dict, List, Optional
+
+_TOKENIZERS: Dict[str, object] = {}
+_SENTENCE_END = (".", "?", "!", ";")
+
+
+def get_tokenizer(model_id: str):
+    """One fast tokenizer per process; pool workers reuse it across tasks."""
+    tok = _TOKENIZERS.get(model_id)
+    if tok is None:
+        from transformers import AutoTokenizer
+        tok = AutoTokenizer.from_pretrained(model_id, use_fast=True)
+        _TOKENIZERS[model_id] = tok
+    return tok
+
+
+class TokenChunker:
+    """
+    Chunk on the embedding tokenizer's offsets so every chunk fits the encoder
+    window (`window` includes the [CLS]/[SEP] special tokens). Windows never start
+    or end inside a word; with `align_sentences`, a window ends at the last
+    sentence boundary in its second half when one exists.
+    """
+    def __init__(
+        self,
+        model_id: str = "sentence-transformers/all-MiniLM-L6-v2",
+        window: int = 256,
+        overlap: int = 32,
+        align_sentences: bool = False,
+    ):
+        self.model_id = model_id
+        self.window = window
+        self.overlap = overlap
+        self.align_sentences = align_sentences
+
+    @property
+    def tokenizer(self):
+        return get_tokenizer(self.model_id)
+
+    @property
+    def max_tokens(self) -> int:
+        return self.window - self.tokenizer.num_special_tokens_to_add(pair=False)
+
+    @property
+    def params(self) -> str:
+        mode = "sent" if self.align_sentences else "tok"
+        return f"tokens:{self.model_id}:{self.window}:{self.overlap}:{mode}"
+
+    def chunk_many(self, texts: List[str]) -> List[List[str]]:
+        if not texts:
+            return []
+        enc = self.tokenizer(
+            texts, add_special_tokens=False, return_offsets_mapping=True, truncation=False,
+        )
+        return [self._windows(t, offs) for t, offs in zip(texts, enc["offset_mapping"])]
+
+    def chunk(self, text: str) -> List[str]:
+        return self.chunk_many([text])[0]
+
+    def _windows(self, text: str, offs) -> List[str]:
+        n = len(offs)
+        if n == 0:
+            return [text] if text else []
+        # word_start[i]: token i begins a whitespace-delimited word
+        word_start = [i == 0 or offs[i][0] > offs[i - 1][1] for i in range(n)]
+        max_tokens = self.max_tokens
+        chunks: List[str] = []
+        start = 0
+        while start < n:
+            end = min(start + max_tokens, n)
+            if end < n:
+                end = self._snap_end(text, offs, word_start, start, end)
+            chunks.append(text[offs[start][0]:offs[end - 1][1]])
+            if end >= n:
+                break
+            nxt = max(end - self.overlap, start + 1)
+            while nxt < end and not word_start[nxt]:
+                nxt += 1
+            start = nxt
+        return chunks
+
+    def _snap_end(self, text: str, offs, word_start, start: int, end: int) -> int:
+        floor = start + (end - start) // 2
+        if self.align_sentences:
+            for j in range(end - 1, floor - 1, -1):
+                piece = text[offs[j][0]:offs[j][1]]
+                if piece.endswith(_SENTENCE_END) and word_start[j + 1]:
+                    return j + 1
+        # back off to a word boundary so the tail word is not split
+        j = end
+        while j > start + 1 and not word_start[j]:
+            j -= 1
+        return j if j > start else end
+
+    def count_truncated(self, chunks: List[str]) -> int:
+        """Tokens the encoder would drop: everything past `window` per chunk."""
+        if not chunks:
+            return 0
+        ids = self.tokenizer(chunks, add_special_tokens=True, truncation=False)["input_ids"]
+        return sum(max(0, len(x) - self.window) for x in ids)
+
+
+def make_chunker(kind: str, model_id: str, window: int, overlap: int, align_sentences: bool) -> Optional[TokenChunker]:
+    if kind == "words":
+        return None
+    if kind == "tokens":
+        return TokenChunker(model_id, window=window, overlap=overlap, align_sentences=align_sentences)
+    raise ValueError(f"Unknown chunker '{kind}' (expected 'words' or 'tokens')")
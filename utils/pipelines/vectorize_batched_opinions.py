@@ -1,146 +1,406 @@
-import os, time, urllib.request
+import os
 from tqdm import tqdm
-from uuid import uuid5, NAMESPACE_URL
 import pandas as pd
-import weaviate
-from weaviate.classes.config import Configure, Property, DataType
-from weaviate.util import generate_uuid5
-from utils.retriever.weaviate_retriever import WeaviateRetriever
-from sentence_transformers import SentenceTransformer
-from dotenv import load_dotenv
-import requests
+from weaviate.classes.config import Configure, Property, DataType, Tokenization
 from numpy import float32
-import re
-from typing import List, Dict, Any
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Sequence, Union
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from utils.pipelines import opinion_prep
+from utils.pipelines.ingest_stages import StageStats, ChunkRecord, PreparedDoc, BatchWriter, EmbedWorker
+from utils.common.registry import get_client, get_encoder, release_client
+from utils.pipelines.index_profiles import IndexProfile, PROFILES, describe_profile, get_profile
+from utils.pipelines.ingest_manifest import IngestManifest, source_key
+from utils.pipelines.opinion_sources import resolve_paths, iter_source_frames
+from utils.pipelines.corpus_store import CorpusStore, CorpusWriter
+from utils.common.embedding_cache import open_cached_encoder
+from utils.common.index_epoch import bump_epoch
 # load_dotenv()
 # TOKEN = os.getenv("COURTLISTENER_API_KEY")
 # point to your env file
 
-df_path = "./data/raw/all_opinions.csv"
-df = pd.read_csv(df_path)
-
 WEAVIATE_HOST = os.getenv("WEAVIATE_HOST", "127.0.0.1")   # "weaviate" if running inside the app container
 WEAVIATE_HTTP_PORT = int(os.getenv("WEAVIATE_PORT", "8080"))
 WEAVIATE_GRPC_PORT = int(os.getenv("WEAVIATE_GRPC_PORT", "50051"))
 # CSV_PATH = os.getenv("CSV_PATH", "./data/raw/netflix/netflix_titles.csv")
+EMBED_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+COURT_PROPERTY = Property(name="court", data_type=DataType.TEXT, tokenization=Tokenization.FIELD,
+                          index_filterable=True, index_searchable=False)
 
+@dataclass
+class IngestConfig:
+    encode_batch_size: int = 64     # chunks per SentenceTransformer.encode call
+    write_queue_size: int = 8       # encoded batches buffered ahead of the writer
+    read_chunksize: int = 1000      # CSV rows held in memory at once
+    chunker: str = "words"          # "words" (max_words/overlap) | "tokens" (embedding tokenizer)
+    max_words: int = 300
+    overlap: int = 40
+    chunk_tokens: Optional[int] = None    # token window; defaults to the model's max_seq_length
+    overlap_tokens: int = 32
+    align_sentences: bool = False         # token chunker: end windows on sentence boundaries
+    measure_truncation: bool = False      # count tokens the encoder would drop; re-tokenizes every chunk, so off by default
+    embedding_cache: Optional[str] = None # dir of the on-disk embedding cache; None disables
+    embedding_cache_size: int = 1_000_000 # max cached vectors before LRU eviction
+    manifest_path: Optional[str] = None   # set to enable incremental/resumable ingest
+    checkpoint_every: int = 500           # docs between manifest checkpoints
+    workers: int = 0                      # text-prep processes; 0 preps inline
+    index_profile: str = "default"        # vector index profile for new collections (index_profiles.PROFILES)
 
 
 class VectorizeOpinions:
-    def __init__(self):
-        print(f"CONNECTING TO CLIENT {WEAVIATE_HTTP_PORT}")
-        self.client = self.init_client()
-        print("✅ Connected to Weaviate client")
-        self.tok = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    def __init__(self, client=None, model=None):
+        # client/model may be injected (e.g. the in-memory stand-ins in benchmarks/)
+        self._client = client
+        self._pooled = False   # True when _client came from the registry pool
+        self.tok = model if model is not None else get_encoder(EMBED_MODEL_ID)
+
+    @property
+    def client(self):
+        # connect lazily: exporting a corpus store never talks to Weaviate
+        if self._client is None:
+            print(f"CONNECTING TO CLIENT {WEAVIATE_HTTP_PORT}")
+            self._client = self.init_client()
+            self._pooled = True
+            print("✅ Connected to Weaviate client")
+        return self._client
         
     def init_client(self):
-        return weaviate.connect_to_custom(
-            http_host=WEAVIATE_HOST, http_port=WEAVIATE_HTTP_PORT, http_secure=False,
-            grpc_host=WEAVIATE_HOST, grpc_port=WEAVIATE_GRPC_PORT, grpc_secure=False,
-        )
+        return get_client(WEAVIATE_HOST, WEAVIATE_HTTP_PORT, WEAVIATE_GRPC_PORT)
         
     def norm_date(self, x):
-        if pd.isna(x) or str(x).strip() == "":
-            return "1970-01-01T00:00:00Z"
-        try:
-            dt = pd.to_datetime(x, errors="coerce", utc=True)
-            if pd.isna(dt):
-                return "1970-01-01T00:00:00Z"
-            return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-        except Exception:
-            return "1970-01-01T00:00:00Z"
+        return opinion_prep.norm_date(x)
         
     def _clean_txt(self, text: str) -> str:
-        if not text:
-            return ""
-        text = re.sub(r"[\n\r\t\f\v]+", " ", text)
-        text = re.sub(r" {2,}", " ", text)
-        return text.strip()
+        return opinion_prep.clean_text(text)
         
     def stable_doc_id(self, doc: Dict[str, Any]) -> str:
-        base = f"{doc.get('title','')}::{doc.get('date_filed',0)}::{doc.get('id',0)}::{doc.get('absolute_url','')}"
-        return str(uuid5(NAMESPACE_URL, base))
+        return opinion_prep.stable_doc_id(doc)
     def stable_chunk_uuid(self, doc_id: str, chunk_index: int) -> str:
-        return str(uuid5(NAMESPACE_URL, f"{doc_id}::chunk::{chunk_index}"))
+        return opinion_prep.stable_chunk_uuid(doc_id, chunk_index)
+
+    def ensure_collection(self, index: str = 'Cases', profile: Optional[IndexProfile] = None):
+        # Create collection if missing (BYO vectors => VectorConfig.none).
+        # Filter targets get exact (field) tokenization and range indexes so SearchFilters
+        # run as index lookups; range filters need Weaviate >= 1.26.
+        profile = profile or PROFILES["default"]
+        if index not in self.client.collections.list_all():
+            self.client.collections.create(
+                name=index,
+                properties=[
+                    Property(name="doc_id", data_type=DataType.TEXT, tokenization=Tokenization.FIELD,
+                             index_filterable=True, index_searchable=False),
+                    Property(name="chunk_index", data_type=DataType.NUMBER, index_range_filters=True),
+                    Property(name="chunk_count", data_type=DataType.NUMBER),
+                    Property(name="title", data_type=DataType.TEXT),
+                    Property(name="date_filed", data_type=DataType.DATE, index_filterable=True,
+                             index_range_filters=True),
+                    Property(name="url", data_type=DataType.TEXT),
+                    COURT_PROPERTY,
+                    Property(name="text", data_type=DataType.TEXT),
+                ],
+
+                vector_config=Configure.Vectors.self_provided(vector_index_config=profile.vector_index_config()),
+            )
+            print(f"Collection '{index}' created with vector index {describe_profile(profile)}")
+        else:
+            print(f"Collection '{index}' already exists")
+            if profile.name != "default":
+                print(f"[INFO] Index profile '{profile.name}' only applies to new collections; "
+                      f"use rebuild_index (main.py --rebuild-index) to convert '{index}'")
+            coll = self.client.collections.get(index)
+            if all(p.name != "court" for p in coll.config.get().properties):
+                # older collections predate court; existing chunks get it on their next re-ingest
+                coll.config.add_property(COURT_PROPERTY)
+                print(f"[INFO] Added 'court' property to '{index}'")
+        return self.client.collections.get(index)
 
-    def ingest(self, opinions_path: str, index: str='Cases'):
+    def mark_changed(self, index: str) -> None:
+        # bump the collection epoch so retriever result caches drop stale hits,
+        # also after a failed run that may have written part of its batches
         try:
-            # Create collection if missing (BYO vectors => VectorConfig.none)
-            if index not in self.client.collections.list_all():
-                self.client.collections.create(
-                    name=index,
-                    properties=[
-                        Property(name="doc_id", data_type=DataType.TEXT),
-                        Property(name="chunk_index", data_type=DataType.NUMBER),
-                        Property(name="chunk_count", data_type=DataType.NUMBER),
-                        Property(name="title", data_type=DataType.TEXT),
-                        Property(name="date_filed", data_type=DataType.DATE),
-                        Property(name="url", data_type=DataType.TEXT),
-                        Property(name="text", data_type=DataType.TEXT),
-                    ],
-
-                    vector_config=Configure.Vectors.self_provided(),
-                )
-                print(f"Collection '{index}' created")
-            else:
-                
-                print(f"Collection '{index}' already exists")
-            cases = self.client.collections.get(index)
-            
-            opinions_df = pd.read_csv(opinions_path)
-            with cases.batch.dynamic() as batch:
-                with tqdm(total=len(opinions_df), desc="Ingesting to Weaviate") as pbar:
-                    for i, doc in opinions_df.iterrows():
-                        full_text = self._clean_txt(doc["text"])
-                        title =  doc.get("case_name", "")
-                        
-                        if not full_text:
-                            pbar.update(1)
-                            continue
-                        
-                        doc_id = self.stable_doc_id(doc)
-                        chunks = self.chunk_text(full_text, max_words=300, overlap=40)
-                        n = len(chunks)
-                        for ci, chunk in enumerate(chunks):
-                            # tqdm.write(f"[{i}] {title} (chunk {ci+1}/{n})")
-                            
-                            vec = self.tok.encode(chunk).astype(float32)
-                            uid = self.stable_chunk_uuid(doc_id, ci)
-                            props = {
-                                "doc_id": doc_id,
-                                "chunk_index": ci,
-                                "chunk_count": n,
-                                "title": title,
-                                "date_filed": self.norm_date(doc.get("date_filed")) or "1970-01-01T00:00:00Z",
-                                "url": doc.get("absolute_url") or doc.get("url") or "",
-                                "text": chunk,
-                                }
-                            batch.add_object(
-                                properties=props,
-                                vector=vec,
-                                uuid=uid
-                                )
-                            msg = f"(chunk {ci+1}/{len(chunks)}) {title[:40]}"
-                            # tqdm.write(msg)
-                            pbar.set_postfix_str(msg)
-                        pbar.update(1)
-                        
+            bump_epoch(self.client, index)
+        except Exception as e:
+            print(f"[WARN] Could not bump epoch for '{index}': {e}")
+
+    def chunk_spec(self, cfg: IngestConfig) -> opinion_prep.ChunkSpec:
+        return opinion_prep.ChunkSpec(
+            kind=cfg.chunker,
+            max_words=cfg.max_words,
+            overlap=cfg.overlap,
+            model_id=EMBED_MODEL_ID,
+            window=cfg.chunk_tokens or self.tok.max_seq_length,
+            overlap_tokens=cfg.overlap_tokens,
+            align_sentences=cfg.align_sentences,
+            measure_truncation=cfg.measure_truncation,
+        )
+
+    def chunk_params(self, cfg: IngestConfig) -> str:
+        return self.chunk_spec(cfg).params
+
+    def prepare_doc(self, doc, cfg: IngestConfig, manifest: Optional[IngestManifest] = None) -> Optional[PreparedDoc]:
+        """One opinion through the same prep as ingest (`chunk_spec(cfg)`); None when there's nothing to write."""
+        result = opinion_prep.prepare_frame(pd.DataFrame([doc]), self.chunk_spec(cfg), manifest=manifest)
+        return result.docs[0] if result.docs else None
+
+    def encode_texts(self, texts: List[str], cfg: IngestConfig, encoder=None):
+        return (encoder or self.tok).encode(
+            texts,
+            batch_size=cfg.encode_batch_size,
+            convert_to_numpy=True,
+        ).astype(float32)
+
+    def encode_records(self, records: List[ChunkRecord], cfg: IngestConfig):
+        return self.encode_texts([r.text for r in records], cfg)
+
+    def _prep_pool(self, cfg: IngestConfig) -> Optional[ProcessPoolExecutor]:
+        if cfg.workers <= 0:
+            return None
+        # forkserver: workers fork from a clean server that imported the prep code once,
+        # not from this process with its gRPC channel and model threads
+        ctx = mp.get_context("forkserver")
+        ctx.set_forkserver_preload(["utils.pipelines.opinion_prep"])
+        return ProcessPoolExecutor(
+            max_workers=cfg.workers, mp_context=ctx,
+            initializer=opinion_prep.init_prep_worker, initargs=(cfg.manifest_path,),
+        )
+
+    @staticmethod
+    def new_stats() -> Dict[str, StageStats]:
+        return {
+            "clean": StageStats("clean", unit="docs"),
+            "chunk": StageStats("chunk"),
+            "embed": StageStats("embed"),
+            "write": StageStats("write"),
+        }
+
+    def _run_stages(self, opinions_path, cfg: IngestConfig, writer, stats: Dict[str, StageStats],
+                    manifest: Optional[IngestManifest] = None, desc: str = "Ingesting to Weaviate") -> List[str]:
+        """
+        Clean -> chunk -> embed -> `writer`, as three stages joined by bounded queues:
+        text prep runs inline or in a `cfg.workers` process pool, one EmbedWorker
+        thread owns the model and encodes `cfg.encode_batch_size` chunks at a time,
+        and `writer` (BatchWriter or CorpusWriter) is the single sink. CSVs are
+        streamed `cfg.read_chunksize` rows at a time. Returns the source keys read.
+        """
+        spec = self.chunk_spec(cfg)
+        pool = None
+        skipped = truncated = 0
+        encoder = open_cached_encoder(
+            self.tok, EMBED_MODEL_ID, cfg.embedding_cache, capacity=cfg.embedding_cache_size,
+        )
+        embedder = EmbedWorker(
+            lambda texts: self.encode_texts(texts, cfg, encoder), writer, stats["embed"],
+            batch_size=cfg.encode_batch_size, queue_size=cfg.write_queue_size,
+        )
+        writer.start()
+        embedder.start()
+        in_flight: deque = deque()
+
+        def drain(limit: int):
+            nonlocal skipped, truncated
+            while len(in_flight) > limit:
+                fut, progress, n_rows = in_flight.popleft()
+                res = fut.result()
+                skipped += res.skipped
+                truncated += res.truncated_tokens
+                stats["clean"].add(res.rows, res.clean_seconds)
+                stats["chunk"].add(sum(len(d.records) for d in res.docs), res.chunk_seconds)
+                embedder.put(res.docs, progress)
+                pbar.update(n_rows)
+                pbar.set_postfix_str(f"{stats['embed'].rate:.0f} emb/s {stats['write'].rate:.0f} wr/s")
+
+        sources = [(p, source_key(p)) for p in resolve_paths(opinions_path)]
+        completed = False
+        try:
+            pool = self._prep_pool(cfg)
+            with tqdm(desc=desc, unit="doc") as pbar:
+                for path, key in sources:
+                    rows = manifest.rows_done(key) if manifest is not None else 0
+                    if rows:
+                        print(f"[INFO] Resuming {path} after row {rows}")
+                    for frame in iter_source_frames(path, chunksize=cfg.read_chunksize, skip_rows=rows):
+                        rows += len(frame)
+                        if pool is None:
+                            fut = Future()
+                            fut.set_result(opinion_prep.prepare_frame(frame, spec, manifest=manifest))
+                        else:
+                            fut = pool.submit(opinion_prep.prepare_frame, frame, spec)
+                        # results are consumed in submission order so row checkpoints stay monotonic
+                        in_flight.append((fut, (key, rows), len(frame)))
+                        drain(limit=2 * max(cfg.workers, 1))
+                drain(limit=0)
+            completed = True
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            try:
+                embedder.close()
+            except BaseException:
+                completed = False
+                raise
+            finally:
+                # only a clean run finalizes the sink; a corpus store must not look complete after a crash
+                if completed:
+                    writer.close()
+                else:
+                    writer.abort()
+                if encoder is not self.tok:
+                    print(f"[INFO] Embedding cache: {encoder.cache.hits} hits, {encoder.cache.misses} misses")
+                    encoder.cache.close()
+
+        if manifest is not None:
+            print(f"[INFO] Skipped {skipped} unchanged/empty opinions; manifest {manifest.stats()}")
+        for s in stats.values():
+            print(s.summary())
+        if cfg.measure_truncation:
+            print(f"[INFO] {truncated} tokens past the {spec.window}-token encoder window were truncated ({spec.params})")
+        return [key for _, key in sources]
+
+    def ingest(self, opinions_path: Union[str, Sequence[str]], index: str='Cases', cfg: Optional[IngestConfig] = None):
+        """
+        Raw opinions -> `index`. `opinions_path` may be a file, a glob, or a list of either.
+
+        With `cfg.manifest_path` set the run is incremental: unchanged opinions are
+        skipped, shrunken ones lose their orphaned chunks, and progress is checkpointed
+        so a crashed ingest resumes from the last committed row.
+        """
+        cfg = cfg or IngestConfig()
+        stats = self.new_stats()
+        manifest = IngestManifest(cfg.manifest_path) if cfg.manifest_path else None
+        try:
+            cases = self.ensure_collection(index, get_profile(cfg.index_profile))
+            writer = BatchWriter(
+                cases, stats["write"], queue_size=cfg.write_queue_size,
+                manifest=manifest, checkpoint_every=cfg.checkpoint_every,
+            )
+            try:
+                keys = self._run_stages(opinions_path, cfg, writer, stats, manifest=manifest)
+            finally:
+                self.mark_changed(index)
+            if manifest is not None:
+                # full pass finished: the next run starts at row 0 and relies on hashes
+                for key in keys:
+                    manifest.clear_progress(key)
             class_obj = self.client.collections.get(index)
             total = class_obj.aggregate.over_all(total_count=True).total_count
             print(f"Collection '{index}' has {total} objects")
+            return stats
+        finally:
+            if manifest is not None:
+                manifest.close()
+            self.close()
+
+    def export_store(self, opinions_path: Union[str, Sequence[str]], store_dir: str, cfg: Optional[IngestConfig] = None):
+        """Phase one: raw opinions -> Parquet chunks + `.npy` vectors in `store_dir`. No Weaviate needed."""
+        cfg = cfg or IngestConfig()
+        stats = self.new_stats()
+        spec = self.chunk_spec(cfg)
+        writer = CorpusWriter(
+            store_dir, self.tok.get_sentence_embedding_dimension(), stats["write"],
+            meta={"model_id": EMBED_MODEL_ID, "chunk_params": spec.params},
+        )
+        self._run_stages(opinions_path, cfg, writer, stats, desc="Exporting corpus store")
+        print(f"[INFO] Wrote {writer.rows} chunks to {store_dir}")
+        return stats
+
+    def load_store(self, store_dir: str, index: str = 'Cases', cfg: Optional[IngestConfig] = None):
+        """Phase two: bulk load a corpus store into `index`; no parsing or encoding."""
+        cfg = cfg or IngestConfig()
+        store = CorpusStore(store_dir)
+        if store.meta.get("model_id") != EMBED_MODEL_ID:
+            print(f"[WARN] Store was embedded with {store.meta.get('model_id')}, retriever uses {EMBED_MODEL_ID}")
+        stats = StageStats("write")
+        try:
+            cases = self.ensure_collection(index, get_profile(cfg.index_profile))
+            writer = BatchWriter(cases, stats, queue_size=cfg.write_queue_size)
+            writer.start()
+            try:
+                with tqdm(total=len(store), desc=f"Loading {store_dir}", unit="chunk") as pbar:
+                    for records, vecs in store.iter_batches(batch_size=cfg.read_chunksize):
+                        writer.put(records, vecs)
+                        pbar.update(len(records))
+            finally:
+                writer.close()
+                self.mark_changed(index)
+            print(stats.summary())
+            total = cases.aggregate.over_all(total_count=True).total_count
+            print(f"Collection '{index}' has {total} objects")
         finally:
-            self.client.close()
+            self.close()
+
+    def rebuild_index(self, profile: IndexProfile, index: str = 'Cases', cfg: Optional[IngestConfig] = None):
+        """
+        Re-create `index` under a new vector index profile, keeping objects, uuids and
+        vectors (nothing is re-encoded). Objects are first copied into a flat staging
+        collection (no graph to build); `index` is only dropped once that copy is
+        complete, then recreated under `profile` and refilled from staging. Searches
+        against `index` fail while it is being refilled.
+        """
+        cfg = cfg or IngestConfig()
+        staging = f"{index}_Rebuild"
+        try:
+            existing = self.client.collections.list_all()
+            if index not in existing:
+                raise RuntimeError(f"Collection '{index}' not found")
+            if staging in existing:
+                # leftover of an interrupted rebuild; `index` was still intact if we got here
+                self.client.collections.delete(staging)
+            total = self._count(index)
+            print(f"[INFO] Rebuilding '{index}' ({total} objects) with vector index {describe_profile(profile, total)}")
+            self._copy_collection(index, self.ensure_collection(staging, PROFILES["flat"]), total, cfg)
+            copied = self._count(staging)
+            if copied != total:
+                raise RuntimeError(f"Staging copy has {copied} of {total} objects; '{index}' left unchanged")
+            self.client.collections.delete(index)
+            try:
+                self._copy_collection(staging, self.ensure_collection(index, profile), total, cfg)
+            finally:
+                self.mark_changed(index)
+            rebuilt = self._count(index)
+            if rebuilt != total:
+                raise RuntimeError(f"'{index}' has {rebuilt} of {total} objects; the full copy is kept in '{staging}'")
+            self.client.collections.delete(staging)
+            print(f"Collection '{index}' rebuilt with {rebuilt} objects")
+        finally:
+            self.close()
+
+    def _count(self, index: str) -> int:
+        return self.client.collections.get(index).aggregate.over_all(total_count=True).total_count
+
+    def _copy_collection(self, source: str, target, total: int, cfg: IngestConfig) -> None:
+        """Stream every object of `source` with its vector into the `target` collection."""
+        stats = StageStats("write")
+        writer = BatchWriter(target, stats, queue_size=cfg.write_queue_size)
+        writer.start()
+        records, vecs = [], []
+        try:
+            with tqdm(total=total, desc=f"Copying {source} -> {target.name}", unit="chunk") as pbar:
+                for obj in self.client.collections.get(source).iterator(include_vector=True):
+                    vec = obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector
+                    records.append(ChunkRecord(uuid=str(obj.uuid), properties=dict(obj.properties)))
+                    vecs.append(vec)
+                    if len(records) >= cfg.read_chunksize:
+                        writer.put(records, vecs)
+                        pbar.update(len(records))
+                        records, vecs = [], []
+                if records:
+                    writer.put(records, vecs)
+                    pbar.update(len(records))
+        finally:
+            writer.close()
+        print(stats.summary())
+
+    def close(self):
+        if self._client is not None:
+            if self._pooled:
+                release_client(self._client)   # shared connection stays open until exit
+            else:
+                self._client.close()
+            self._client = None
+            self._pooled = False
             print("Client is Closed")
-            
+
     def chunk_text(self, text: str, max_words=300, overlap=40) -> List[str]:
-        words = text.split()
-        chunks = []
-        start = 0
-        while start < len(words):
-            end = min(start + max_words, len(words))
-            chunk = " ".join(words[start:end])
-            chunks.append(chunk)
-            if end == len(words):
-                break
-            start = end - overlap  # sliding window with overlap
-        return chunks
\ No newline at end of file
+        return opinion_prep.chunk_text(text, max_words=max_words, overlap=overlap)
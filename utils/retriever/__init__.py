@@ -1,3 +1,16 @@
-from .weaviate_retriever import WeaviateRetriever
+# Lazy so importing one retriever (e.g. the async one in the API) doesn't load faiss or the others
+import importlib
 
-__all__ = ["WeaviateRetriever"]
+_EXPORTS = {
+    "BaseRetriever": ".base",
+    "WeaviateRetriever": ".weaviate_retriever",
+    "AsyncWeaviateRetriever": ".async_weaviate_retriever",
+    "LocalRetriever": ".local_retriever",
+}
+__all__ = ["BaseRetriever", "WeaviateRetriever", "AsyncWeaviateRetriever", "LocalRetriever"]
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
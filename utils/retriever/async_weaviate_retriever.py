@@ -0,0 +1,228 @@
+# utils/retriever/async_weaviate_retriever.py  (v4 async client)
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import weaviate
+from weaviate.classes.query import Filter, MetadataQuery
+from utils.common.index_epoch import AsyncEpochWatcher
+from utils.retriever.cache import LRUCache, SqliteCache, normalize_query, result_key
+from utils.retriever.filters import SearchFilters
+from utils.retriever.results import format_results, properties_to_fetch
+from utils.retriever.encoder import load_query_encoder
+
+
+class AsyncWeaviateRetriever:
+    """
+    WeaviateRetriever for asyncio servers: queries go over the Weaviate async
+    client and query encoding runs on a small dedicated thread pool, so the
+    event loop never blocks on the model or the network. Same caches and
+    result shape as the sync retriever.
+
+        r = AsyncWeaviateRetriever(...)
+        await r.connect()
+        hits = await r.retrieve_hybrid("fourth amendment search", top_k=5)
+        await r.close()
+    """
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        http_port: int = 8080,
+        grpc_port: int = 50051,
+        index: str = "Cases",
+        alpha: float = 0.6,
+        use_tls: bool = False,
+        api_key: Optional[str] = None,
+        embedding_cache: Optional[str] = None,
+        query_cache_size: int = 2048,
+        query_cache_ttl: Optional[float] = 3600.0,
+        result_cache_size: int = 1024,
+        result_cache_ttl: Optional[float] = None,
+        result_cache_path: Optional[str] = None,
+        epoch_refresh_seconds: float = 5.0,
+        encode_workers: int = 2,
+        encode_batch_size: int = 64,
+        encoder_backend: str = "torch",
+        onnx_dir: Optional[str] = None,
+        onnx_threads: Optional[int] = None,
+    ):
+        self.index = index
+        self.alpha = alpha
+        self.encode_batch_size = encode_batch_size
+        self.epoch_refresh_seconds = epoch_refresh_seconds
+        # shared with any other retriever in the process; the async client is bound to its loop, so it isn't pooled
+        self.model = load_query_encoder(embedding_cache, encoder_backend, onnx_dir, onnx_threads)
+        # torch already parallelizes one encode; a couple of threads keep the loop free without oversubscribing
+        self.encode_pool = ThreadPoolExecutor(max_workers=encode_workers, thread_name_prefix="query-encode")
+        self.query_cache = LRUCache(max_size=query_cache_size, ttl=query_cache_ttl)
+        if result_cache_path:
+            self.result_cache = SqliteCache(result_cache_path, max_size=result_cache_size, ttl=result_cache_ttl)
+        else:
+            self.result_cache = LRUCache(max_size=result_cache_size, ttl=result_cache_ttl)
+
+        conn_kwargs = dict(
+            http_host=host, http_port=http_port, http_secure=use_tls,
+            grpc_host=host, grpc_port=grpc_port, grpc_secure=use_tls,
+        )
+        if api_key:
+            from weaviate.auth import AuthApiKey
+            conn_kwargs["auth_credentials"] = AuthApiKey(api_key=api_key)
+        self.client = weaviate.use_async_with_custom(**conn_kwargs)
+        self.collection = None
+        self.epoch: Optional[AsyncEpochWatcher] = None
+        # result key -> pending search, so a burst of identical queries costs one round trip
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+    async def connect(self) -> "AsyncWeaviateRetriever":
+        await self.client.connect()
+        print("✅ Connected to Weaviate async client")
+        if self.index not in await self.client.collections.list_all():
+            await self.client.close()
+            raise RuntimeError(
+                f"Collection '{self.index}' not found. Run your ingest to create/load it."
+            )
+        self.collection = self.client.collections.get(self.index)
+        self.epoch = AsyncEpochWatcher(self.client, self.index, refresh_seconds=self.epoch_refresh_seconds)
+        return self
+
+    # ---- caches; the sqlite backend does file I/O, so keep it off the loop ----
+    async def _cache_get(self, key):
+        if isinstance(self.result_cache, SqliteCache):
+            return await asyncio.to_thread(self.result_cache.get, key)
+        return self.result_cache.get(key)
+
+    async def _cache_put(self, key, hits) -> None:
+        if isinstance(self.result_cache, SqliteCache):
+            await asyncio.to_thread(self.result_cache.put, key, hits)
+        else:
+            self.result_cache.put(key, hits)
+
+    async def _encode_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        keys = [normalize_query(q) for q in queries]
+        vecs = {k: self.query_cache.get(k) for k in dict.fromkeys(keys)}
+        missing = [k for k, v in vecs.items() if v is None]
+        if missing:
+            fresh = await asyncio.get_running_loop().run_in_executor(
+                self.encode_pool,
+                lambda: self.model.encode(missing, batch_size=self.encode_batch_size, normalize_embeddings=True),
+            )
+            for k, v in zip(missing, fresh):
+                vecs[k] = v.tolist()
+                self.query_cache.put(k, vecs[k])
+        return [vecs[k] for k in keys]
+
+    async def _hybrid(self, query_text: str, vec: Optional[List[float]], top_k: int, view: tuple,
+                      where=None) -> List[Dict[str, Any]]:
+        res = await self.collection.query.hybrid(
+            query=query_text,
+            vector=vec,
+            alpha=self.alpha,
+            limit=top_k,
+            filters=where,
+            return_properties=properties_to_fetch(*view),
+            return_metadata=MetadataQuery(score=True),
+        )
+        return format_results(res, view[0], query_text, view[1])
+
+    async def _bm25(self, query_text: str, vec: Optional[List[float]], top_k: int, view: tuple,
+                    where=None) -> List[Dict[str, Any]]:
+        res = await self.collection.query.bm25(query=query_text, limit=top_k, filters=where,
+                                               return_properties=properties_to_fetch(*view),
+                                               return_metadata=MetadataQuery(score=True))
+        return format_results(res, view[0], query_text, view[1])
+
+    async def _semantic(self, query_text: str, vec: Optional[List[float]], top_k: int, view: tuple,
+                        where=None) -> List[Dict[str, Any]]:
+        res = await self.collection.query.near_vector(vec, limit=top_k, filters=where,
+                                                      return_properties=properties_to_fetch(*view),
+                                                      return_metadata=MetadataQuery(score=True))
+        return format_results(res, view[0], query_text, view[1])
+
+    async def _search_many(self, mode: str, queries: Sequence[str], top_k: int,
+                           return_properties: Optional[Sequence[str]] = None,
+                           snippet_words: Optional[int] = None,
+                           filters: Optional[SearchFilters] = None) -> List[List[Dict[str, Any]]]:
+        if self.collection is None:
+            raise RuntimeError("AsyncWeaviateRetriever is not connected; await connect() first")
+        alpha = self.alpha if mode == "hybrid" else None
+        view = (tuple(return_properties) if return_properties else None, snippet_words or None)
+        if filters is not None and filters.is_empty():
+            filters = None
+        where = filters.to_weaviate() if filters is not None else None
+        epoch = await self.epoch.current()
+        keys = [result_key(mode, q, top_k, alpha, filters=filters, epoch=epoch, view=view) for q in queries]
+        first: Dict[tuple, int] = {}
+        for i, k in enumerate(keys):
+            first.setdefault(k, i)
+        found = {k: await self._cache_get(k) for k in first}
+        todo, joined = [], {}
+        for k, hits in found.items():
+            if hits is not None:
+                continue
+            if k in self._inflight:
+                joined[k] = self._inflight[k]
+            else:
+                todo.append(k)
+                self._inflight[k] = asyncio.get_running_loop().create_future()
+        try:
+            if todo:
+                texts = [queries[first[k]] for k in todo]
+                vecs = await self._encode_queries(texts) if mode != "bm25" else [None] * len(texts)
+                search = getattr(self, f"_{mode}")
+                fresh = await asyncio.gather(*(search(t, v, top_k, view, where) for t, v in zip(texts, vecs)))
+                for k, hits in zip(todo, fresh):
+                    found[k] = hits
+                    self._inflight[k].set_result(hits)
+                    await self._cache_put(k, hits)
+        except BaseException as e:
+            for k in todo:
+                fut = self._inflight[k]
+                if fut.done():
+                    continue
+                if isinstance(e, asyncio.CancelledError):
+                    fut.cancel()
+                else:
+                    fut.set_exception(e)
+                    fut.exception()   # joined callers re-raise it; don't log it as unretrieved
+            raise
+        finally:
+            for k in todo:
+                self._inflight.pop(k, None)
+        for k, fut in joined.items():
+            found[k] = await asyncio.shield(fut)
+        return [[dict(h) for h in found[k]] for k in keys]
+
+    async def retrieve_hybrid(self, query_text: str, top_k: int = 10, **view) -> List[Dict[str, Any]]:
+        return (await self._search_many("hybrid", [query_text], top_k, **view))[0]
+
+    async def retrieve_bm25(self, query_text: str, top_k: int = 10, **view) -> List[Dict[str, Any]]:
+        return (await self._search_many("bm25", [query_text], top_k, **view))[0]
+
+    async def retrieve_semantic(self, query_text: str, top_k: int = 10, **view) -> List[Dict[str, Any]]:
+        return (await self._search_many("semantic", [query_text], top_k, **view))[0]
+
+    async def fetch_texts(self, uuids: Sequence[str]) -> Dict[str, str]:
+        """Full `text` for hits returned in snippet or projected mode, in one round trip."""
+        uuids = list(dict.fromkeys(uuids))
+        if not uuids:
+            return {}
+        res = await self.collection.query.fetch_objects(
+            filters=Filter.by_id().contains_any(uuids), limit=len(uuids), return_properties=["text"],
+        )
+        return {str(obj.uuid): (obj.properties or {}).get("text", "") for obj in res.objects}
+
+    async def cache_stats(self) -> Dict[str, Any]:
+        return {
+            "query_vectors": self.query_cache.stats(),
+            "results": self.result_cache.stats(),
+            "epoch": await self.epoch.current() if self.epoch else None,
+        }
+
+    async def close(self) -> None:
+        self.encode_pool.shutdown(wait=False)
+        if isinstance(self.result_cache, SqliteCache):
+            self.result_cache.close()
+        try:
+            await self.client.close()
+        except Exception:
+            pass
@@ -0,0 +1,113 @@
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.retriever.cache import normalize_query
+from utils.retriever.documents import GROUP_PROPERTIES, group_hits, neighbor_spans, stitch_chunks
+from utils.retriever.filters import SearchFilters
+
+
+class BaseRetriever(ABC):
+    """
+    Sync retriever interface used by RAGService. Every hit is a dict with uuid,
+    title, date_filed, url, text and _score; `return_properties` narrows the
+    properties and `snippet_words` swaps `text` for a `snippet` around the
+    query terms (see `utils.retriever.results`). `filters` narrows the search
+    to a date range, documents or courts before ranking (see
+    `utils.retriever.filters`).
+
+    Subclasses that encode queries set `model`, `query_cache` and
+    `encode_batch_size` and get the cached batch encoder below.
+    """
+    alpha: float = 0.6
+
+    @abstractmethod
+    def retrieve_hybrid(self, query_text: str, top_k: int = 10, return_properties: Optional[Sequence[str]] = None,
+                        snippet_words: Optional[int] = None,
+                        filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def retrieve_bm25(self, query_text: str, top_k: int = 10, return_properties: Optional[Sequence[str]] = None,
+                      snippet_words: Optional[int] = None,
+                      filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def retrieve_semantic(self, query_text: str, top_k: int = 10, return_properties: Optional[Sequence[str]] = None,
+                          snippet_words: Optional[int] = None,
+                          filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+        ...
+
+    # batch variants; backends override these when they can do better than a loop
+    def retrieve_hybrid_many(self, queries: Sequence[str], top_k: int = 10, **view) -> List[List[Dict[str, Any]]]:
+        return [self.retrieve_hybrid(q, top_k, **view) for q in queries]
+
+    def retrieve_bm25_many(self, queries: Sequence[str], top_k: int = 10, **view) -> List[List[Dict[str, Any]]]:
+        return [self.retrieve_bm25(q, top_k, **view) for q in queries]
+
+    def retrieve_semantic_many(self, queries: Sequence[str], top_k: int = 10, **view) -> List[List[Dict[str, Any]]]:
+        return [self.retrieve_semantic(q, top_k, **view) for q in queries]
+
+    @abstractmethod
+    def fetch_texts(self, uuids: Sequence[str]) -> Dict[str, str]:
+        """uuid -> full chunk text, for lazily expanding snippet/projected hits."""
+        ...
+
+    @abstractmethod
+    def fetch_chunks(self, spans: Dict[str, List[Tuple[int, int]]]) -> Dict[str, List[Tuple[int, str]]]:
+        """doc_id -> [(chunk_index, text)] for the inclusive chunk_index ranges in `spans`."""
+        ...
+
+    def retrieve_documents(self, query_text: str, top_docs: int = 3, window: int = 1, candidates: int = 20,
+                           mode: str = "hybrid", filters: Optional[SearchFilters] = None,
+                           rerank: Optional[Callable[[str, List[Dict[str, Any]]], List[Dict[str, Any]]]] = None,
+                           ) -> List[Dict[str, Any]]:
+        """
+        Documents instead of chunks: the best `top_docs` doc_ids among `candidates`
+        chunk hits, each widened by `window` neighbouring chunks on both sides
+        (one batched fetch) and stitched in chunk order. Each document has doc_id,
+        title, date_filed, url, _score, chunk_count, chunk_indices and text.
+
+        `rerank(query_text, hits)` reorders the chunk hits (with their text)
+        before grouping, e.g. `CrossEncoderReranker.rerank`; documents then also
+        carry the deciding `_rerank_score` next to the retrieval `_score`.
+        """
+        props = GROUP_PROPERTIES + ("text",) if rerank else GROUP_PROPERTIES
+        hits = getattr(self, f"retrieve_{mode}")(query_text, top_k=candidates, return_properties=props,
+                                                 filters=filters)
+        if rerank:
+            hits = rerank(query_text, hits)
+        docs = group_hits(hits, top_docs)
+        chunked = [d for d in docs if not d["legacy"]]
+        found = self.fetch_chunks(neighbor_spans(chunked, window)) if chunked else {}
+        # objects written without doc_id/chunk_index have no neighbours to find: use the hits alone
+        alone = [d for d in docs if d["legacy"] or d["doc_id"] not in found]
+        texts = self.fetch_texts([u for d in alone for u in d["hits"].values()]) if alone else {}
+        for doc in docs:
+            matched = doc.pop("hits")
+            doc.pop("legacy")
+            pieces = found.get(doc["doc_id"]) or [(i, texts.get(u, "")) for i, u in matched.items()]
+            doc["chunk_indices"] = sorted(i for i, _ in pieces)
+            doc["text"] = stitch_chunks(pieces)
+        return docs
+
+    def _encode_query(self, query_text: str) -> List[float]:
+        return self._encode_queries([query_text])[0]
+
+    def _encode_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        """Cached query vectors; all misses go through the encoder in one batched call."""
+        keys = [normalize_query(q) for q in queries]
+        vecs = {k: self.query_cache.get(k) for k in dict.fromkeys(keys)}
+        missing = [k for k, v in vecs.items() if v is None]
+        if missing:
+            fresh = self.model.encode(missing, batch_size=self.encode_batch_size, normalize_embeddings=True)
+            for k, v in zip(missing, fresh):
+                vecs[k] = v.tolist()
+                self.query_cache.put(k, vecs[k])
+        return [vecs[k] for k in keys]
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace so trivially different spellings of a query share an entry."""
+    return " ".join(text.split())
+
+
+def result_key(mode: str, query_text: str, top_k: int, alpha: Optional[float] = None,
+               filters: Any = None, epoch: int = 0, view: Any = None) -> tuple:
+    """
+    Cache key for one search; `filters` must have a stable repr (None, tuples,
+    frozen dataclasses). `view` is the (properties, snippet) projection.
+    """
+    return (mode, normalize_query(query_text), top_k, alpha, repr(filters), epoch, repr(view))
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU with an optional TTL (seconds). `get` returns None
+    on a miss or an expired entry; hit/miss counters feed `stats()`.
+    """
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                stored_at, value = item
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SqliteCache:
+    """
+    `LRUCache` interface backed by one sqlite file, so several uvicorn workers on
+    a host share entries. Values are pickled; keys are hashed with sha1(repr(key)).
+    """
+    def __init__(self, path: str, max_size: int = 10_000, ttl: Optional[float] = None):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, value BLOB, stored_at REAL, last_used REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used)")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _hash(key: Hashable) -> bytes:
+        return hashlib.sha1(repr(key).encode("utf-8")).digest()
+
+    def get(self, key: Hashable) -> Any:
+        h = self._hash(key)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT value, stored_at FROM entries WHERE key = ?", (h,)).fetchone()
+            if row is not None and (self.ttl is None or now - row[1] < self.ttl):
+                self.conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, h))
+                self.hits += 1
+                return pickle.loads(row[0])
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, stored_at, last_used) VALUES (?, ?, ?, ?)",
+                (self._hash(key), blob, now, now),
+            )
+            over = len(self) - self.max_size
+            if over > 0:
+                self.conn.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used ASC LIMIT ?)",
+                    (over,),
+                )
+
+    def clear(self) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM entries")
+
+    def __len__(self) -> int:
+        return int(self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0])
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "path": self.path,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,86 @@
+"""
+Chunk hits -> documents: group by `doc_id`, widen each document's matched
+chunks by +-N neighbours, and stitch the chunk texts back together in
+`chunk_index` order with the chunker's overlap removed.
+"""
+from typing import Any, Dict, List, Tuple
+
+# properties needed to group hits and locate neighbours; text comes with the neighbour fetch
+GROUP_PROPERTIES = ("doc_id", "chunk_index", "chunk_count", "title", "date_filed", "url")
+
+
+def group_hits(hits: List[Dict[str, Any]], max_docs: int) -> List[Dict[str, Any]]:
+    """
+    Best-first documents from best-first chunk hits. A document's score is its
+    best chunk's score. Hits without a doc_id (legacy unchunked objects) are
+    their own document. Reranked hits also carry that chunk's `_rerank_score`,
+    which is what ordered the documents; `_score` stays the retrieval score.
+    """
+    docs: Dict[str, Dict[str, Any]] = {}
+    for hit in hits:
+        legacy = not hit.get("doc_id")
+        doc_id = hit.get("uuid") if legacy else hit["doc_id"]
+        doc = docs.get(doc_id)
+        if doc is None:
+            if len(docs) >= max_docs:
+                continue
+            doc = docs[doc_id] = {
+                "doc_id": doc_id,
+                "title": hit.get("title"),
+                "date_filed": hit.get("date_filed"),
+                "url": hit.get("url"),
+                "_score": hit.get("_score"),
+                "chunk_count": int(hit["chunk_count"]) if hit.get("chunk_count") is not None else None,
+                "legacy": legacy,
+                "hits": {},   # chunk_index -> uuid
+            }
+            if "_rerank_score" in hit:
+                doc["_rerank_score"] = hit["_rerank_score"]
+        index = int(hit["chunk_index"]) if hit.get("chunk_index") is not None else 0
+        doc["hits"][index] = hit.get("uuid")
+    return list(docs.values())
+
+
+def neighbor_spans(docs: List[Dict[str, Any]], window: int) -> Dict[str, List[Tuple[int, int]]]:
+    """doc_id -> merged, inclusive [lo, hi] chunk_index ranges around the matched chunks."""
+    spans: Dict[str, List[Tuple[int, int]]] = {}
+    for doc in docs:
+        last = doc["chunk_count"] - 1 if doc["chunk_count"] else None
+        ranges: List[Tuple[int, int]] = []
+        for i in sorted(doc["hits"]):
+            lo, hi = max(0, i - window), i + window
+            if last is not None:
+                hi = min(hi, last)
+            if ranges and lo <= ranges[-1][1] + 1:
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], hi))
+            else:
+                ranges.append((lo, hi))
+        spans[doc["doc_id"]] = ranges
+    return spans
+
+
+def _merge_overlap(left: List[str], right: List[str], max_overlap: int) -> List[str]:
+    """`right` minus the longest prefix that repeats the end of `left` (sliding-window overlap)."""
+    for k in range(min(len(left), len(right), max_overlap), 0, -1):
+        if left[-k:] == right[:k]:
+            return right[k:]
+    return right
+
+
+def stitch_chunks(chunks: List[Tuple[int, str]], max_overlap: int = 128, gap: str = " … ") -> str:
+    """Join (chunk_index, text) pairs in order; adjacent chunks lose their overlap, gaps get `gap`."""
+    words: List[str] = []
+    out: List[str] = []
+    prev = None
+    for index, text in sorted(chunks):
+        toks = text.split()
+        if prev is not None and index == prev + 1:
+            words.extend(_merge_overlap(words, toks, max_overlap))
+        else:
+            if words:
+                out.append(" ".join(words))
+            words = toks
+        prev = index
+    if words:
+        out.append(" ".join(words))
+    return gap.join(out)
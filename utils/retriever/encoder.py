@@ -0,0 +1,16 @@
+# utils/retriever/encoder.py  (query encoder shared by every retriever backend; no Weaviate import)
+from typing import Optional
+
+from utils.common.embedding_cache import open_cached_encoder
+from utils.common.registry import get_encoder
+
+EMBED_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def load_query_encoder(embedding_cache: Optional[str] = None, backend: str = "torch",
+                       onnx_dir: Optional[str] = None, onnx_threads: Optional[int] = None):
+    """The process-wide query encoder on `backend` ("torch" | "onnx"), behind the optional on-disk cache."""
+    model = get_encoder(EMBED_MODEL_ID, backend=backend, onnx_dir=onnx_dir, threads=onnx_threads)
+    # int8 vectors differ slightly from the PyTorch ones; keep their cache entries apart
+    cache_id = EMBED_MODEL_ID if backend == "torch" else f"{EMBED_MODEL_ID}@onnx-int8"
+    return open_cached_encoder(model, cache_id, embedding_cache)
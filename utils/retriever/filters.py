@@ -0,0 +1,95 @@
+"""
+Metadata pre-filters applied inside the search instead of after it:
+
+    SearchFilters(date_from="1990-01-01", date_to="1999-12-31", courts=("scotus",))
+
+Weaviate gets them as a `Filter` on the query (`date_filed` is range-indexed,
+`doc_id` and `court` are field-tokenized and filterable, see
+`VectorizeOpinions.ensure_collection`); the local backend turns them into a
+row mask over the chunk table. Instances are frozen with a stable repr so
+they can be part of a result-cache key.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time, timezone
+from typing import Any, Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+DateLike = Union[str, date, datetime, None]
+
+
+def _as_utc(value: DateLike, end_of_day: bool = False) -> Optional[datetime]:
+    """ISO string/date/datetime -> aware UTC datetime; a bare date covers the whole day."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00")) if "T" in value else date.fromisoformat(value)
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time.max if end_of_day else time.min)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _as_set(values: Optional[Iterable[str]]) -> Optional[Tuple[str, ...]]:
+    if values is None:
+        return None
+    if isinstance(values, str):
+        values = [values]
+    return tuple(sorted(set(values)))
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    date_from: DateLike = None                 # inclusive
+    date_to: DateLike = None                   # inclusive; a bare date means end of that day
+    doc_ids: Optional[Tuple[str, ...]] = None  # restrict to these documents
+    courts: Optional[Tuple[str, ...]] = None   # exact court names as ingested
+
+    def __post_init__(self):
+        object.__setattr__(self, "date_from", _as_utc(self.date_from))
+        object.__setattr__(self, "date_to", _as_utc(self.date_to, end_of_day=True))
+        object.__setattr__(self, "doc_ids", _as_set(self.doc_ids))
+        object.__setattr__(self, "courts", _as_set(self.courts))
+        if self.date_from and self.date_to and self.date_from > self.date_to:
+            raise ValueError(f"date_from {self.date_from:%Y-%m-%d} is after date_to {self.date_to:%Y-%m-%d}")
+
+    def is_empty(self) -> bool:
+        return self.date_from is None and self.date_to is None and self.doc_ids is None and self.courts is None
+
+    def to_weaviate(self) -> Optional[Any]:
+        """The equivalent Weaviate v4 `Filter`, or None when nothing is set."""
+        from weaviate.classes.query import Filter   # the local backend needs no Weaviate client
+
+        clauses = []
+        if self.date_from is not None:
+            clauses.append(Filter.by_property("date_filed").greater_or_equal(self.date_from))
+        if self.date_to is not None:
+            clauses.append(Filter.by_property("date_filed").less_or_equal(self.date_to))
+        if self.doc_ids is not None:
+            clauses.append(Filter.by_property("doc_id").contains_any(list(self.doc_ids)))
+        if self.courts is not None:
+            clauses.append(Filter.by_property("court").contains_any(list(self.courts)))
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else Filter.all_of(clauses)
+
+    def mask(self, table: pa.Table) -> np.ndarray:
+        """Boolean row mask over a corpus-store chunk table (`date_filed` as ISO strings)."""
+        keep = pa.array(np.ones(table.num_rows, dtype=bool))
+        if self.date_from is not None or self.date_to is not None:
+            # ingest writes normalized %Y-%m-%dT%H:%M:%SZ strings, so they order like the dates
+            dates = table.column("date_filed")
+            if self.date_from is not None:
+                keep = pc.and_(keep, pc.greater_equal(dates, self.date_from.strftime("%Y-%m-%dT%H:%M:%SZ")))
+            if self.date_to is not None:
+                keep = pc.and_(keep, pc.less_equal(dates, self.date_to.strftime("%Y-%m-%dT%H:%M:%SZ")))
+        for column, values in (("doc_id", self.doc_ids), ("court", self.courts)):
+            if values is None:
+                continue
+            if column not in table.column_names:
+                return np.zeros(table.num_rows, dtype=bool)
+            keep = pc.and_(keep, pc.is_in(table.column(column), value_set=pa.array(values, type=pa.string())))
+        return np.asarray(pc.fill_null(keep, False).to_numpy(zero_copy_only=False), dtype=bool)
@@ -0,0 +1,319 @@
+# utils/retriever/local_retriever.py  (in-process FAISS + BM25)
+import json
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utils.pipelines.corpus_store import CorpusStore, read_chunks
+from utils.retriever.base import BaseRetriever
+from utils.retriever.cache import LRUCache
+from utils.retriever.filters import SearchFilters
+from utils.retriever.results import format_hit, properties_to_fetch
+from utils.retriever.encoder import EMBED_MODEL_ID, load_query_encoder
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+INDEX_FILE = "vectors.faiss"
+POSTINGS_FILE = "bm25.npz"
+VOCAB_FILE = "vocab.json"
+META_FILE = "meta.json"
+CHUNKS_FILE = "chunks.parquet"
+
+
+def tokenize(text: str) -> List[str]:
+    # Weaviate's default `word` tokenization: lowercase alphanumeric runs
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Inverted BM25 index in CSR form: the postings of term t are
+    doc_ids[indptr[t]:indptr[t+1]] with matching term frequencies, so a query
+    only touches documents that contain one of its terms. Scoring follows
+    Weaviate (k1=1.2, b=0.75, Lucene idf).
+    """
+    def __init__(self, vocab: Dict[str, int], indptr: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray,
+                 doc_len: np.ndarray, k1: float = 1.2, b: float = 0.75):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        n = len(doc_len)
+        df = np.diff(indptr).astype(np.float64)
+        self.idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(doc_len.mean()) if n else 1.0
+        # per-doc length normalization, precomputed once
+        self.norm = (k1 * (1 - b + b * doc_len / max(avgdl, 1e-9))).astype(np.float32)
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        vocab: Dict[str, int] = {}
+        terms, docs, counts, lengths = [], [], [], []
+        for d, text in enumerate(texts):
+            toks = tokenize(text)
+            lengths.append(len(toks))
+            ids, tf = np.unique(np.fromiter((vocab.setdefault(t, len(vocab)) for t in toks), dtype=np.int64,
+                                            count=len(toks)), return_counts=True)
+            terms.append(ids)
+            docs.append(np.full(len(ids), d, dtype=np.int32))
+            counts.append(tf.astype(np.float32))
+        terms_a = np.concatenate(terms) if terms else np.empty(0, dtype=np.int64)
+        order = np.argsort(terms_a, kind="stable")
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.add.at(indptr, terms_a + 1, 1)
+        return cls(
+            vocab,
+            np.cumsum(indptr),
+            (np.concatenate(docs) if docs else np.empty(0, dtype=np.int32))[order],
+            (np.concatenate(counts) if counts else np.empty(0, dtype=np.float32))[order],
+            np.asarray(lengths, dtype=np.float32),
+            k1=k1, b=b,
+        )
+
+    def search(self, query: str, k: int, allow: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (doc indices, scores), best first; only documents with a query term (and in `allow`)."""
+        scores = np.zeros(len(self.doc_len), dtype=np.float32)
+        for t in set(tokenize(query)):
+            tid = self.vocab.get(t)
+            if tid is None:
+                continue
+            s, e = self.indptr[tid], self.indptr[tid + 1]
+            ids, tf = self.doc_ids[s:e], self.tfs[s:e]
+            scores[ids] += self.idf[tid] * tf * (self.k1 + 1) / (tf + self.norm[ids])
+        if allow is not None:
+            scores[~allow] = 0.0
+        hit = np.flatnonzero(scores)
+        if len(hit) > k:
+            hit = hit[np.argpartition(-scores[hit], k - 1)[:k]]
+        hit = hit[np.argsort(-scores[hit], kind="stable")]
+        return hit, scores[hit]
+
+    def save(self, path: str) -> None:
+        np.savez(os.path.join(path, POSTINGS_FILE), indptr=self.indptr, doc_ids=self.doc_ids,
+                 tfs=self.tfs, doc_len=self.doc_len, params=np.array([self.k1, self.b]))
+        with open(os.path.join(path, VOCAB_FILE), "w") as f:
+            json.dump(self.vocab, f)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        z = np.load(os.path.join(path, POSTINGS_FILE))
+        with open(os.path.join(path, VOCAB_FILE)) as f:
+            vocab = json.load(f)
+        k1, b = (float(x) for x in z["params"])
+        return cls(vocab, z["indptr"], z["doc_ids"], z["tfs"], z["doc_len"], k1=k1, b=b)
+
+
+def _min_max(scores: np.ndarray) -> np.ndarray:
+    if len(scores) == 0:
+        return scores
+    lo, hi = float(scores.min()), float(scores.max())
+    if hi - lo < 1e-12:
+        return np.ones_like(scores)
+    return (scores - lo) / (hi - lo)
+
+
+class LocalRetriever(BaseRetriever):
+    """
+    Single-box retriever with no network hop: FAISS inner-product search over
+    normalized chunk vectors plus the inverted BM25 index above. Hybrid search
+    uses Weaviate's relative score fusion: each leg's top candidates are
+    min-max normalized, then combined as alpha * vector + (1 - alpha) * bm25.
+
+        LocalRetriever.from_corpus_store("./data/corpus_store").save("./data/local_index")
+        r = LocalRetriever.load("./data/local_index")
+    """
+    def __init__(
+        self,
+        index: "faiss.Index",
+        bm25: BM25Index,
+        chunks: pa.Table,
+        alpha: float = 0.6,
+        candidates: int = 100,
+        embedding_cache: Optional[str] = None,
+        query_cache_size: int = 2048,
+        query_cache_ttl: Optional[float] = 3600.0,
+        encode_batch_size: int = 64,
+        encoder_backend: str = "torch",
+        onnx_dir: Optional[str] = None,
+        onnx_threads: Optional[int] = None,
+        model=None,
+    ):
+        if index.ntotal != chunks.num_rows or len(bm25.doc_len) != chunks.num_rows:
+            raise ValueError(
+                f"Local index is inconsistent: {index.ntotal} vectors, {len(bm25.doc_len)} BM25 docs, "
+                f"{chunks.num_rows} chunks"
+            )
+        self.index = index
+        self.bm25 = bm25
+        self.chunks = chunks
+        self.alpha = alpha
+        self.candidates = candidates   # per-leg pool fused by hybrid search
+        self.encode_batch_size = encode_batch_size
+        self.model = model or load_query_encoder(embedding_cache, encoder_backend, onnx_dir, onnx_threads)
+        self.query_cache = LRUCache(max_size=query_cache_size, ttl=query_cache_ttl)
+        self._rows_by_uuid: Optional[Dict[str, int]] = None   # built on first fetch_texts
+        self._rows_by_chunk: Optional[Dict[Tuple[str, int], int]] = None   # (doc_id, chunk_index) -> row
+        self.filter_masks = LRUCache(max_size=64)   # SearchFilters -> allowed-row mask
+
+    # ---- build / persist ----
+    @classmethod
+    def from_corpus_store(cls, store_dir: str, factory: str = "Flat", batch_size: int = 8192,
+                          **kwargs) -> "LocalRetriever":
+        """Build from a corpus store (`main.py --ingest ... --export-store`). `factory` is a faiss index_factory string."""
+        store = CorpusStore(store_dir)
+        vectors = np.array(store.vectors, dtype=np.float32)   # private copy: normalized in place
+        faiss.normalize_L2(vectors)
+        index = faiss.index_factory(vectors.shape[1], factory, faiss.METRIC_INNER_PRODUCT)
+        if not index.is_trained:
+            index.train(vectors)
+        for i in range(0, len(vectors), batch_size):
+            index.add(vectors[i:i + batch_size])
+        chunks = store.read_chunks()
+        bm25 = BM25Index.build(t.as_py() or "" for t in chunks.column("text"))
+        print(f"[INFO] Built local index over {index.ntotal} chunks ({len(bm25.vocab)} terms)")
+        return cls(index, bm25, chunks, **kwargs)
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(path, INDEX_FILE))
+        self.bm25.save(path)
+        pq.write_table(self.chunks, os.path.join(path, CHUNKS_FILE), compression="zstd")
+        with open(os.path.join(path, META_FILE), "w") as f:
+            json.dump({"model_id": EMBED_MODEL_ID, "rows": self.chunks.num_rows, "dim": self.index.d}, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False, **kwargs) -> "LocalRetriever":
+        flags = faiss.IO_FLAG_MMAP if mmap else 0
+        index = faiss.read_index(os.path.join(path, INDEX_FILE), flags)
+        chunks = read_chunks(os.path.join(path, CHUNKS_FILE))
+        return cls(index, BM25Index.load(path), chunks, **kwargs)
+
+    def _allowed_rows(self, filters: Optional[SearchFilters]) -> Optional[np.ndarray]:
+        if filters is None or filters.is_empty():
+            return None
+        mask = self.filter_masks.get(filters)
+        if mask is None:
+            mask = filters.mask(self.chunks)
+            self.filter_masks.put(filters, mask)
+        return mask
+
+    # ---- search legs: (row indices, scores), best first ----
+    def _vector_leg(self, vecs: np.ndarray, k: int,
+                    allow: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        params = None
+        if allow is not None:
+            rows = np.flatnonzero(allow).astype(np.int64)
+            if len(rows) == 0:
+                empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+                return [empty for _ in range(len(vecs))]
+            # FAISS skips rows outside the selector during the scan instead of us trimming afterwards
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(rows))
+        scores, ids = self.index.search(np.ascontiguousarray(vecs, dtype=np.float32), k, params=params)
+        out = []
+        for row_ids, row_scores in zip(ids, scores):
+            keep = row_ids >= 0
+            out.append((row_ids[keep], row_scores[keep]))
+        return out
+
+    def _fuse(self, vec_leg: Tuple[np.ndarray, np.ndarray], bm25_leg: Tuple[np.ndarray, np.ndarray],
+              top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        fused: Dict[int, float] = {}
+        for (ids, scores), weight in ((vec_leg, self.alpha), (bm25_leg, 1.0 - self.alpha)):
+            for i, s in zip(ids.tolist(), _min_max(scores).tolist()):
+                fused[i] = fused.get(i, 0.0) + weight * s
+        best = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+        return np.array([i for i, _ in best], dtype=np.int64), np.array([s for _, s in best], dtype=np.float32)
+
+    def _format_results(self, ids: np.ndarray, scores: np.ndarray, query_text: str = "",
+                        return_properties: Optional[Sequence[str]] = None,
+                        snippet_words: Optional[int] = None) -> List[Dict[str, Any]]:
+        # project before materializing rows so unrequested text never becomes Python strings
+        columns = ["uuid"] + [c for c in properties_to_fetch(return_properties, snippet_words) if c in self.chunks.column_names]
+        rows = self.chunks.select(columns).take(pa.array(ids, type=pa.int64())).to_pylist() if len(ids) else []
+        out = []
+        for row, score in zip(rows, scores.tolist()):
+            if row.get("date_filed"):
+                row["date_filed"] = datetime.fromisoformat(row["date_filed"].replace("Z", "+00:00"))
+            out.append(format_hit(row.pop("uuid"), row, score, return_properties, query_text, snippet_words))
+        return out
+
+    # ---- BaseRetriever ----
+    def retrieve_hybrid_many(self, queries: Sequence[str], top_k: int = 10, filters: Optional[SearchFilters] = None,
+                             **view) -> List[List[Dict[str, Any]]]:
+        if not queries:
+            return []
+        k = max(top_k, self.candidates)
+        allow = self._allowed_rows(filters)
+        vec_legs = self._vector_leg(np.asarray(self._encode_queries(queries)), k, allow)
+        return [
+            self._format_results(*self._fuse(v, self.bm25.search(q, k, allow), top_k), q, **view)
+            for q, v in zip(queries, vec_legs)
+        ]
+
+    def retrieve_bm25_many(self, queries: Sequence[str], top_k: int = 10, filters: Optional[SearchFilters] = None,
+                           **view) -> List[List[Dict[str, Any]]]:
+        allow = self._allowed_rows(filters)
+        return [self._format_results(*self.bm25.search(q, top_k, allow), q, **view) for q in queries]
+
+    def retrieve_semantic_many(self, queries: Sequence[str], top_k: int = 10, filters: Optional[SearchFilters] = None,
+                               **view) -> List[List[Dict[str, Any]]]:
+        if not queries:
+            return []
+        legs = self._vector_leg(np.asarray(self._encode_queries(queries)), top_k, self._allowed_rows(filters))
+        return [self._format_results(ids, scores, q, **view) for q, (ids, scores) in zip(queries, legs)]
+
+    def retrieve_hybrid(self, query_text: str, top_k: int = 10, return_properties: Optional[Sequence[str]] = None,
+                        snippet_words: Optional[int] = None,
+                        filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+        return self.retrieve_hybrid_many([query_text], top_k, filters=filters, return_properties=return_properties,
+                                         snippet_words=snippet_words)[0]
+
+    def retrieve_bm25(self, query_text: str, top_k: int = 10, return_properties: Optional[Sequence[str]] = None,
+                      snippet_words: Optional[int] = None,
+                      filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+        return self.retrieve_bm25_many([query_text], top_k, filters=filters, return_properties=return_properties,
+                                       snippet_words=snippet_words)[0]
+
+    def retrieve_semantic(self, query_text: str, top_k: int = 10, return_properties: Optional[Sequence[str]] = None,
+                          snippet_words: Optional[int] = None,
+                          filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+        return self.retrieve_semantic_many([query_text], top_k, filters=filters, return_properties=return_properties,
+                                           snippet_words=snippet_words)[0]
+
+    def fetch_texts(self, uuids: Sequence[str]) -> Dict[str, str]:
+        if self._rows_by_uuid is None:
+            self._rows_by_uuid = {u: i for i, u in enumerate(self.chunks.column("uuid").to_pylist())}
+        rows = [(u, self._rows_by_uuid[u]) for u in dict.fromkeys(uuids) if u in self._rows_by_uuid]
+        if not rows:
+            return {}
+        texts = self.chunks.column("text").take(pa.array([i for _, i in rows], type=pa.int64())).to_pylist()
+        return {u: t or "" for (u, _), t in zip(rows, texts)}
+
+    def fetch_chunks(self, spans: Dict[str, List[Tuple[int, int]]]) -> Dict[str, List[Tuple[int, str]]]:
+        if self._rows_by_chunk is None:
+            self._rows_by_chunk = {
+                (d, int(i)): r for r, (d, i) in enumerate(zip(self.chunks.column("doc_id").to_pylist(),
+                                                             self.chunks.column("chunk_index").to_pylist()))
+            }
+        wanted = [
+            (doc_id, i, self._rows_by_chunk[(doc_id, i)])
+            for doc_id, ranges in spans.items() for lo, hi in ranges for i in range(lo, hi + 1)
+            if (doc_id, i) in self._rows_by_chunk
+        ]
+        if not wanted:
+            return {}
+        texts = self.chunks.column("text").take(pa.array([r for _, _, r in wanted], type=pa.int64())).to_pylist()
+        out: Dict[str, List[Tuple[int, str]]] = {}
+        for (doc_id, i, _), text in zip(wanted, texts):
+            out.setdefault(doc_id, []).append((i, text or ""))
+        return out
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {"query_vectors": self.query_cache.stats()}
@@ -0,0 +1,60 @@
+"""
+Cross-encoder reranking of chunk hits. The bi-encoder + BM25 hybrid is cheap
+but coarse; a small cross-encoder reads query and chunk together and is a much
+better judge of the top few candidates. Pair scores are cached by hash so a
+repeated query (or the same chunk under the same query) is never rescored.
+"""
+import hashlib
+from typing import Any, Dict, List, Optional, Sequence
+
+from utils.common.registry import get_cross_encoder
+from utils.retriever.cache import LRUCache, normalize_query
+
+RERANK_MODEL_ID = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+def pair_key(query_text: str, text: str) -> str:
+    return hashlib.sha1(f"{normalize_query(query_text)}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, chunk) pairs in CPU batches. Only the first `max_candidates`
+    hits are scored; the rest keep their retrieval order behind them. Reranked
+    hits get `_rerank_score` next to the retriever's `_score`.
+    """
+    def __init__(self, model_id: str = RERANK_MODEL_ID, batch_size: int = 32, max_candidates: int = 20,
+                 max_length: int = 512, cache_size: int = 4096, device: str = "cpu",
+                 model: Optional[Any] = None):
+        self.model_id = model_id
+        self.batch_size = batch_size
+        self.max_candidates = max_candidates
+        self.model = model if model is not None else get_cross_encoder(model_id, max_length=max_length, device=device)
+        self.score_cache = LRUCache(max_size=cache_size)
+
+    def score(self, query_text: str, texts: Sequence[str]) -> List[float]:
+        """Cross-encoder scores for `texts` against the query; cache misses go out in one batched predict."""
+        keys = [pair_key(query_text, t) for t in texts]
+        scores = {k: self.score_cache.get(k) for k in dict.fromkeys(keys)}
+        missing = {k: t for k, t in zip(keys, texts) if scores[k] is None}
+        if missing:
+            fresh = self.model.predict([(query_text, t) for t in missing.values()], batch_size=self.batch_size,
+                                       show_progress_bar=False)
+            for k, s in zip(missing, fresh):
+                scores[k] = float(s)
+                self.score_cache.put(k, scores[k])
+        return [scores[k] for k in keys]
+
+    def rerank(self, query_text: str, hits: List[Dict[str, Any]], top_k: Optional[int] = None,
+               text_key: str = "text") -> List[Dict[str, Any]]:
+        head, tail = hits[:self.max_candidates], hits[self.max_candidates:]
+        if not head:
+            return hits
+        scores = self.score(query_text, [h.get(text_key) or "" for h in head])
+        for hit, s in zip(head, scores):
+            hit["_rerank_score"] = s
+        ranked = sorted(head, key=lambda h: h["_rerank_score"], reverse=True) + tail
+        return ranked[:top_k] if top_k else ranked
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.score_cache.stats()
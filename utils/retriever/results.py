@@ -0,0 +1,64 @@
+"""
+Hit dicts shared by every retriever backend:
+
+    {"uuid", <requested properties>, "_score"}         # full text
+    {"uuid", <requested properties>, "snippet", "_score"}  # snippet mode: `text` is replaced
+
+`DEFAULT_PROPERTIES` is what callers get when they don't project.
+"""
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_PROPERTIES: Tuple[str, ...] = ("title", "date_filed", "url", "text")
+_TERM_RE = re.compile(r"[a-z0-9]+")
+
+
+def properties_to_fetch(return_properties: Optional[Sequence[str]], snippet_words: Optional[int]) -> List[str]:
+    """Properties to request from the backend; snippets are cut from `text`, so it is fetched for them."""
+    props = list(return_properties or DEFAULT_PROPERTIES)
+    if snippet_words and "text" not in props:
+        props.append("text")
+    return props
+
+
+def make_snippet(text: str, query: str, window: int = 40) -> str:
+    """The `window`-word span of `text` holding the most query terms, with ellipses where it was cut."""
+    words = (text or "").split()
+    if len(words) <= window:
+        return " ".join(words)
+    terms = set(_TERM_RE.findall(query.lower()))
+    hits = [1 if terms.intersection(_TERM_RE.findall(w.lower())) else 0 for w in words]
+    best, best_start, running = -1, 0, sum(hits[:window])
+    for start in range(len(words) - window + 1):
+        if start:
+            running += hits[start + window - 1] - hits[start - 1]
+        if running > best:
+            best, best_start = running, start
+    if best <= 0:
+        best_start = 0
+    end = best_start + window
+    return ("… " if best_start else "") + " ".join(words[best_start:end]) + (" …" if end < len(words) else "")
+
+
+def format_hit(uuid: Any, props: Dict[str, Any], score: Optional[float],
+               return_properties: Optional[Sequence[str]] = None,
+               query: str = "", snippet_words: Optional[int] = None) -> Dict[str, Any]:
+    hit: Dict[str, Any] = {"uuid": str(uuid) if uuid is not None else None}
+    for name in (return_properties or DEFAULT_PROPERTIES):
+        if name == "text" and snippet_words:
+            continue
+        hit[name] = props.get(name, "" if name == "text" else None)
+    if snippet_words:
+        hit["snippet"] = make_snippet(props.get("text", ""), query, snippet_words)
+    hit["_score"] = score
+    return hit
+
+
+def format_results(res, return_properties: Optional[Sequence[str]] = None,
+                   query: str = "", snippet_words: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Weaviate query response -> hit dicts."""
+    return [
+        format_hit(getattr(obj, "uuid", None), obj.properties or {}, getattr(obj.metadata, "score", None),
+                   return_properties, query, snippet_words)
+        for obj in (res.objects or [])
+    ]
@@ -1,12 +1,18 @@
 # utils/retriever/weaviate_retriever.py  (v4)
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 import time
+from concurrent.futures import ThreadPoolExecutor
 import urllib.request
-import weaviate
-from weaviate.classes.query import MetadataQuery
-from sentence_transformers import SentenceTransformer
+from weaviate.classes.query import Filter, MetadataQuery
+from utils.common.registry import get_client, release_client
+from utils.common.index_epoch import EpochWatcher
+from utils.retriever.base import BaseRetriever
+from utils.retriever.cache import LRUCache, SqliteCache, result_key
+from utils.retriever.encoder import EMBED_MODEL_ID, load_query_encoder
+from utils.retriever.filters import SearchFilters
+from utils.retriever.results import format_results, properties_to_fetch
 
-class WeaviateRetriever:
+class WeaviateRetriever(BaseRetriever):
     def __init__(
         self,
         host: str = "127.0.0.1",
@@ -17,72 +23,177 @@ class WeaviateRetriever:
         use_tls: bool = False,
         api_key: Optional[str] = None,
         wait_ready_seconds: int = 30,
+        embedding_cache: Optional[str] = None,
+        query_cache_size: int = 2048,
+        query_cache_ttl: Optional[float] = 3600.0,
+        result_cache_size: int = 1024,
+        result_cache_ttl: Optional[float] = None,
+        result_cache_path: Optional[str] = None,
+        epoch_refresh_seconds: float = 5.0,
+        max_concurrency: int = 16,
+        encode_batch_size: int = 64,
+        encoder_backend: str = "torch",
+        onnx_dir: Optional[str] = None,
+        onnx_threads: Optional[int] = None,
     ):
         self.index = index
         self.alpha = alpha
-        self.model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+        self.max_concurrency = max_concurrency      # in-flight queries for retrieve_*_many
+        self.encode_batch_size = encode_batch_size
+        # one model and one client per process, however many retrievers are built
+        self.model = load_query_encoder(embedding_cache, encoder_backend, onnx_dir, onnx_threads)
+        # query text -> normalized vector, shared by hybrid and semantic search
+        self.query_cache = LRUCache(max_size=query_cache_size, ttl=query_cache_ttl)
+        # full result lists, keyed on the collection epoch so an ingest invalidates them;
+        # a sqlite path shares them between uvicorn workers on the same host
+        if result_cache_path:
+            self.result_cache = SqliteCache(result_cache_path, max_size=result_cache_size, ttl=result_cache_ttl)
+        else:
+            self.result_cache = LRUCache(max_size=result_cache_size, ttl=result_cache_ttl)
 
-        conn_kwargs = dict(
-            http_host=host, http_port=http_port, http_secure=use_tls,
-            grpc_host=host, grpc_port=grpc_port, grpc_secure=use_tls,
-        )
-        if api_key:
-            from weaviate.auth import AuthApiKey
-            conn_kwargs["auth_credentials"] = AuthApiKey(api_key=api_key)
-
-        self.client = weaviate.connect_to_custom(**conn_kwargs)
+        self.client = get_client(host, http_port, grpc_port, use_tls=use_tls, api_key=api_key)
         print("✅ Connected to Weaviate client")
         
         if self.index not in self.client.collections.list_all():
-            self.client.close()
+            release_client(self.client)
             raise RuntimeError(
                 f"Collection '{self.index}' not found. Run your ingest to create/load it."
             )
         self.collection = self.client.collections.get(self.index)
+        self.epoch = EpochWatcher(self.client, self.index, refresh_seconds=epoch_refresh_seconds)
 
-    def retrieve_hybrid(self, query_text: str, top_k: int = 10) -> List[Dict[str, Any]]:
-        query_vec = self.model.encode(query_text, normalize_embeddings=True).tolist()
+    # ---- one Weaviate round trip per mode; `vec` is None for bm25, `view` is (properties, snippet words),
+    # `where` the translated SearchFilters (or None) evaluated by Weaviate before ranking ----
+    def _hybrid(self, query_text: str, vec: Optional[List[float]], top_k: int, view: tuple,
+                where=None) -> List[Dict[str, Any]]:
         res = self.collection.query.hybrid(
             query=query_text,
-            vector=query_vec,
+            vector=vec,
             alpha=self.alpha,
             limit=top_k,
+            filters=where,
+            return_properties=properties_to_fetch(*view),
             return_metadata=MetadataQuery(score=True),
         )
-        
-        out: List[Dict[str, Any]] = self._format_results(res)
-        return out
+        return self._format_results(res, query_text, view)
 
-    def retrieve_bm25(self, query_text: str, top_k: int = 10) -> List[Dict[str, Any]]:
-        res = self.collection.query.bm25(query=query_text, limit=top_k, return_metadata=MetadataQuery(score=True))
-        out: List[Dict[str, Any]] = self._format_results(res)
-        return out
-    
-    def retrieve_semantic(self, query_text: str, top_k: int = 10,) -> List[Dict[str, Any]]:
-        vec = self.model.encode(query_text, normalize_embeddings=True).tolist()
-        res = self.collection.query.near_vector(vec, limit=top_k,
+    def _bm25(self, query_text: str, vec: Optional[List[float]], top_k: int, view: tuple,
+              where=None) -> List[Dict[str, Any]]:
+        res = self.collection.query.bm25(query=query_text, limit=top_k, filters=where,
+                                         return_properties=properties_to_fetch(*view),
+                                         return_metadata=MetadataQuery(score=True))
+        return self._format_results(res, query_text, view)
+
+    def _semantic(self, query_text: str, vec: Optional[List[float]], top_k: int, view: tuple,
+                  where=None) -> List[Dict[str, Any]]:
+        res = self.collection.query.near_vector(vec, limit=top_k, filters=where,
+                                                return_properties=properties_to_fetch(*view),
                                                 return_metadata=MetadataQuery(score=True))
-        out: List[Dict[str, Any]] = self._format_results(res)
-        return out
+        return self._format_results(res, query_text, view)
+
+    def _search_many(self, mode: str, queries: Sequence[str], top_k: int,
+                     return_properties: Optional[Sequence[str]] = None,
+                     snippet_words: Optional[int] = None,
+                     filters: Optional[SearchFilters] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Result-cache lookups first; the remaining distinct queries are encoded in one
+        batch and sent to Weaviate concurrently. Output follows input order.
+        """
+        alpha = self.alpha if mode == "hybrid" else None
+        view = (tuple(return_properties) if return_properties else None, snippet_words or None)
+        if filters is not None and filters.is_empty():
+            filters = None
+        where = filters.to_weaviate() if filters is not None else None
+        epoch = self.epoch.current()
+        keys = [result_key(mode, q, top_k, alpha, filters=filters, epoch=epoch, view=view) for q in queries]
+        first: Dict[tuple, int] = {}
+        for i, k in enumerate(keys):
+            first.setdefault(k, i)
+        found = {k: self.result_cache.get(k) for k in first}
+        todo = [k for k, hits in found.items() if hits is None]
+        if todo:
+            texts = [queries[first[k]] for k in todo]
+            vecs = self._encode_queries(texts) if mode != "bm25" else [None] * len(texts)
+            search = getattr(self, f"_{mode}")
+            if len(todo) == 1:
+                fresh = [search(texts[0], vecs[0], top_k, view, where)]
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(todo))) as pool:
+                    fresh = list(pool.map(lambda tv: search(tv[0], tv[1], top_k, view, where), zip(texts, vecs)))
+            for k, hits in zip(todo, fresh):
+                found[k] = hits
+                self.result_cache.put(k, hits)
+        # callers may annotate hits in place; keep the cached copy pristine
+        return [[dict(h) for h in found[k]] for k in keys]
+
+    def retrieve_hybrid(self, query_text: str, top_k: int = 10, return_properties: Optional[Sequence[str]] = None,
+                        snippet_words: Optional[int] = None,
+                        filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+        return self._search_many("hybrid", [query_text], top_k, return_properties, snippet_words, filters)[0]
+
+    def retrieve_bm25(self, query_text: str, top_k: int = 10, return_properties: Optional[Sequence[str]] = None,
+                      snippet_words: Optional[int] = None,
+                      filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+        return self._search_many("bm25", [query_text], top_k, return_properties, snippet_words, filters)[0]
     
-    def _format_results(self, res):
-        out= []
-        for obj in (res.objects or []):
+    def retrieve_semantic(self, query_text: str, top_k: int = 10, return_properties: Optional[Sequence[str]] = None,
+                          snippet_words: Optional[int] = None,
+                          filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+        return self._search_many("semantic", [query_text], top_k, return_properties, snippet_words, filters)[0]
+
+    def retrieve_hybrid_many(self, queries: Sequence[str], top_k: int = 10, **view) -> List[List[Dict[str, Any]]]:
+        return self._search_many("hybrid", queries, top_k, **view)
+
+    def retrieve_bm25_many(self, queries: Sequence[str], top_k: int = 10, **view) -> List[List[Dict[str, Any]]]:
+        return self._search_many("bm25", queries, top_k, **view)
+
+    def retrieve_semantic_many(self, queries: Sequence[str], top_k: int = 10, **view) -> List[List[Dict[str, Any]]]:
+        return self._search_many("semantic", queries, top_k, **view)
+
+    def fetch_texts(self, uuids: Sequence[str]) -> Dict[str, str]:
+        """Full `text` for hits returned in snippet or projected mode, in one round trip."""
+        uuids = list(dict.fromkeys(uuids))
+        if not uuids:
+            return {}
+        res = self.collection.query.fetch_objects(
+            filters=Filter.by_id().contains_any(uuids), limit=len(uuids), return_properties=["text"],
+        )
+        return {str(obj.uuid): (obj.properties or {}).get("text", "") for obj in res.objects}
+    
+    def fetch_chunks(self, spans: Dict[str, List[Tuple[int, int]]]) -> Dict[str, List[Tuple[int, str]]]:
+        """All requested chunk ranges of all documents in one filtered query."""
+        clauses, limit = [], 0
+        for doc_id, ranges in spans.items():
+            for lo, hi in ranges:
+                clauses.append(
+                    Filter.by_property("doc_id").equal(doc_id)
+                    & Filter.by_property("chunk_index").greater_or_equal(lo)
+                    & Filter.by_property("chunk_index").less_or_equal(hi)
+                )
+                limit += hi - lo + 1
+        if not clauses:
+            return {}
+        res = self.collection.query.fetch_objects(
+            filters=Filter.any_of(clauses), limit=limit, return_properties=["doc_id", "chunk_index", "text"],
+        )
+        out: Dict[str, List[Tuple[int, str]]] = {}
+        for obj in res.objects:
             p = obj.properties or {}
-            txt = p.get("text", "")
-            out.append({
-                "title": p.get("title"),
-                # "court": p.get("court"),
-                "date_filed": p.get("date_filed"),
-                "url": p.get("url"),
-                "text": txt,
-                "_score": getattr(obj.metadata, "score", None),
-            })  
+            if p.get("doc_id") in spans:   # doc_id is word-tokenized; keep exact matches only
+                out.setdefault(p["doc_id"], []).append((int(p["chunk_index"]), p.get("text", "")))
         return out
-        
-        
+
+    def _format_results(self, res, query_text: str = "", view: tuple = (None, None)):
+        return format_results(res, view[0], query_text, view[1])
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {
+            "query_vectors": self.query_cache.stats(),
+            "results": self.result_cache.stats(),
+            "epoch": self.epoch.current(),
+        }
+
     def close(self):
-        try:
-            self.client.close()
-        except Exception:
-            pass
\ No newline at end of file
+        if isinstance(self.result_cache, SqliteCache):
+            self.result_cache.close()
+        release_client(self.client)
\ No newline at end of file